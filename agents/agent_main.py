@@ -1,37 +1,48 @@
-from typing import Any, Dict, List, Optional, Union, TypedDict
-from collections import deque
+from typing import Any, Callable, Dict, List, Optional, TypedDict
+from collections import OrderedDict, deque
 from datetime import datetime
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_core.runnables import Runnable
-from langchain_core.tools import tool
+import re
+import sys
+import threading
+import time
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from langchain_core.prompts import PromptTemplate
 from langgraph.graph import StateGraph, START, END
-from langchain import hub
-from langchain.agents import AgentExecutor, create_react_agent
+from langchain.agents import AgentExecutor
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 import os
-from backend.app.routers.cart import *
-from sqlalchemy.orm import Session
-from fastapi import Depends
-from .. import schemas, database, oauth2
-from fastapi import Depends
-from sqlalchemy.orm import Session
-import shopinglist_react_agent, cartmanager_agent, recipe_shopping_agent
-from backend.app import schemas, database, oauth2
+
+# Sub-agent modules are imported by bare name, as they import each other
+agents_dir = os.path.dirname(os.path.abspath(__file__))
+if agents_dir not in sys.path:
+    sys.path.insert(0, agents_dir)
+project_root = os.path.dirname(agents_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from intent_router import IntentRouter
+from llm_cache import shared_cache
+import tool_planner
+from utils.tracing import callbacks as tracing_callbacks, tracer
 
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
-from .. import models
 redis_url = os.getenv("redis_url", "redis://127.0.0.1:6379")
 
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash",
     google_api_key=gemini_api_key,
     temperature=0.7,
-    max_output_tokens=1024
+    max_output_tokens=1024,
+    cache=shared_cache,  # also used by the shopping-list and recipe agents
+    callbacks=tracing_callbacks()  # "llm" spans with token counts when AGENT_TRACE_FILE is set
 )
 
+# Sessions idle longer than this are dropped; the oldest session is dropped when the pool is full
+SESSION_TTL_SECONDS = 30 * 60
+MAX_SESSIONS = 10000
+
 
 class AgentState(TypedDict):
     """State for the Agent."""
@@ -40,180 +51,59 @@ class AgentState(TypedDict):
     current_agent: Optional[str]
     output: Optional[str]
     output_data: Optional[Dict[str, Any]]
+    should_end: bool
+    plan: Optional[List[Dict[str, Any]]]
 
 
-class SuperAgent:
-    """Super Agent that manages multiple agents using a LangGraph workflow."""
+# Shared sub-agents...........................................................................................
+# The executors hold no per-user state (the user id travels in the request), so one
+# instance of each serves every session. Each is built on first use; the sub-agent
+# modules are imported there too, which also avoids the circular import with their
+# `from agent_main import llm`.
 
-    def __init__(self, user_id: int):
-        self.user_id = user_id
-        self.messages = deque(maxlen=10)
-        
-        # Initialize specialized agents
-        self.shopping_list_agent = shopinglist_react_agent.initialize_react_agent(user_id)
-        self.cart_manager_agent = cartmanager_agent.initialize_cart_manager_agent(user_id)
-        self.recipe_agent = recipe_shopping_agent.initialize_recipe_agent(user_id)
-        
-        # Initialize cart
-        self.cart: List[schemas.CartOut] = []
-        
-        # Initialize the agent workflow graph
-        self.workflow = self._build_workflow()
-    
-    def _build_workflow(self) -> StateGraph:
-        """Build the agent workflow graph."""
-        # Create the graph with the AgentState
-        workflow = StateGraph(AgentState)
-        
-        # Add nodes for router and each specialized agent
-        workflow.add_node("router", self._route_to_agent)
-        workflow.add_node("shopping-list", self._run_shopping_list_agent)
-        workflow.add_node("cart-manager", self._run_cart_manager_agent)
-        workflow.add_node("recipe-shopping", self._run_recipe_agent)
-        workflow.add_node("human_review", self._human_review)
-        
-        # Define the edges
-        workflow.add_edge(START, "router")
-        
-        # Remove the direct edges and only use conditional edges from router
-        workflow.add_conditional_edges(
-            "router",
-            lambda state: state["current_agent"],
-            {
-                "shopping-list": "shopping-list",
-                "cart-manager": "cart-manager",
-                "recipe-shopping": "recipe-shopping",
-                "end": END  # Handle end of conversation
-            }
-        )
-        
-        # Add edges from agents to human review
-        workflow.add_edge("shopping-list", "human_review")
-        workflow.add_edge("cart-manager", "human_review")
-        workflow.add_edge("recipe-shopping", "human_review")
-        
-        # Change this line - don't loop back to router, use conditional edge instead
-        # workflow.add_edge("human_review", "router")
-        
-        # Add conditional edge from human_review to either END or router based on should_end flag
-        workflow.add_conditional_edges(
-            "human_review",
-            lambda state: state.get("should_end", False),
-            {
-                True: END,
-                False: "router"
-            }
-        )
-        
-        return workflow.compile()
-    def _human_review(self, state: AgentState) -> AgentState:
-        """Format agent output as JSON for frontend and return updated state."""
-        agent_output = state.get("output", "No output available")
-        
-        # Check if this is the end of the conversation
-        should_end = False
-        if state.get("current_agent") == "end":
-            should_end = True
-        
-        # Also check output for end conversation indicators
-        end_phrases = ["goodbye", "bye", "thanks", "thank you", "exit", "quit", "end conversation"]
-        if any(phrase in agent_output.lower() for phrase in end_phrases):
-            should_end = True
-        
-        # Generate structured JSON for frontend
-        output_data = self._display_output_to_human(agent_output, state)
-        
-        # If ending, add a flag to the output data
-        if should_end:
-            output_data["conversation_ended"] = True
-        
-        # Return the updated state with output_data and should_end flag
-        return {**state, "output_data": output_data, "should_end": should_end}
-
-    def _get_human_feedback(self):
-        """Get feedback from the human."""
-        # In a real application, this would be handled by the UI
-        # For console-based testing:
-        feedback = input("Your response (leave empty to end conversation): ")
-        if feedback.strip() == "":
-            return None
-        return feedback
-
-    def _display_output_to_human(self, output: str, state: AgentState) -> Dict[str, Any]:
-        """Format the agent's output as JSON for the frontend."""
-        # Extract any structured data from the output
-        structured_data = self._extract_structured_data(output)
-
-        # Create a response object that can be consumed by the frontend
-        response = {
-        "type": "agent_response",
-        "text_content": output,
-        "structured_data": structured_data,
-        "timestamp": datetime.now().isoformat(),
-        "agent_type": state.get("current_agent", "unknown"),
-        "requires_feedback": True,
-        "conversation_id": hash(tuple(str(m) for m in self.messages)) % 10000  # Simple unique ID
-        }
-        
-        # For debugging only
-        print(f"Agent response: {output[:100]}...")
-        
-        return response
-
-    def _extract_structured_data(self, output: str) -> Dict[str, Any]:
-        """Extract structured data from agent output text."""
-        data = {
-            "detected_entities": [],
-            "warnings": [],
-            "suggestions": []
-        }
-        
-        # Extract shopping items if present
-        import re
-        list_items = re.findall(r'[-•]\s*([^\n]+)', output)
-        if list_items:
-            data["detected_entities"] = [{"type": "list_item", "value": item.strip()} for item in list_items]
-        
-        # Extract warnings
-        warnings = re.findall(r'⚠️([^\n]+)|Warning:([^\n]+)', output)
-        if warnings:
-            data["warnings"] = [w[0] or w[1] for w in warnings]
-        
-        # Extract prices or budget information
-        prices = re.findall(r'\$(\d+\.\d{2})', output)
-        if prices:
-            data["price_mentions"] = [float(price) for price in prices]
-        
-        # Try to identify if this is a shopping list
-        if any(keyword in output.lower() for keyword in ["shopping list", "items to buy", "purchase"]):
-            data["content_type"] = "shopping_list"
-        # Check if it's a recipe
-        elif any(keyword in output.lower() for keyword in ["recipe", "ingredients", "instructions"]):
-            data["content_type"] = "recipe"
-        # Check if it's a cart update
-        elif any(keyword in output.lower() for keyword in ["cart", "added", "removed", "updated"]):
-            data["content_type"] = "cart_update"
-        else:
-            data["content_type"] = "general_response"
-        
-        return data
-
-    #Core Router of SuperAgent...........................................................................
-    def _route_to_agent(self, state: AgentState) -> AgentState:
-        """Route the message to the appropriate agent with enhanced context understanding."""
-        if not state["messages"]:
-            return {"current_agent": "shopping-list", **state}
-        
-        message = state["messages"][-1]
-        message_content = message.content if hasattr(message, "content") else str(message)
-        
-        # Get conversation context from recent messages
-        recent_messages = list(self.messages)[-3:]  # Last 3 messages for context
-        context = "\n".join([f"User: {msg.content}" for msg in recent_messages if hasattr(msg, 'content')])
-        
-        # Enhanced routing prompt with examples
-        prompt = PromptTemplate(
-            template="""Analyze the user message and conversation context to determine the best agent:
+_agents: Dict[str, AgentExecutor] = {}
+_agents_lock = threading.Lock()
+
+
+def _build_agent(name: str) -> AgentExecutor:
+    if name == "shopping-list":
+        import shopinglist_react_agent
+        return shopinglist_react_agent.initialize_react_agent(llm)
+    if name == "cart-manager":
+        import cartmanager_agent
+        return cartmanager_agent.initialize_cart_manager_agent()
+    if name == "recipe-shopping":
+        import recipe_shopping_agent
+        return recipe_shopping_agent.build_recipe_agent(llm)
+    raise ValueError(f"Unknown agent: {name}")
+
+
+def get_agent(name: str) -> AgentExecutor:
+    """Return the shared executor for a sub-agent, building it on first use."""
+    agent = _agents.get(name)
+    if agent is None:
+        with _agents_lock:
+            agent = _agents.get(name)
+            if agent is None:
+                agent = _build_agent(name)
+                _agents[name] = agent
+    return agent
+
+
+# Workflow nodes..............................................................................................
+
+def _last_message_content(state: AgentState) -> str:
+    message = state["messages"][-1]
+    return message.content if hasattr(message, "content") else str(message)
+
+
+def _conversation_id(messages: List[BaseMessage]) -> int:
+    return hash(tuple(str(m) for m in messages)) % 10000  # Simple unique ID
+
+
+# Enhanced routing prompt with examples
+ROUTER_PROMPT = PromptTemplate(
+    template="""Analyze the user message and conversation context to determine the best agent:
 
     Context (recent conversation):
     {context}
@@ -222,7 +112,7 @@ class SuperAgent:
 
     Choose the appropriate agent:
 
-    1. SHOPPING-LIST AGENT: For creating, managing, or updating shopping lists, meal planning, 
+    1. SHOPPING-LIST AGENT: For creating, managing, or updating shopping lists, meal planning,
     adding items to lists, organizing groceries, dietary requirements
     Examples: "Add milk to my list", "Create a weekly meal plan", "I need ingredients for pasta"
 
@@ -233,113 +123,422 @@ class SuperAgent:
     3. RECIPE-SHOPPING AGENT: For finding recipes, getting cooking instructions, recipe recommendations,
     ingredient substitutions, cooking tips
     Examples: "Find a recipe for dinner", "How do I make lasagna?", "Suggest vegetarian recipes"
-    
+
     4. If unsure, default to the shopping list agent.
-    
+
     5. If user wants to end the conversation, respond with "END".
 
     Respond with just the agent name: shopping-list, cart-manager, or recipe-shopping or END """,
-            input_variables=["message", "context"]
-        )
-        
-        formatted_prompt = prompt.format(message=message_content, context=context)
-        response = llm.predict(formatted_prompt).strip().lower()
-        
-        # Parse response more robustly
-        if "shopping-list" in response or "shopping" in response:
-            current_agent = "shopping-list"
-        elif "cart-manager" in response or "cart" in response:
-            current_agent = "cart-manager"
-        elif "recipe-shopping" in response or "recipe" in response:
-            current_agent = "recipe-shopping"
-        elif "end" in response or "END" in response or "stop" in response:
-            current_agent = "end"
-        else:
-            # Fallback routing based on keywords
-            message_lower = message_content.lower()
-            if any(word in message_lower for word in ["cart", "add to cart", "remove from cart", "checkout"]):
-                current_agent = "cart-manager"
-            elif any(word in message_lower for word in ["recipe", "cook", "ingredient", "how to make"]):
-                current_agent = "recipe-shopping"
-            else:
-                current_agent = "shopping-list"  # Default
-        
-        return {**state, "current_agent": current_agent}
-    # Specialized agent methods..................................................................................
-    
-    def _run_shopping_list_agent(self, state: AgentState) -> AgentState:
-        """Run the shopping list agent."""
-        message = state["messages"][-1]
-        message_content = message.content if hasattr(message, "content") else str(message)
-        
-        response = self.shopping_list_agent.invoke({
-            "input": message_content,
+    input_variables=["message", "context"]
+)
+
+
+def _llm_route(message_content: str, context: str) -> str:
+    """Ask the LLM which agent should handle the message. Used for low-confidence messages only."""
+    formatted_prompt = ROUTER_PROMPT.format(message=message_content, context=context)
+    response = llm.predict(formatted_prompt).strip().lower()
+
+    # Parse response more robustly
+    if "shopping-list" in response or "shopping" in response:
+        return "shopping-list"
+    elif "cart-manager" in response or "cart" in response:
+        return "cart-manager"
+    elif "recipe-shopping" in response or "recipe" in response:
+        return "recipe-shopping"
+    elif "end" in response or "stop" in response:
+        return "end"
+    # Fallback routing based on keywords
+    message_lower = message_content.lower()
+    if any(word in message_lower for word in ["cart", "add to cart", "remove from cart", "checkout"]):
+        return "cart-manager"
+    elif any(word in message_lower for word in ["recipe", "cook", "ingredient", "how to make"]):
+        return "recipe-shopping"
+    return "shopping-list"  # Default
+
+
+# Rules and a local classifier handle most messages; the LLM is asked only when unsure
+intent_router = IntentRouter(llm_fallback=_llm_route)
+
+
+#Core Router of SuperAgent...........................................................................
+def route_to_agent(state: AgentState) -> AgentState:
+    """Route the message to the appropriate agent with enhanced context understanding."""
+    if not state["messages"]:
+        return {**state, "current_agent": "shopping-list"}
+
+    message_content = _last_message_content(state)
+
+    # Get conversation context from recent messages
+    recent_messages = state["messages"][-3:]  # Last 3 messages for context
+    context = "\n".join([f"User: {msg.content}" for msg in recent_messages if hasattr(msg, 'content')])
+
+    with tracer.span("router", "router") as span:
+        decision = intent_router.route(message_content, context)
+        span.set(agent=decision.agent, source=decision.source, confidence=round(decision.confidence, 3))
+    return {**state, "current_agent": decision.agent}
+
+
+# Specialized agent nodes..................................................................................
+
+def run_shopping_list_agent(state: AgentState) -> AgentState:
+    """Run the shopping list agent."""
+    with tracer.span("shopping-list", "agent"):
+        response = get_agent("shopping-list").invoke({
+            "input": _last_message_content(state),
             "agent_scratchpad": ""
-        })
-        
-        return {**state, "output": response["output"]}
-    
-    def _run_cart_manager_agent(self, state: AgentState) -> AgentState:
-        """Run the cart manager agent."""
-        message = state["messages"][-1]
-        message_content = message.content if hasattr(message, "content") else str(message)
-        
-        response = self.cart_manager_agent.run_cart_manager(message_content, state["user_id"], self.cart_manager_agent)
-        
-        return {**state, "output": response}
-    
-    def _run_recipe_agent(self, state: AgentState) -> AgentState:
-        """Run the recipe shopping agent."""
-        message = state["messages"][-1]
-        message_content = message.content if hasattr(message, "content") else str(message)
-        
-        response = self.recipe_agent.invoke({
-            "input": message_content,
+        }, config={"callbacks": tracing_callbacks()})
+    return {**state, "output": response["output"]}
+
+
+def run_cart_manager_agent(state: AgentState) -> AgentState:
+    """Run the cart manager agent."""
+    import cartmanager_agent
+    with tracer.span("cart-manager", "agent") as span:
+        response = cartmanager_agent.run_cart_manager(
+            _last_message_content(state), state["user_id"], get_agent("cart-manager")
+        )
+        span.set(fast_path=bool(response.get("fast_path")))
+    return {**state, "output": response["response"]}
+
+
+def run_recipe_agent(state: AgentState) -> AgentState:
+    """Run the recipe shopping agent."""
+    with tracer.span("recipe-shopping", "agent"):
+        response = get_agent("recipe-shopping").invoke({
+            "input": _last_message_content(state),
             "agent_scratchpad": ""
-        })
-        
-        return {**state, "output": response["output"]}
-    
-    
+        }, config={"callbacks": tracing_callbacks()})
+    return {**state, "output": response["output"]}
+
+
+AGENT_NODES = {
+    "shopping-list": run_shopping_list_agent,
+    "cart-manager": run_cart_manager_agent,
+    "recipe-shopping": run_recipe_agent,
+}
+
+
+def run_plan_and_execute(state: AgentState) -> AgentState:
+    """
+    Plan the independent tool calls of a multi-lookup request, run them concurrently
+    and answer from the results. Falls back to the routed agent when nothing can be planned.
+    """
+    message = _last_message_content(state)
+    with tracer.span("plan-and-execute", "agent") as span:
+        plan = tool_planner.make_plan(llm, message, state["user_id"])
+        span.set(steps=len(plan))
+        if plan:
+            results = tool_planner.execute_plan(plan, state["user_id"])
+            output = tool_planner.answer(llm, message, results)
+    if not plan:
+        return AGENT_NODES[state["current_agent"]](state)
+
+    steps = [
+        {"tool": result.call.tool, "input": result.call.input, "seconds": round(result.seconds, 3)}
+        for result in results
+    ]
+    return {**state, "output": output, "plan": steps}
+
+
+def _next_node(state: AgentState) -> str:
+    agent = state["current_agent"]
+    if agent != "end" and state["messages"] and tool_planner.should_plan(_last_message_content(state)):
+        return "planner"
+    return agent
+
+
+def human_review(state: AgentState) -> AgentState:
+    """Format agent output as JSON for frontend and return updated state."""
+    agent_output = state.get("output") or "No output available"
+
+    # Check if this is the end of the conversation
+    should_end = state.get("current_agent") == "end"
+
+    # Also check output for end conversation indicators
+    end_phrases = ["goodbye", "bye", "thanks", "thank you", "exit", "quit", "end conversation"]
+    if any(phrase in agent_output.lower() for phrase in end_phrases):
+        should_end = True
+
+    # Generate structured JSON for frontend
+    output_data = display_output_to_human(agent_output, state)
+
+    # If ending, add a flag to the output data
+    if should_end:
+        output_data["conversation_ended"] = True
+
+    return {**state, "output_data": output_data, "should_end": should_end}
+
+
+def display_output_to_human(output: str, state: AgentState) -> Dict[str, Any]:
+    """Format the agent's output as JSON for the frontend."""
+    # Create a response object that can be consumed by the frontend
+    response = {
+        "type": "agent_response",
+        "text_content": output,
+        "structured_data": extract_structured_data(output),
+        "timestamp": datetime.now().isoformat(),
+        "agent_type": state.get("current_agent", "unknown"),
+        "requires_feedback": True,
+        "conversation_id": _conversation_id(state["messages"])
+    }
+    if state.get("plan"):
+        response["tool_calls"] = state["plan"]
+
+    # For debugging only
+    print(f"Agent response: {output[:100]}...")
+
+    return response
+
+
+def extract_structured_data(output: str) -> Dict[str, Any]:
+    """Extract structured data from agent output text."""
+    data = {
+        "detected_entities": [],
+        "warnings": [],
+        "suggestions": []
+    }
+
+    # Extract shopping items if present
+    list_items = re.findall(r'[-•]\s*([^\n]+)', output)
+    if list_items:
+        data["detected_entities"] = [{"type": "list_item", "value": item.strip()} for item in list_items]
+
+    # Extract warnings
+    warnings = re.findall(r'⚠️([^\n]+)|Warning:([^\n]+)', output)
+    if warnings:
+        data["warnings"] = [w[0] or w[1] for w in warnings]
+
+    # Extract prices or budget information
+    prices = re.findall(r'\$(\d+\.\d{2})', output)
+    if prices:
+        data["price_mentions"] = [float(price) for price in prices]
+
+    # Try to identify if this is a shopping list
+    if any(keyword in output.lower() for keyword in ["shopping list", "items to buy", "purchase"]):
+        data["content_type"] = "shopping_list"
+    # Check if it's a recipe
+    elif any(keyword in output.lower() for keyword in ["recipe", "ingredients", "instructions"]):
+        data["content_type"] = "recipe"
+    # Check if it's a cart update
+    elif any(keyword in output.lower() for keyword in ["cart", "added", "removed", "updated"]):
+        data["content_type"] = "cart_update"
+    else:
+        data["content_type"] = "general_response"
+
+    return data
+
+
+def build_workflow():
+    """Build the agent workflow graph."""
+    # Create the graph with the AgentState
+    workflow = StateGraph(AgentState)
+
+    # Add nodes for router and each specialized agent
+    workflow.add_node("router", route_to_agent)
+    workflow.add_node("shopping-list", run_shopping_list_agent)
+    workflow.add_node("cart-manager", run_cart_manager_agent)
+    workflow.add_node("recipe-shopping", run_recipe_agent)
+    workflow.add_node("planner", run_plan_and_execute)
+    workflow.add_node("human_review", human_review)
+
+    workflow.add_edge(START, "router")
+    # multi-lookup requests go to plan-and-execute, which falls back to the routed agent
+    workflow.add_conditional_edges(
+        "router",
+        _next_node,
+        {
+            "planner": "planner",
+            "shopping-list": "shopping-list",
+            "cart-manager": "cart-manager",
+            "recipe-shopping": "recipe-shopping",
+            "end": END  # Handle end of conversation
+        }
+    )
+
+    # Add edges from agents to human review
+    workflow.add_edge("shopping-list", "human_review")
+    workflow.add_edge("cart-manager", "human_review")
+    workflow.add_edge("recipe-shopping", "human_review")
+    workflow.add_edge("planner", "human_review")
+
+    # One invocation is one turn: the user's feedback arrives as the next message,
+    # so human review always ends the run (looping back would re-answer the same message)
+    workflow.add_edge("human_review", END)
+
+    return workflow.compile()
+
+
+_workflow = None
+_workflow_lock = threading.Lock()
+
+
+def get_workflow():
+    """Return the compiled workflow shared by all sessions, compiling it on first use."""
+    global _workflow
+    if _workflow is None:
+        with _workflow_lock:
+            if _workflow is None:
+                if tracer.enabled:
+                    from backend.app import database
+                    tracer.instrument_engine(database.engine)
+                _workflow = build_workflow()
+    return _workflow
+
+
+# Sessions..................................................................................................
+
+class SuperAgent:
+    """
+    Per-user conversation session on top of the shared multi-agent workflow.
+    Holds only the user id and the recent messages; the compiled workflow and the
+    sub-agent executors are shared module-level objects built on first use.
+    """
+
+    __slots__ = ("user_id", "messages", "last_used")
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.messages = deque(maxlen=10)
+        self.last_used = time.monotonic()
+
     # Message handling methods..................................................................................
-    
+
     def add_message(self, message: BaseMessage):
         """Add a message to the queue."""
         self.messages.append(message)
-    
+
+    def restore_context(self, context: Dict[str, Any]):
+        """
+        Seed the message queue from a stored conversation, e.g. after a reconnect.
+        `context` is what backend.app.utils.chat_history.load_context_window returns:
+        the last turns oldest first, plus an optional summary of earlier messages.
+        """
+        self.messages.clear()
+        rows = context.get("messages", [])
+        if context.get("summary"):
+            self.messages.append(SystemMessage(content=context["summary"]))
+            # keep the summary from being pushed out of the bounded queue
+            rows = rows[-(self.messages.maxlen - 1):]
+        for row in rows:
+            sender = getattr(row.sender, "value", row.sender)
+            if sender == "user":
+                self.messages.append(HumanMessage(content=row.message))
+            else:
+                self.messages.append(AIMessage(content=row.message))
+
     def process_message(self, message: str) -> Dict[str, Any]:
         """Process a message through the agent workflow and return JSON response."""
-        # Create a human message from the input string
-        human_message = HumanMessage(content=message)
-        
-        # Add the message to the queue
-        self.add_message(human_message)
-        
+        self.last_used = time.monotonic()
+        self.add_message(HumanMessage(content=message))
+
         # Initialize the state for the workflow
         initial_state = AgentState(
             messages=list(self.messages),  # Convert deque to list
             user_id=self.user_id,
             current_agent=None,
             output=None,
-            output_data=None  # Add output_data field
+            output_data=None,
+            should_end=False,
+            plan=None
         )
-        
-        # Run the workflow
-        final_state = self.workflow.invoke(initial_state)
-        
+
+        with tracer.span("turn", "turn", user_id=self.user_id) as span:
+            final_state = get_workflow().invoke(initial_state)
+            span.set(agent=str(final_state.get("current_agent")))
+
+        if final_state.get("output"):
+            self.add_message(AIMessage(content=final_state["output"]))
+
         # Return the structured JSON response
-        if "output_data" in final_state and final_state["output_data"]:
+        if final_state.get("output_data"):
             return final_state["output_data"]
-        else:
-            # Fallback if output_data wasn't set
-            return {
-                "type": "agent_response",
-                "text_content": final_state.get("output", "No output generated"),
-                "structured_data": {},
-                "timestamp": datetime.now().isoformat(),
-                "agent_type": final_state.get("current_agent", "unknown"),
-                "requires_feedback": True,
-                "conversation_id": hash(tuple(str(m) for m in self.messages)) % 10000
-            }
-    
-   
+        # Fallback if output_data wasn't set
+        return {
+            "type": "agent_response",
+            "text_content": final_state.get("output") or "No output generated",
+            "structured_data": {},
+            "timestamp": datetime.now().isoformat(),
+            "agent_type": final_state.get("current_agent", "unknown"),
+            "requires_feedback": True,
+            "conversation_id": _conversation_id(list(self.messages))
+        }
+
+
+class SessionPool:
+    """
+    LRU pool of SuperAgent sessions with an idle TTL.
+    get() returns the user's live session or creates one; creating a session is
+    just allocating the small SuperAgent object, optionally seeded from stored history.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[int, SuperAgent]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, user_id: int, context_loader: Optional[Callable[[int], Dict[str, Any]]] = None) -> SuperAgent:
+        """
+        Return the session for user_id, creating it if missing or expired.
+        context_loader(user_id), if given, is called for new sessions and its result
+        passed to SuperAgent.restore_context (e.g. a chat_history.load_context_window wrapper).
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and now - session.last_used <= self.ttl_seconds:
+                session.last_used = now
+                self._sessions.move_to_end(user_id)
+                return session
+
+        session = SuperAgent(user_id)
+        if context_loader is not None:
+            session.restore_context(context_loader(user_id))
+
+        with self._lock:
+            # another thread may have created it meanwhile; keep the first one
+            existing = self._sessions.get(user_id)
+            if existing is not None and now - existing.last_used <= self.ttl_seconds:
+                self._sessions.move_to_end(user_id)
+                return existing
+            self._sessions[user_id] = session
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def drop(self, user_id: int):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def evict_expired(self) -> int:
+        """Drop sessions idle longer than the TTL. Returns how many were dropped."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [user_id for user_id, session in self._sessions.items() if session.last_used < cutoff]
+            for user_id in expired:
+                del self._sessions[user_id]
+        return len(expired)
+
+
+session_pool = SessionPool()
+
+
+# ------------------ Main Function for testing --------------------
+if __name__ == "__main__":
+    # Session start cost and memory per session; no model calls are made
+    import tracemalloc
+
+    count = 10000
+    tracemalloc.start()
+    started = time.perf_counter()
+    for user_id in range(count):
+        session_pool.get(user_id).add_message(HumanMessage(content="add 2 apples to my cart"))
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{count} sessions in {elapsed * 1000:.1f} ms ({elapsed / count * 1e6:.1f} us each), "
+          f"{current / count / 1024:.2f} KB per session")
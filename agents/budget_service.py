@@ -0,0 +1,165 @@
+"""
+Shopping-list budget checks against live catalogue prices and stock.
+
+A whole list ("2 milk", "1 lb ground beef", "bread") is resolved in one go:
+item names are matched through the ingredient alias index, and the price and
+stock of every candidate product are read with a single query. Each item's
+candidates become one row of a cost matrix (price x packs needed, inf where
+out of stock), so the chosen cost, the cheapest alternative and the saving per
+item are plain numpy reductions; if the list is over budget, the swaps with the
+largest savings are suggested until it fits.
+
+    python agents/budget_service.py 25 "2 milk" "1 lb ground beef" "bread" "6 eggs"
+"""
+import argparse
+import time
+from typing import Any, Dict, Iterable, Union
+
+import numpy as np
+
+from ingredient_matcher import MIN_CONFIDENCE, get_ingredient_index, packs_needed, parse_ingredient
+
+
+def plan_budget(costs: np.ndarray, chosen: np.ndarray, budget: float) -> Dict[str, Any]:
+    """
+    Totals and cheapest swaps for a cost matrix.
+
+    Args:
+        costs: items x candidates matrix of line costs, np.inf where unavailable
+        chosen: index of the chosen candidate per item
+        budget: spending limit
+
+    Returns:
+        {"total", "cheapest_index", "cheapest_total", "swaps" (item indexes, biggest saving first),
+         "total_after_swaps"}
+    """
+    rows = np.arange(costs.shape[0])
+    chosen_costs = costs[rows, chosen]
+    cheapest_index = np.argmin(costs, axis=1)
+    cheapest_costs = costs[rows, cheapest_index]
+    savings = chosen_costs - cheapest_costs
+    total = float(chosen_costs.sum())
+
+    order = np.argsort(-savings, kind="stable")
+    order = order[savings[order] > 0]
+    swaps = order[:0]
+    if total > budget and order.size:
+        # fewest swaps whose combined saving brings the total within budget (or all of them)
+        needed = np.searchsorted(np.cumsum(savings[order]), total - budget) + 1
+        swaps = order[:needed]
+    return {
+        "total": total,
+        "cheapest_index": cheapest_index,
+        "cheapest_total": float(cheapest_costs.sum()),
+        "swaps": swaps,
+        "total_after_swaps": total - float(savings[swaps].sum()),
+    }
+
+
+def check_budget(items: Iterable[Union[str, Dict[str, Any]]], budget: float, db=None) -> Dict[str, Any]:
+    """
+    Resolve a shopping list to in-stock products and check it against a budget.
+    Returns the priced items, items with no match, totals and suggested cheaper swaps.
+    """
+    from backend.app import database, models
+    from sqlalchemy.orm import load_only
+
+    index = get_ingredient_index()
+    parsed = [parse_ingredient(item) for item in items]
+    candidates = [index.candidates(ingredient.name)[1] for ingredient in parsed]
+    candidate_ids = {product_id for found in candidates for product_id, confidence in found if confidence >= MIN_CONFIDENCE}
+
+    products = {}
+    if candidate_ids:
+        own_session = db is None
+        db = db or database.SessionLocal()
+        try:
+            products = {
+                product.id: product
+                for product in db.query(models.Product)
+                .options(load_only(models.Product.id, models.Product.name, models.Product.price, models.Product.stock))
+                .filter(models.Product.id.in_(candidate_ids), models.Product.for_sale == True)
+            }
+        finally:
+            if own_session:
+                db.close()
+
+    # one row per matched item: its available candidates, best match first
+    matched, missing, rows = [], [], []
+    for ingredient, found in zip(parsed, candidates):
+        row = []
+        for product_id, confidence in sorted(found, key=lambda item: -item[1]):
+            product = products.get(product_id)
+            if product is None or confidence < MIN_CONFIDENCE:
+                continue
+            quantity = packs_needed(ingredient, product.name)
+            if product.stock >= quantity:
+                row.append((product, quantity))
+        if row:
+            matched.append(ingredient)
+            rows.append(row)
+        else:
+            missing.append(ingredient.text)
+
+    result = {
+        "budget": budget,
+        "items": [],
+        "missing": missing,
+        "total": 0.0,
+        "within_budget": True,
+        "suggestions": [],
+        "total_after_suggestions": 0.0,
+    }
+    if not rows:
+        return result
+
+    width = max(len(row) for row in rows)
+    costs = np.full((len(rows), width), np.inf)
+    for i, row in enumerate(rows):
+        costs[i, :len(row)] = [float(product.price) * quantity for product, quantity in row]
+    plan = plan_budget(costs, np.zeros(len(rows), dtype=int), budget)
+
+    for i, (ingredient, row) in enumerate(zip(matched, rows)):
+        product, quantity = row[0]
+        result["items"].append({
+            "item": ingredient.text,
+            "product_id": product.id,
+            "product_name": product.name,
+            "quantity": quantity,
+            "unit_price": float(product.price),
+            "cost": round(float(costs[i, 0]), 2),
+        })
+    for i in plan["swaps"]:
+        product, quantity = rows[i][plan["cheapest_index"][i]]
+        result["suggestions"].append({
+            "item": matched[i].text,
+            "instead_of": rows[i][0][0].name,
+            "product_id": product.id,
+            "product_name": product.name,
+            "quantity": quantity,
+            "cost": round(float(costs[i, plan["cheapest_index"][i]]), 2),
+            "saves": round(float(costs[i, 0] - costs[i, plan["cheapest_index"][i]]), 2),
+        })
+    result["total"] = round(plan["total"], 2)
+    result["within_budget"] = plan["total"] <= budget
+    result["total_after_suggestions"] = round(plan["total_after_swaps"], 2)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("budget", type=float)
+    parser.add_argument("items", nargs="+")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = check_budget(args.items, args.budget)
+    elapsed = (time.perf_counter() - started) * 1000
+    for item in report["items"]:
+        print(f"  {item['item']!r:28} {item['quantity']} x {item['product_name']:<32} ${item['cost']:.2f}")
+    for suggestion in report["suggestions"]:
+        print(f"  swap {suggestion['instead_of']!r} -> {suggestion['product_name']!r} saves ${suggestion['saves']:.2f}")
+    if report["missing"]:
+        print(f"  not found: {', '.join(report['missing'])}")
+    print(f"total ${report['total']:.2f} / ${args.budget:.2f}"
+          f" (after swaps ${report['total_after_suggestions']:.2f}) in {elapsed:.1f} ms")
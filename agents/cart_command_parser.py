@@ -0,0 +1,192 @@
+"""
+Rule-based parser for simple voice cart commands.
+
+Unambiguous commands are turned into a CartCommand without an LLM call:
+
+    "add 2 apples and a loaf of bread"   -> add    [(apple, 2), (bread, 1)]
+    "remove the milk from my cart"       -> remove [(milk, None)]
+    "change bananas to 6"                -> update [(banana, 6)]
+    "what's in my cart"                  -> show
+
+Anything else (questions, comparisons, checkout, recipes, "or", conditions,
+weights and volumes like "3 kg of rice", fractions like "1.5 apples", a bare
+number like "add 5", and "take 2 apples", which usually means add) returns None
+and is left to the cart manager's ReAct agent. "and" only splits items when the
+phrase is not itself a product ("mac and cheese"). The parser only reads text;
+cartmanager_agent.run_cart_fast_path resolves and executes commands.
+
+    python agents/cart_command_parser.py "add two cartons of milk" "which milk is cheapest?"
+"""
+import re
+import sys
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from keyword_cache import normalize_term
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "a couple of": 2, "a dozen": 12,
+    "couple of": 2, "dozen": 12, "half a dozen": 6,
+}
+MAX_QUANTITY = 50
+
+# containers between a quantity and the product: "2 cartons of milk", "a loaf of bread"
+_CONTAINERS = (
+    r"(?:(?:packs?|packets?|bottles?|cartons?|cans?|tins?|jars?|bags?|boxes|box|loaf|loaves|"
+    r"bunch(?:es)?|pieces?|units?)\s+of\s+)?"
+)
+# an amount by weight or volume ("3 kg of rice", "2 x 500g rice") is not a pack count
+_MEASURE = re.compile(
+    r"\b\d+(?:\.\d+)?\s*(?:kg|g|mg|ml|l|cl|lbs?|oz)\b|\b(?:kilos?|kilograms?|grams?|pounds?|ounces?|"
+    r"litres?|liters?|millilitres?|milliliters?|gallons?|pints?)\b"
+)
+# only whole packs: "1.5 apples", "half a melon" (but "half a dozen eggs", "half and half" are fine)
+_FRACTION = re.compile(r"\d\s*[./]\s*\d|\b(?:half|quarter)\s+(?:a|an|of)\b(?!\s+dozen)|\ba half\b")
+_QUANTITY = re.compile(
+    r"^(?P<quantity>\d+|" + "|".join(sorted((re.escape(w) for w in NUMBER_WORDS), key=len, reverse=True)) + r")\s+"
+    + r"(?:x\s+)?" + _CONTAINERS
+)
+_CART = r"(?:\s+(?:to|in|into|from|out of|off)\s+(?:my\s+|the\s+)?(?:shopping\s+)?(?:cart|basket|trolley))?"
+_POLITE = re.compile(r"^(?:(?:please|can you|could you|would you|hey|ok|okay)\s+)+|\s+(?:please|thanks|thank you)$")
+
+_SHOW = re.compile(
+    r"^(?:(?:show|view|display|list|see|check|open|read)(?:\s+me)?\s+(?:what'?s in\s+)?(?:my|the)\s+(?:shopping\s+)?(?:cart|basket)"
+    r"|what'?s in (?:my|the) (?:cart|basket)|what is in (?:my|the) (?:cart|basket)|(?:my )?(?:cart|basket))$"
+)
+_ADD = re.compile(r"^(?:add|put|throw in|throw|buy|grab)\s+(?P<rest>.+?)" + _CART + r"$")
+# not a bare "take": "take 2 apples" usually means "I'll take 2 apples"
+_REMOVE = re.compile(r"^(?:remove|delete|take out|drop)\s+(?P<rest>.+?)" + _CART + r"$")
+_UPDATE = re.compile(
+    r"^(?:change|set|update|make)\s+(?:the\s+)?(?:quantity\s+of\s+|number\s+of\s+)?(?P<name>.+?)"
+    + _CART + r"\s+(?:quantity\s+)?to\s+(?P<quantity>\d+|" + "|".join(re.escape(w) for w in NUMBER_WORDS) + r")$"
+)
+_COMMA = re.compile(r"\s*,\s*(?:and\s+)?")
+_AND = re.compile(r"(\s+and\s+|\s+plus\s+)")
+_ARTICLES = re.compile(r"^(?:the|some|more|another|a|an|my)\s+")
+
+# words that mean the request needs reasoning, not a lookup
+_COMPLEX = re.compile(
+    r"\?|\b(?:or|which|cheapest|cheaper|best|recommend|suggest|compare|instead|if|unless|checkout|check out|"
+    r"order|pay|recipe|cook|make (?:a|some)|for (?:dinner|lunch|breakfast)|budget|vegan|allerg\w*|except|all|"
+    r"everything|ingredients?|stuff|things|back|account|profile|address|password)\b"
+)
+
+
+class ItemMention(NamedTuple):
+    name: str                # normalised, e.g. "apple"
+    quantity: Optional[int]  # None when not said
+    text: str                # as said, e.g. "2 apples"
+
+
+class CartCommand(NamedTuple):
+    action: str              # "add", "remove", "update" or "show"
+    items: List[ItemMention]
+
+
+# products whose name contains "and"; callers can recognise more through parse_command(is_product=...)
+COMPOUND_NAMES = frozenset(
+    normalize_term(name) for name in (
+        "mac and cheese", "macaroni and cheese", "fish and chips", "salt and vinegar", "salt and pepper",
+        "sweet and sour", "half and half", "peanut butter and jelly", "bangers and mash", "rice and peas",
+    )
+)
+
+
+def _quantity(word: str) -> Optional[int]:
+    return int(word) if word.isdigit() else NUMBER_WORDS.get(word)
+
+
+def _mention(text: str) -> Optional[ItemMention]:
+    text = text.strip()
+    quantity = None
+    match = _QUANTITY.match(text)
+    if match:
+        quantity = _quantity(match.group("quantity"))
+        rest = text[match.end():]
+    else:
+        rest = _ARTICLES.sub("", text)
+    name = normalize_term(rest)
+    if not name or name in ("cart", "basket", "it", "them") or len(name.split()) > 4:
+        return None
+    if not any(char.isalpha() for char in name):
+        return None  # "add 5": a number, not a product
+    if quantity is not None and not 0 < quantity <= MAX_QUANTITY:
+        return None
+    return ItemMention(name, quantity, text)
+
+
+def _split_and(part: str, is_product: Callable[[str], bool]) -> List[str]:
+    """Split on "and"/"plus", keeping the longest runs that together name a product."""
+    tokens = _AND.split(part)
+    pieces, separators = tokens[0::2], tokens[1::2]
+    items, start = [], 0
+    while start < len(pieces):
+        end = start + 1
+        for stop in range(len(pieces), start + 1, -1):
+            phrase = "".join(piece + separator for piece, separator in zip(pieces[start:stop], separators[start:stop - 1]))
+            phrase += pieces[stop - 1]
+            mention = _mention(phrase)
+            if mention is not None and is_product(mention.name):
+                end = stop
+                break
+        items.append("".join(piece + separator for piece, separator in zip(pieces[start:end], separators[start:end - 1]))
+                     + pieces[end - 1])
+        start = end
+    return items
+
+
+def _mentions(rest: str, is_product: Callable[[str], bool]) -> Optional[List[ItemMention]]:
+    parts = [item for part in _COMMA.split(rest) if part.strip() for item in _split_and(part, is_product)]
+    mentions = [_mention(part) for part in parts if part.strip()]
+    if not mentions or any(mention is None for mention in mentions):
+        return None
+    return mentions
+
+
+def parse_command(text: str, is_product: Optional[Callable[[str], bool]] = None) -> Optional[CartCommand]:
+    """
+    A CartCommand for a simple, unambiguous cart request, otherwise None.
+    is_product(name), if given, says whether a normalised name is a whole product,
+    so "add fish and chips" stays one item when the catalogue sells it.
+    """
+    text = " ".join(text.lower().replace("’", "'").split()).rstrip(".!")
+    text = _POLITE.sub("", text).strip()
+    if not text:
+        return None
+    if _SHOW.match(text.rstrip("?")):
+        return CartCommand("show", [])
+    if _COMPLEX.search(text) or _MEASURE.search(text) or _FRACTION.search(text):
+        return None
+    known = (lambda name: name in COMPOUND_NAMES or is_product(name)) if is_product else COMPOUND_NAMES.__contains__
+
+    match = _UPDATE.match(text)
+    if match:
+        mention = _mention(match.group("name"))
+        quantity = _quantity(match.group("quantity"))
+        if mention is None or not quantity or quantity > MAX_QUANTITY:
+            return None
+        return CartCommand("update", [mention._replace(quantity=quantity)])
+
+    for action, pattern in (("add", _ADD), ("remove", _REMOVE)):
+        match = pattern.match(text)
+        if match:
+            mentions = _mentions(match.group("rest"), known)
+            return CartCommand(action, mentions) if mentions else None
+    return None
+
+
+if __name__ == "__main__":
+    commands = sys.argv[1:] or [
+        "add 2 apples", "add two cartons of milk and a loaf of bread to my cart", "please remove bread",
+        "show my cart", "what's in my cart?", "change bananas to 6", "set the quantity of milk to 3",
+        "which milk is cheapest?", "add everything for lasagna", "add milk or oat milk", "checkout",
+        "put the milk back", "delete my account", "add mac and cheese and bread", "add fish and chips",
+        "add 2 x 500g rice", "add 3 kg of rice", "take 2 apples", "take out the bread", "add 1.5 apples",
+        "add 5", "add half a dozen eggs",
+    ]
+    for command in commands:
+        started = time.perf_counter()
+        parsed = parse_command(command)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(f"{command!r:58} -> {parsed if parsed else 'LLM agent'}  ({elapsed:.0f} us)")
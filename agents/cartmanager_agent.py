@@ -4,9 +4,14 @@ from langchain_core.tools import tool
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
 from keyword_generator_agent import generate_keywords
+from ingredient_matcher import get_ingredient_index, resolve as resolve_ingredients
+from cart_command_parser import parse_command
+from keyword_cache import normalize_term
+from tool_context import get_user, tool_session, tool_turn
 import json
 import logging
 import sys
+from sqlalchemy.orm import joinedload
 from dotenv import load_dotenv
 import os
 load_dotenv()
@@ -22,6 +27,8 @@ if voicecart_dir not in sys.path:
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from utils.tracing import callbacks as tracing_callbacks
+
 # Now import with the correct relative path
 try:
     from backend.app import schemas, database, models
@@ -32,7 +39,7 @@ try:
         get_cart,
         checkout
     )
-    from backend.app.routers.search import search_products
+    from backend.app.routers.search import search_products, search_products_multi
 except ModuleNotFoundError:
     # Alternative import path if the above doesn't work
     try:
@@ -58,9 +65,9 @@ logger = logging.getLogger(__name__)
 
 # Add the missing get_user_by_id function
 def get_user_by_id(user_id: int, db):
-    """Helper function to get user by ID"""
+    """Helper function to get user by ID (once per agent turn, see tool_context)"""
     try:
-        return db.query(models.User).filter(models.User.id == user_id).first()
+        return get_user(user_id, db)
     except Exception as e:
         logger.error(f"Error getting user by ID {user_id}: {e}")
         return None
@@ -69,15 +76,6 @@ def get_user_by_id(user_id: int, db):
 # 🛠️ Agent Tools
 # -------------------------------
 
-def get_db_session():
-    """Helper function to get database session with proper error handling"""
-    db_gen = database.get_db()
-    try:
-        return next(db_gen)
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
-        raise
-
 @tool
 def agent_cart_adder(cart_item: str, user_id: int) -> str:
     """
@@ -97,8 +95,7 @@ def agent_cart_adder(cart_item: str, user_id: int) -> str:
         else:
             cart_data = cart_item
             
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             user = get_user_by_id(user_id, db)
             if not user:
                 return json.dumps({"error": "User not found", "success": False})
@@ -106,8 +103,6 @@ def agent_cart_adder(cart_item: str, user_id: int) -> str:
             cart_obj = schemas.CartCreate(**cart_data)
             result = add_to_cart(cart_item=cart_obj, db=db, current_user=user)
             return json.dumps({"result": result, "success": True})
-        finally:
-            db.close()
             
     except json.JSONDecodeError as e:
         return json.dumps({"error": f"Invalid JSON format: {e}", "success": False})
@@ -136,27 +131,23 @@ def agent_search_product(product_name: str) -> str:
             pass  # Leave as-is
 
     try:
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             # First, search with the original product name
             results = search_products(query=product_name, db=db)
 
-            # If no results found, try with generated keywords
+            # If no results found, search all generated keywords at once
             if not results:
                 try:
                     print(f"No direct results for '{product_name}', trying keywords...")
-                    keywords = generate_keywords(product_name)
-
-                    for keyword in keywords[:10]:  # Limit to 10 keywords
+                    keywords = []
+                    for keyword in generate_keywords(product_name)[:10]:  # Limit to 10 keywords
+                        if isinstance(keyword, str) and keyword.strip().startswith("{"):
+                            keyword = json.loads(keyword).get("product_name", keyword)
                         if keyword and len(keyword.strip()) > 2:
-                            if isinstance(keyword, str) and keyword.strip().startswith("{"):
-                                keyword = json.loads(keyword).get("product_name", keyword)
-                            print(f"Searching for keyword: {keyword}")
-                            keyword_results = search_products(query=keyword.strip(), db=db)
-                            if keyword_results:
-                                results.extend(keyword_results)
-                                if len(results) >= 10:
-                                    break
+                            keywords.append(keyword.strip())
+                    print(f"Searching for keywords: {keywords}")
+                    # one ranked query for all keywords instead of one search per keyword
+                    results = [product for product, score in search_products_multi(keywords, db=db, limit=10)]
                 except Exception as keyword_error:
                     print(f"Keyword generation failed: {keyword_error}")
 
@@ -194,9 +185,6 @@ def agent_search_product(product_name: str) -> str:
                 "search_term": product_name
             })
 
-        finally:
-            db.close()
-
     except Exception as e:
         logger.error(f"Error searching for product '{product_name}': {e}")
         return json.dumps({"error": str(e), "success": False})
@@ -221,8 +209,7 @@ def agent_update_cart_item(product_id: int, cart_item: str, user_id: int) -> str
         else:
             cart_data = cart_item
             
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             user = get_user_by_id(user_id, db)
             if not user:
                 return json.dumps({"error": "User not found", "success": False})
@@ -230,8 +217,6 @@ def agent_update_cart_item(product_id: int, cart_item: str, user_id: int) -> str
             cart_obj = schemas.CartCreate(**cart_data)
             result = update_cart_item(product_id=product_id, cart_item=cart_obj, db=db, current_user=user)
             return json.dumps({"result": result, "success": True})
-        finally:
-            db.close()
             
     except json.JSONDecodeError as e:
         return json.dumps({"error": f"Invalid JSON format: {e}", "success": False})
@@ -252,16 +237,13 @@ def agent_delete_cart_item(product_id: int, user_id: int) -> str:
         JSON string with operation result
     """
     try:
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             user = get_user_by_id(user_id, db)
             if not user:
                 return json.dumps({"error": "User not found", "success": False})
                 
             result = remove_product_from_cart(product_id=product_id, db=db, current_user=user)
             return json.dumps({"result": result, "success": True})
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"Error deleting cart item: {e}")
@@ -279,16 +261,13 @@ def agent_get_cart(user_id: int) -> str:
         JSON string with cart contents
     """
     try:
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             user = get_user_by_id(user_id, db)
             if not user:
                 return json.dumps({"error": "User not found", "success": False})
                 
             result = get_cart(db=db, current_user=user)
             return json.dumps({"cart": result, "success": True})
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"Error retrieving cart: {e}")
@@ -308,21 +287,81 @@ def agent_order(address: str, total_amount: float, user_id: int) -> str:
         JSON string with order result
     """
     try:
-        db = get_db_session()
-        try:
+        with tool_session() as db:
             user = get_user_by_id(user_id, db)
             if not user:
                 return json.dumps({"error": "User not found", "success": False})
                 
             result = checkout(address=address, total_amount=total_amount, db=db, current_user=user)
             return json.dumps({"order": result, "success": True})
-        finally:
-            db.close()
             
     except Exception as e:
         logger.error(f"Error processing order: {e}")
         return json.dumps({"error": str(e), "success": False})
 
+@tool
+def agent_add_ingredients_to_cart(input_data: str) -> str:
+    """
+    Add a whole ingredient list (e.g. from a recipe) to the cart in one step.
+    Each ingredient is matched to an in-stock product and the number of packs needed.
+
+    Args:
+        input_data: JSON string with "user_id" and "ingredients", a list of strings
+            Example: {"user_id": 1, "ingredients": ["2 cups milk", "1 lb ground beef", "3 eggs"]}
+
+    Returns:
+        JSON string with the added items and the ingredients that had no match
+    """
+    try:
+        data = json.loads(input_data) if isinstance(input_data, str) else input_data
+        user_id = data.get("user_id")
+        ingredients = data.get("ingredients", [])
+        if not ingredients:
+            return json.dumps({"error": "ingredients list is required", "success": False})
+
+        with tool_session() as db:
+            user = get_user_by_id(user_id, db)
+            if not user:
+                return json.dumps({"error": "User not found", "success": False})
+
+            matches = resolve_ingredients(ingredients, db=db)
+            quantities = {}
+            for match in matches:
+                if match["product_id"]:
+                    quantities[match["product_id"]] = quantities.get(match["product_id"], 0) + match["quantity"]
+
+            if quantities:
+                # one query for the existing cart rows, one commit for the whole list
+                existing = {
+                    item.product_id: item
+                    for item in db.query(models.Cart).filter(
+                        models.Cart.user_id == user.id,
+                        models.Cart.product_id.in_(list(quantities)),
+                    )
+                }
+                for product_id, quantity in quantities.items():
+                    if product_id in existing:
+                        existing[product_id].quantity += quantity
+                    else:
+                        db.add(models.Cart(user_id=user.id, product_id=product_id, quantity=quantity))
+                db.commit()
+
+            return json.dumps({
+                "added": [
+                    {"ingredient": m["ingredient"], "product_id": m["product_id"], "product_name": m["product_name"],
+                     "quantity": m["quantity"], "price": m["price"]}
+                    for m in matches if m["product_id"]
+                ],
+                "unmatched": [m["ingredient"] for m in matches if not m["product_id"]],
+                "success": True
+            })
+
+    except json.JSONDecodeError as e:
+        return json.dumps({"error": f"Invalid JSON format: {e}", "success": False})
+    except Exception as e:
+        logger.error(f"Error adding ingredients to cart: {e}")
+        return json.dumps({"error": str(e), "success": False})
+
 # List of available tools
 tools = [
     agent_cart_adder,
@@ -330,7 +369,8 @@ tools = [
     agent_delete_cart_item,
     agent_get_cart,
     agent_order,
-    agent_search_product
+    agent_search_product,
+    agent_add_ingredients_to_cart
 ]
 
 # -------------------------------
@@ -348,6 +388,7 @@ Your capabilities include:
 4. 🗑️ Remove items from cart - Delete unwanted products
 5. 👀 View cart contents - Show current cart with totals
 6. 🚚 Process checkout - Handle order placement with delivery details
+7. 🍲 Add a recipe's ingredients - Match a whole ingredient list to products and add them in one step
 
 IMPORTANT GUIDELINES:
 - Always be helpful, friendly, and conversational
@@ -365,6 +406,7 @@ WORKFLOW FOR ADDING PRODUCTS:
 2. Present the search results with product IDs, names, and prices
 3. Ask the user to specify which product they want and the quantity
 4. Then add the selected product to cart using the product ID
+5. For a list of ingredients (e.g. "everything for lasagna"), use agent_add_ingredients_to_cart once instead of searching each item
 
 Available tools: {tools}
 
@@ -403,6 +445,9 @@ def initialize_cart_manager_agent(api_key: Optional[str] = None, model: str = "g
             "model": model,
             "temperature": 0.2,  # Slightly lower for more consistent responses
             "max_output_tokens": 1024,
+            # answers depend on the live cart and stock, so never serve them from the LLM cache
+            "cache": False,
+            "callbacks": tracing_callbacks(),
         }
         
         if api_key:
@@ -434,6 +479,122 @@ def initialize_cart_manager_agent(api_key: Optional[str] = None, model: str = "g
         logger.error(f"Error initializing agent: {e}")
         raise
 
+# -------------------------------
+# ⚡ Fast path for simple commands
+# -------------------------------
+# lowest alias-match confidence at which "add milk" picks a product without asking the LLM
+FAST_PATH_CONFIDENCE = 0.6
+# the runner-up must be at least this far behind; closer means several products fit ("milk", "iphone")
+FAST_PATH_MARGIN = 0.05
+
+
+def _error_detail(error: Exception) -> str:
+    return str(getattr(error, "detail", error))
+
+
+def _cart_with_products(db, user):
+    """The user's cart rows with their products, in one query."""
+    return (
+        db.query(models.Cart)
+        .options(joinedload(models.Cart.product))
+        .filter(models.Cart.user_id == user.id)
+        .all()
+    )
+
+
+def _find_in_cart(cart_items, name: str):
+    """The single cart item whose product name contains every word of name, else None."""
+    words = set(name.split())
+    found = [item for item in cart_items if words <= set(normalize_term(item.product.name).split())]
+    return found[0] if len(found) == 1 else None
+
+
+def run_cart_fast_path(user_input: str, user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Handle an unambiguous cart command (add / remove / update / show) directly
+    through the cart APIs. Returns None when the command needs the LLM agent:
+    unparsed text, products that don't resolve confidently, or items that are
+    not (or not uniquely) in the cart. Once a command has started changing the
+    cart it is never handed to the agent: each item reports its own failure,
+    so replaying the command cannot apply the earlier items twice.
+    """
+    # "add fish and chips" is one item when the catalogue sells it under that name
+    command = parse_command(user_input, is_product=get_ingredient_index().__contains__)
+    if command is None:
+        return None
+
+    with tool_session() as db:
+        user = get_user_by_id(user_id, db)
+        if not user:
+            return None
+
+        if command.action == "show":
+            cart_items = _cart_with_products(db, user)
+            if not cart_items:
+                return {"response": "Your cart is empty.", "success": True, "intermediate_steps": [], "fast_path": True}
+            lines = [f"- {item.quantity} x {item.product.name} (${float(item.product.price) * item.quantity:.2f})"
+                     for item in cart_items]
+            total = sum(float(item.product.price) * item.quantity for item in cart_items)
+            response = "Your cart:\n" + "\n".join(lines) + f"\nTotal: ${total:.2f}"
+
+        elif command.action == "add":
+            # resolve every mention before changing anything
+            index = get_ingredient_index()
+            chosen = []
+            for mention in command.items:
+                level, found = index.candidates(mention.name)
+                if level not in ("exact", "lemma") or not found or found[0][1] < FAST_PATH_CONFIDENCE:
+                    return None
+                if len(found) > 1 and found[0][1] - found[1][1] < FAST_PATH_MARGIN:
+                    # ambiguous: the popularity tiebreak is not a choice the user made
+                    return None
+                chosen.append((found[0][0], mention.quantity or 1))
+            products = {
+                product.id: product
+                for product in db.query(models.Product).filter(
+                    models.Product.id.in_([product_id for product_id, _ in chosen]),
+                    models.Product.for_sale == True,
+                )
+            }
+            if len(products) < len({product_id for product_id, _ in chosen}):
+                return None
+            lines = []
+            for product_id, quantity in chosen:
+                try:
+                    add_to_cart(cart_item=schemas.CartCreate(product_id=product_id, quantity=quantity), db=db, current_user=user)
+                    lines.append(f"Added {quantity} x {products[product_id].name} to your cart.")
+                except Exception as e:
+                    db.rollback()
+                    lines.append(f"Couldn't add {products[product_id].name}: {_error_detail(e)}")
+            response = "\n".join(lines)
+
+        else:
+            cart_items = _cart_with_products(db, user)
+            targets = [_find_in_cart(cart_items, mention.name) for mention in command.items]
+            if any(target is None for target in targets):
+                return None
+            lines = []
+            for mention, item in zip(command.items, targets):
+                name, product_id, in_cart = item.product.name, item.product_id, item.quantity
+                try:
+                    if command.action == "update":
+                        update_cart_item(product_id=product_id, val=schemas.QuantityUpdate(quantity=mention.quantity), db=db, current_user=user)
+                        lines.append(f"Updated {name} to {mention.quantity}.")
+                    elif mention.quantity and mention.quantity < in_cart:
+                        remaining = in_cart - mention.quantity
+                        update_cart_item(product_id=product_id, val=schemas.QuantityUpdate(quantity=remaining), db=db, current_user=user)
+                        lines.append(f"Removed {mention.quantity} x {name}; {remaining} left in your cart.")
+                    else:
+                        remove_product_from_cart(product_id=product_id, db=db, current_user=user)
+                        lines.append(f"Removed {name} from your cart.")
+                except Exception as e:
+                    db.rollback()
+                    lines.append(f"Couldn't {'update' if command.action == 'update' else 'remove'} {name}: {_error_detail(e)}")
+            response = "\n".join(lines)
+
+        return {"response": response, "success": True, "intermediate_steps": [], "fast_path": True}
+
+
 # -------------------------------
 # 🎯 Usage Example
 # -------------------------------
@@ -450,11 +611,21 @@ def run_cart_manager(user_input: str, user_id: int, agent_executor: AgentExecuto
         Dictionary with response and metadata
     """
     try:
-        # Add user context to the input
-        contextual_input = f"User ID: {user_id}\nRequest: {user_input}"
-        
-        # Execute the agent
-        response = agent_executor.invoke({"input": contextual_input})
+        # One DB session and user lookup for every tool call in this turn
+        with tool_turn():
+            # Simple commands skip the ReAct loop entirely
+            try:
+                fast = run_cart_fast_path(user_input, user_id)
+                if fast is not None:
+                    return fast
+            except Exception as e:
+                logger.error(f"Cart fast path failed, using the agent: {e}")
+
+            # Add user context to the input
+            contextual_input = f"User ID: {user_id}\nRequest: {user_input}"
+
+            # Execute the agent
+            response = agent_executor.invoke({"input": contextual_input}, config={"callbacks": tracing_callbacks()})
         
         return {
             "response": response["output"],
@@ -0,0 +1,366 @@
+"""
+Allergen and vegan checks for shopping lists.
+
+All allergen and non-vegan keywords are compiled into one Aho-Corasick
+automaton, so a text is scanned once for every category instead of looping
+over item x allergy x keyword. Keywords match whole words (plurals included),
+and "safe" phrases clear the categories they would otherwise trip: "oat milk"
+is not dairy, "peanut butter" is nuts but not dairy, "gluten-free" is not gluten.
+A "<category> free" phrase also clears the word after it: "dairy-free cheese".
+
+Catalogue products are profiled ahead of time from their name and ingredient /
+allergen specs (or description), with an explicit specs "vegan" value taking
+precedence. Profiles live in a SQLite file (diet_profiles.sqlite in AGENT_DATA_DIR,
+or DIET_PROFILES_PATH) and are rebuilt when the catalogue's names, descriptions or
+specs change (the ingredient index's catalogue_signature, checked every
+PROFILES_CHECK_SECONDS), and in any case once they are PROFILES_MAX_AGE_SECONDS
+old, so a product whose ingredients now include nuts is not reported nut-free:
+
+    python agents/diet_engine.py build
+    python agents/diet_engine.py check "peanut butter" "oat milk" "greek yogurt" --allergies nuts,dairy
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from ingredient_matcher import catalogue_signature
+from keyword_cache import normalize_term
+from utils.data_store import connect, data_path, lazy_singleton
+
+ALLERGEN_KEYWORDS = {
+    "nuts": ["peanut", "almond", "walnut", "cashew", "pecan", "hazelnut", "pistachio", "tree nuts", "macadamia"],
+    "dairy": ["milk", "cheese", "butter", "cream", "lactose", "casein", "whey", "yogurt", "yoghurt", "buttermilk", "ghee"],
+    "gluten": ["wheat", "barley", "rye", "oats", "gluten", "spelt", "semolina"],
+    "eggs": ["egg", "albumin", "lecithin", "mayonnaise"],
+    "soy": ["soy", "soybean", "tofu", "tempeh", "edamame"],
+    "shellfish": ["shrimp", "crab", "lobster", "shellfish", "prawn"],
+    "fish": ["salmon", "tuna", "cod", "fish", "anchovy", "sardine"],
+    "sesame": ["sesame", "tahini"],
+}
+
+NON_VEGAN_KEYWORDS = {
+    "meat": ["meat", "chicken", "beef", "pork", "bacon", "ham", "lamb", "turkey", "sausage", "steak", "veal", "salami"],
+    "animal": ["honey", "gelatin", "gelatine", "lard", "beeswax", "carmine"],
+}
+VEGAN_EXCLUDED = frozenset({"dairy", "eggs", "fish", "shellfish", "meat", "animal"})
+
+# phrase -> categories it clears for the keywords inside it (and, for "... free", the next word)
+SAFE_PHRASES = {
+    "oat milk": ("dairy",), "soy milk": ("dairy",), "almond milk": ("dairy",), "rice milk": ("dairy",),
+    "coconut milk": ("dairy",), "coconut cream": ("dairy",), "coconut yogurt": ("dairy",),
+    "peanut butter": ("dairy",), "almond butter": ("dairy",), "cashew butter": ("dairy",),
+    "cocoa butter": ("dairy",), "shea butter": ("dairy",), "cashew cheese": ("dairy",),
+    "vegan cheese": ("dairy",), "vegan butter": ("dairy",), "vegan mayo": ("eggs",), "eggless mayo": ("eggs",),
+    "soy lecithin": ("eggs",), "sunflower lecithin": ("eggs",),
+    "gluten free": ("gluten",), "dairy free": ("dairy",), "milk free": ("dairy",), "egg free": ("eggs",),
+    "soy free": ("soy",), "nut free": ("nuts",), "peanut free": ("nuts",),
+    "plant based meat": ("meat",), "meatless": ("meat",), "vegan sausage": ("meat",),
+}
+
+PROFILES_CHECK_SECONDS = 60
+# a full rebuild also catches edits the signature misses (same-length text)
+PROFILES_MAX_AGE_SECONDS = 60 * 60
+PROFILE_COLUMNS = ("name", "description", "specs")
+
+# how users name allergies -> category
+ALLERGY_ALIASES = {
+    "nut": "nuts", "peanut": "nuts", "peanuts": "nuts", "tree nut": "nuts", "tree nuts": "nuts",
+    "milk": "dairy", "lactose": "dairy", "egg": "eggs", "wheat": "gluten", "celiac": "gluten",
+    "soya": "soy", "seafood": "shellfish", "crustacean": "shellfish", "sesame seeds": "sesame",
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase words separated by single spaces, padded so every word has a boundary on both sides."""
+    return f" {_NON_ALNUM.sub(' ', str(text).lower()).strip()} "
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: every occurrence of every pattern in one pass over the text."""
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        for pattern, payload in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append((len(pattern), payload))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """(start, end, payload) for each match."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, payload in self._out[state]:
+                yield index - length + 1, index + 1, payload
+
+
+class DietEngine:
+    def __init__(
+        self,
+        allergens: Dict[str, List[str]] = ALLERGEN_KEYWORDS,
+        non_vegan: Dict[str, List[str]] = NON_VEGAN_KEYWORDS,
+        safe_phrases: Dict[str, Tuple[str, ...]] = SAFE_PHRASES,
+    ):
+        self.categories = sorted(set(allergens) | set(non_vegan))
+        patterns: Dict[str, Tuple[str, Set[str]]] = {}
+        for groups in (allergens, non_vegan):
+            for category, keywords in groups.items():
+                for keyword in keywords:
+                    word = normalize_text(keyword).strip()
+                    # whole words only: pattern is " word " (and its plurals)
+                    for variant in (word, word + "s", word + "es"):
+                        patterns.setdefault(f" {variant} ", ("hit", set()))[1].add(category)
+        for phrase, cleared in safe_phrases.items():
+            pattern = normalize_text(phrase)
+            patterns[pattern] = ("free" if pattern.endswith(" free ") else "safe", set(cleared))
+        self._automaton = AhoCorasick({pattern: (kind, frozenset(cats)) for pattern, (kind, cats) in patterns.items()})
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Categories (allergens, "meat", "animal") mentioned in a text."""
+        text = normalize_text(text)
+        hits, safe = [], []
+        for start, end, (kind, categories) in self._automaton.finditer(text):
+            if kind == "free":
+                # "dairy free cheese": the span runs to the end of the following word
+                next_space = text.find(" ", end)
+                end = next_space + 1 if next_space != -1 else end
+            (hits if kind == "hit" else safe).append((start, end, categories))
+        flags = set()
+        for start, end, categories in hits:
+            for category in categories:
+                if not any(s <= start and end <= e and category in cleared for s, e, cleared in safe):
+                    flags.add(category)
+        return frozenset(flags)
+
+    @staticmethod
+    def is_vegan(flags: Iterable[str]) -> bool:
+        return not (set(flags) & VEGAN_EXCLUDED)
+
+
+def normalize_allergy(allergy: str) -> str:
+    allergy = str(allergy).lower().strip()
+    return ALLERGY_ALIASES.get(allergy, allergy)
+
+
+# ------------------ Catalogue profiles --------------------
+
+def _profile_text(name: str, description: Optional[str], specs: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    """Text to scan for a product and where it came from: ingredient specs if any, else the description."""
+    specs = specs if isinstance(specs, dict) else {}
+    listed = [str(value) for key, value in specs.items()
+              if key.lower() in ("ingredients", "allergens", "contains", "may contain")]
+    if listed:
+        return " ; ".join([name] + listed), "specs"
+    return f"{name} ; {description or ''}", "description"
+
+
+def _explicit_vegan(specs: Optional[Dict[str, Any]]) -> Optional[bool]:
+    value = str((specs or {}).get("vegan", "") if isinstance(specs, dict) else "").lower()
+    if value in ("true", "yes", "1"):
+        return True
+    if value in ("false", "no", "0"):
+        return False
+    return None
+
+
+class ProductProfiles:
+    def __init__(self, engine: DietEngine, path: Optional[str] = None):
+        self.engine = engine
+        self.path = path or data_path("diet_profiles.sqlite", "DIET_PROFILES_PATH")
+        self._lock = threading.Lock()
+        self._db = connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "product_id INTEGER PRIMARY KEY, name TEXT NOT NULL, flags TEXT NOT NULL, vegan INTEGER NOT NULL, "
+            "source TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._by_name: Optional[Dict[str, Tuple[FrozenSet[str], bool]]] = None
+
+    def build(self, db=None) -> int:
+        """Profile every product in the catalogue. Returns the number of products."""
+        from backend.app import database, models
+
+        own_session = db is None
+        db = db or database.SessionLocal()
+        try:
+            signature = catalogue_signature(db, PROFILE_COLUMNS, for_sale_only=False)
+            products = db.query(
+                models.Product.id, models.Product.name, models.Product.description, models.Product.specs
+            ).all()
+        finally:
+            if own_session:
+                db.close()
+
+        rows = []
+        for product_id, name, description, specs in products:
+            text, source = _profile_text(name, description, specs)
+            flags = self.engine.scan(text)
+            vegan = _explicit_vegan(specs)
+            if vegan is None:
+                vegan = self.engine.is_vegan(flags)
+            rows.append((product_id, normalize_term(name), json.dumps(sorted(flags)), int(vegan), source))
+
+        with self._lock:
+            self._db.execute("DELETE FROM profiles")
+            self._db.executemany(
+                "INSERT INTO profiles (product_id, name, flags, vegan, source) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("signature", signature), ("built_at", str(time.time()))],
+            )
+            self._db.commit()
+            self._by_name = None
+        return len(rows)
+
+    def _meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_stale(self, db=None) -> bool:
+        """True if the profiles are empty, too old, or were built from a different catalogue."""
+        built_at = self._meta("built_at")
+        if not len(self) or built_at is None or time.time() - float(built_at) > PROFILES_MAX_AGE_SECONDS:
+            return True
+        return catalogue_signature(db, PROFILE_COLUMNS, for_sale_only=False) != self._meta("signature")
+
+    def _load(self):
+        if self._by_name is not None:
+            return
+        by_name: Dict[str, Tuple[FrozenSet[str], bool]] = {}
+        for name, flags, vegan in self._db.execute("SELECT name, flags, vegan FROM profiles"):
+            known_flags, known_vegan = by_name.get(name, (frozenset(), True))
+            # several products with the same name: any of them may contain it
+            by_name[name] = (known_flags | frozenset(json.loads(flags)), known_vegan and bool(vegan))
+        self._by_name = by_name
+
+    def lookup(self, item: str) -> Optional[Tuple[FrozenSet[str], bool]]:
+        """(flags, vegan) of the catalogue product named like item, if there is one."""
+        with self._lock:
+            self._load()
+            return self._by_name.get(normalize_term(item))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._by_name)
+
+
+def check_list(items: Iterable[Any], allergies: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Allergen and vegan status of every item in a shopping list, one scan per item.
+    Items that name a catalogue product use its precomputed profile as well.
+    """
+    engine = get_diet_engine()
+    profiles = get_product_profiles()
+    wanted = {normalize_allergy(allergy) for allergy in allergies}
+    results = []
+    for item in items:
+        flags = engine.scan(str(item))
+        vegan = engine.is_vegan(flags)
+        profile = profiles.lookup(str(item)) if profiles is not None else None
+        if profile is not None:
+            flags = flags | profile[0]
+            vegan = vegan and profile[1]
+        results.append({
+            "item": item,
+            "flags": sorted(flags),
+            "allergens": sorted(flags & wanted),
+            "vegan": vegan,
+            "catalogue": profile is not None,
+        })
+    return results
+
+
+@lazy_singleton
+def get_diet_engine() -> DietEngine:
+    return DietEngine()
+
+
+@lazy_singleton
+def _open_profiles() -> ProductProfiles:
+    return ProductProfiles(get_diet_engine())
+
+
+_profiles_lock = threading.Lock()
+_checked_at = float("-inf")
+
+
+def get_product_profiles() -> Optional[ProductProfiles]:
+    """
+    Process-wide product profiles, rebuilt from the catalogue when stale (checked
+    every PROFILES_CHECK_SECONDS). If the catalogue can't be reached the last build
+    is kept; None while there is none, and the build is retried at the next check.
+    """
+    global _checked_at
+    profiles = _open_profiles()
+    if time.monotonic() - _checked_at >= PROFILES_CHECK_SECONDS:
+        with _profiles_lock:
+            if time.monotonic() - _checked_at >= PROFILES_CHECK_SECONDS:
+                try:
+                    if profiles.is_stale():
+                        profiles.build()
+                except Exception as e:
+                    # no database: fall back to the last build, or to scanning item names only
+                    print(f"Product diet profiles could not be refreshed: {e}")
+                _checked_at = time.monotonic()
+    return profiles if len(profiles) else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="profile every product in the catalogue")
+    check = commands.add_parser("check", help="check shopping list items")
+    check.add_argument("items", nargs="+")
+    check.add_argument("--allergies", default="", help="comma separated")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "build":
+        count = ProductProfiles(get_diet_engine()).build()
+        print(f"{count} products profiled in {time.perf_counter() - started:.1f} s")
+    else:
+        allergies = [allergy for allergy in args.allergies.split(",") if allergy.strip()]
+        for result in check_list(args.items, allergies):
+            print(f"  {result['item']!r:28} vegan={result['vegan']!s:5} allergens={result['allergens']} flags={result['flags']}")
+        print(f"checked in {(time.perf_counter() - started) * 1000:.2f} ms")
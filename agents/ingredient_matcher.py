@@ -0,0 +1,468 @@
+"""
+Ingredient -> catalogue product matching for recipe shopping lists.
+
+Recipe ingredients ("1 1/2 cups grated parmesan cheese", or the structured
+rows from the recipe store) are parsed into (quantity, unit, name) and matched
+against an alias index built from the catalogue:
+
+  exact    the ingredient is a product's full (cleaned) name
+  lemma    the ingredient, or its trailing words ("extra virgin olive oil" ->
+           "olive oil"), singularized, is a product name or name suffix
+  synonym  the keyword cache maps the ingredient to a catalogue word ("soda" -> "cola")
+  fuzzy    a close spelling of an alias ("parmesean" -> "parmesan")
+
+resolve() handles a whole ingredient list in one pass: matching is done in
+memory, stock and pack sizes of every candidate are read with a single query,
+and each ingredient gets the best in-stock product plus the number of packs to
+buy ("500 g" of a "250g" product -> 2).
+
+The alias index is precomputed into a SQLite file (ingredient_index.sqlite in
+AGENT_DATA_DIR, or INGREDIENT_INDEX_PATH) and
+rebuilt when the catalogue changes: get_ingredient_index() compares a cheap
+signature of the for-sale products (count, max id, name and brand lengths) with
+the one stored at build time, at most every INDEX_CHECK_SECONDS.
+
+    python agents/ingredient_matcher.py build
+    python agents/ingredient_matcher.py match "2 cups flour" "3 eggs" "1 lb ground beef"
+"""
+import argparse
+import difflib
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from keyword_cache import get_keyword_cache, normalize_term
+from utils.data_store import connect, data_path, lazy_singleton
+MAX_CANDIDATES = 10  # per alias; the budget service compares their prices
+FUZZY_CUTOFF = 0.85
+MIN_CONFIDENCE = 0.35
+INDEX_CHECK_SECONDS = 60
+# a first word shared by this many different products is a brand ("Taaza Milk", "Taaza Paneer", ...)
+BRAND_MIN_PRODUCTS = 3
+
+# match level -> confidence factor
+LEVELS = {"exact": 1.0, "lemma": 0.9, "synonym": 0.7, "fuzzy": 0.6}
+
+# unit -> (dimension, amount in base unit: grams or millilitres)
+UNITS = {
+    "g": ("mass", 1.0), "gram": ("mass", 1.0), "kg": ("mass", 1000.0), "kilogram": ("mass", 1000.0),
+    "oz": ("mass", 28.35), "ounce": ("mass", 28.35), "lb": ("mass", 453.6), "pound": ("mass", 453.6),
+    "ml": ("volume", 1.0), "milliliter": ("volume", 1.0), "millilitre": ("volume", 1.0),
+    "l": ("volume", 1000.0), "liter": ("volume", 1000.0), "litre": ("volume", 1000.0),
+    "cup": ("volume", 240.0), "c": ("volume", 240.0), "pint": ("volume", 473.0), "quart": ("volume", 946.0),
+    "tbsp": ("volume", 15.0), "tablespoon": ("volume", 15.0), "tbs": ("volume", 15.0),
+    "tsp": ("volume", 5.0), "teaspoon": ("volume", 5.0),
+    "fl oz": ("volume", 29.57), "floz": ("volume", 29.57),
+}
+# units that mean "this many items" and say nothing about the package
+COUNT_UNITS = {"", "piece", "serving", "whole", "large", "medium", "small", "clove", "slice", "can", "head", "bunch", "stalk"}
+
+# words that describe preparation, not what to buy
+PREP_WORDS = frozenset(
+    "chopped diced minced sliced grated shredded crushed peeled cubed halved quartered fresh freshly "
+    "finely coarsely thinly roughly large small medium optional taste packed softened melted divided "
+    "beaten cooked uncooked boneless skinless trimmed rinsed drained to for of about plus more".split()
+)
+
+_FRACTIONS = {"½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅛": "1/8"}
+_QUANTITY = re.compile(r"^\s*(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?\s*")
+_PARENS = re.compile(r"\([^)]*\)")
+_PACK_SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|g|ml|l|lb|oz)\b", re.IGNORECASE)
+_PACK_COUNT = re.compile(r"(\d+)\s*(?:pack|pk|ct|count|pcs|pieces)\b|\b(?:pack of|x)\s*(\d+)\b", re.IGNORECASE)
+# pack sizes only: model numbers ("iPhone 14", "128GB") are part of the name
+_SIZE_WORDS = re.compile(r"\b\d+(?:\.\d+)?\s*(?:kg|g|ml|l|lb|oz|pack|pk|ct|count|pcs)\b|\b(?:pack of|x)\s*\d+\b",
+                         re.IGNORECASE)
+
+# words that describe a product rather than name it; never an alias on their own
+DESCRIPTIVE_WORDS = frozenset(
+    "fresh organic natural pure premium classic original new best extra super mini baby whole low fat free "
+    "red green yellow white black brown golden sweet hot spicy mild frozen dried raw ripe local homemade "
+    "family value select special deluxe light lite diet plain salted unsalted smoked large small medium".split()
+)
+
+
+class ParsedIngredient(NamedTuple):
+    text: str                 # as given
+    name: str                 # normalised product-ish name, e.g. "parmesan cheese"
+    quantity: Optional[float]
+    unit: str                 # canonical unit key from UNITS, a count unit, or ""
+
+
+def _number(text: str) -> float:
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def _canonical_unit(unit: str) -> str:
+    unit = unit.lower().strip(". ")
+    for candidate in (unit, unit[:-2] if unit.endswith("es") else unit, unit[:-1] if unit.endswith("s") else unit):
+        if candidate in UNITS or candidate in COUNT_UNITS:
+            return candidate
+    return ""
+
+
+def clean_name(text: str) -> str:
+    """Ingredient name without quantities, notes and preparation words, singularized."""
+    text = _PARENS.sub(" ", text.lower()).split(",")[0]
+    words = [word for word in normalize_term(text).split() if word not in PREP_WORDS and not word.isdigit()]
+    return " ".join(words)
+
+
+def parse_ingredient(item: Union[str, Dict[str, Any]]) -> ParsedIngredient:
+    """
+    Parse "1 1/2 cups grated parmesan (optional)" or a recipe-store row
+    {"name", "scaled_amount"/"amount", "unit"} into a ParsedIngredient.
+    """
+    if isinstance(item, dict):
+        name = str(item.get("name", ""))
+        amount = item.get("scaled_amount", item.get("amount"))
+        return ParsedIngredient(name, clean_name(name), float(amount) if amount else None,
+                                _canonical_unit(str(item.get("unit") or "")))
+
+    text = str(item)
+    rest = text
+    for symbol, fraction in _FRACTIONS.items():
+        rest = rest.replace(symbol, f" {fraction}")
+    quantity = None
+    match = _QUANTITY.match(rest)
+    if match:
+        # a range ("2-3 onions") buys for the upper bound
+        quantity = float(match.group(2)) if match.group(2) else _number(match.group(1))
+        rest = rest[match.end():]
+    unit = ""
+    words = rest.split()
+    for size in (2, 1):
+        candidate = _canonical_unit(" ".join(words[:size]))
+        if len(words) > size and candidate:
+            unit, rest = candidate, " ".join(words[size:])
+            break
+    return ParsedIngredient(text, clean_name(rest), quantity, unit)
+
+
+def _name_words(name: str, brand: Optional[str]) -> List[str]:
+    text = _SIZE_WORDS.sub(" ", name.lower())
+    if brand:
+        text = re.sub(re.escape(brand.lower()), " ", text)
+    return normalize_term(text).split()
+
+
+def _product_aliases(name: str, brand: Optional[str], brand_words: frozenset = frozenset()) -> List[Tuple[str, float, str]]:
+    """(alias, score, kind) for one product: its cleaned full name and the name's trailing and leading words."""
+    words = _name_words(name, brand)
+    if not words:
+        return []
+    aliases = [(" ".join(words), 1.0, "exact")]
+    for start in range(1, len(words)):
+        # "whole milk", "milk" from "organic whole milk"; not "128gb" from "iphone 14 128gb"
+        tail = words[start:]
+        if (len(tail) > 1 or len(tail[0]) > 2) and not any(char.isdigit() for char in tail[0]):
+            aliases.append((" ".join(tail), max(0.5, 0.9 - 0.1 * start), "lemma"))
+    for end in range(len(words) - 1, 0, -1):
+        # "garlic" from "garlic bulb", "iphone 14" from "iphone 14 128gb"; weaker than suffixes.
+        # A lone adjective or brand word ("fresh", "taaza") says nothing about the product.
+        head = words[:end]
+        if len(head) == 1 and (len(head[0]) <= 2 or head[0] in DESCRIPTIVE_WORDS or head[0] in brand_words):
+            continue
+        aliases.append((" ".join(head), max(0.4, 0.7 - 0.1 * (len(words) - end)), "lemma"))
+    return aliases
+
+
+def _brand_words(products) -> frozenset:
+    """Brand names' words, plus first words shared by BRAND_MIN_PRODUCTS products with different names."""
+    words = set()
+    rests = defaultdict(set)
+    for _, name, brand, _ in products:
+        if brand:
+            words.update(normalize_term(brand).split())
+        name_words = _name_words(name, brand)
+        if len(name_words) > 1:
+            rests[name_words[0]].add(" ".join(name_words[1:]))
+    words.update(word for word, names in rests.items() if len(names) >= BRAND_MIN_PRODUCTS)
+    return frozenset(words)
+
+
+def catalogue_signature(db=None, columns: Tuple[str, ...] = ("name", "brand_name"), for_sale_only: bool = True) -> str:
+    """
+    Changes whenever products are added or removed, or (in practice) the text of
+    one of their columns changes: count, max id and the summed length of each column.
+    """
+    from backend.app import database, models
+    from sqlalchemy import String, cast, func
+
+    own_session = db is None
+    db = db or database.SessionLocal()
+    try:
+        query = db.query(
+            func.count(models.Product.id),
+            func.max(models.Product.id),
+            *[func.sum(func.length(func.coalesce(cast(getattr(models.Product, column), String), "")))
+              for column in columns],
+        )
+        if for_sale_only:
+            query = query.filter(models.Product.for_sale == True)
+        row = query.one()
+    finally:
+        if own_session:
+            db.close()
+    return ":".join(str(value or 0) for value in row)
+
+
+class IngredientIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path("ingredient_index.sqlite", "INGREDIENT_INDEX_PATH")
+        self._lock = threading.Lock()
+        self._db = connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS aliases ("
+            "alias TEXT NOT NULL, product_id INTEGER NOT NULL, score REAL NOT NULL, kind TEXT NOT NULL, "
+            "PRIMARY KEY (alias, product_id))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._aliases: Optional[Dict[str, List[Tuple[int, float, str]]]] = None
+        self._by_initial: Dict[str, List[str]] = {}
+
+    # ---- building ----
+
+    def build(self, db=None) -> int:
+        """Rebuild the alias index from the product catalogue. Returns the number of aliases."""
+        from backend.app import database, models
+
+        own_session = db is None
+        db = db or database.SessionLocal()
+        try:
+            signature = catalogue_signature(db)
+            products = (
+                db.query(models.Product.id, models.Product.name, models.Product.brand_name, models.Product.num_sold)
+                .filter(models.Product.for_sale == True)
+                .all()
+            )
+        finally:
+            if own_session:
+                db.close()
+
+        brand_words = _brand_words(products)
+        best: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        for product_id, name, brand, num_sold in products:
+            for alias, score, kind in _product_aliases(name, brand, brand_words):
+                # popular products win ties between equally good aliases
+                score += min(num_sold or 0, 1000) / 1e6
+                if score > best.get((alias, product_id), (0.0, ""))[0]:
+                    best[(alias, product_id)] = (score, kind)
+
+        with self._lock:
+            self._db.execute("DELETE FROM aliases")
+            self._db.executemany(
+                "INSERT INTO aliases (alias, product_id, score, kind) VALUES (?, ?, ?, ?)",
+                [(alias, product_id, score, kind) for (alias, product_id), (score, kind) in best.items()],
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+            self._db.commit()
+            self._aliases = None
+        return len(best)
+
+    @property
+    def signature(self) -> Optional[str]:
+        """The catalogue signature at the last build."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        return row[0] if row else None
+
+    def _load(self):
+        if self._aliases is not None:
+            return
+        aliases: Dict[str, List[Tuple[int, float, str]]] = {}
+        for alias, product_id, score, kind in self._db.execute(
+            "SELECT alias, product_id, score, kind FROM aliases ORDER BY alias, score DESC"
+        ):
+            candidates = aliases.setdefault(alias, [])
+            if len(candidates) < MAX_CANDIDATES:
+                candidates.append((product_id, score, kind))
+        by_initial: Dict[str, List[str]] = {}
+        for alias in aliases:
+            by_initial.setdefault(alias[0], []).append(alias)
+        self._aliases, self._by_initial = aliases, by_initial
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._aliases)
+
+    def __contains__(self, name: str) -> bool:
+        """Whether a cleaned name is, as a whole, a product name or alias."""
+        with self._lock:
+            self._load()
+            return name in self._aliases
+
+    # ---- matching ----
+
+    def candidates(self, name: str) -> Tuple[str, List[Tuple[int, float]]]:
+        """(match level, [(product_id, confidence), ...]) for a cleaned ingredient name."""
+        with self._lock:
+            self._load()
+            if not name:
+                return "none", []
+            words = name.split()
+            for start in range(len(words)):
+                phrase = " ".join(words[start:])
+                found = self._aliases.get(phrase)
+                if found:
+                    level = "exact" if start == 0 and found[0][2] == "exact" else "lemma"
+                    # each dropped leading word costs confidence
+                    factor = LEVELS[level] * (1.0 - 0.15 * start)
+                    return level, [(product_id, score * factor) for product_id, score, _ in found]
+
+            keywords = get_keyword_cache().lookup(name) or []
+            for keyword in keywords:
+                found = self._aliases.get(normalize_term(keyword))
+                if found:
+                    return "synonym", [(product_id, score * LEVELS["synonym"]) for product_id, score, _ in found]
+
+            close = difflib.get_close_matches(name, self._by_initial.get(name[0], []), n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                return "fuzzy", [(product_id, score * LEVELS["fuzzy"]) for product_id, score, _ in self._aliases[close[0]]]
+        return "none", []
+
+
+def packs_needed(ingredient: ParsedIngredient, product_name: str) -> int:
+    """How many of a product to buy for an ingredient, from the pack size in the product name."""
+    if not ingredient.quantity:
+        return 1
+    if ingredient.unit in UNITS:
+        dimension, per_unit = UNITS[ingredient.unit]
+        size = _PACK_SIZE.search(product_name)
+        if size:
+            pack_dimension, pack_per_unit = UNITS[size.group(2).lower()]
+            if pack_dimension == dimension:
+                return max(1, math.ceil(ingredient.quantity * per_unit / (float(size.group(1)) * pack_per_unit) - 1e-9))
+        return 1
+    if ingredient.unit in ("", "piece", "whole", "large", "medium", "small"):
+        count = _PACK_COUNT.search(product_name)
+        if count:
+            return max(1, math.ceil(ingredient.quantity / int(count.group(1) or count.group(2))))
+        if _PACK_SIZE.search(product_name):
+            # "9 lasagna noodles" from a 450g box
+            return 1
+        return max(1, math.ceil(ingredient.quantity))
+    return 1
+
+
+def resolve(ingredients: Iterable[Union[str, Dict[str, Any]]], db=None, index: Optional["IngredientIndex"] = None) -> List[Dict[str, Any]]:
+    """
+    Match a whole ingredient list to in-stock products.
+    Returns one entry per ingredient: product_id/product_name/price/quantity of
+    the chosen product (None when nothing matched), match level and confidence.
+    """
+    from backend.app import database, models
+    from sqlalchemy.orm import defer
+
+    index = index or get_ingredient_index()
+    parsed = [parse_ingredient(item) for item in ingredients]
+    matched = [index.candidates(ingredient.name) for ingredient in parsed]
+    candidate_ids = {product_id for _, found in matched for product_id, _ in found}
+
+    products = {}
+    if candidate_ids:
+        own_session = db is None
+        db = db or database.SessionLocal()
+        try:
+            products = {
+                product.id: product
+                for product in db.query(models.Product)
+                .options(defer(models.Product.image))
+                .filter(models.Product.id.in_(candidate_ids), models.Product.for_sale == True)
+            }
+        finally:
+            if own_session:
+                db.close()
+
+    results = []
+    for ingredient, (level, found) in zip(parsed, matched):
+        entry = {
+            "ingredient": ingredient.text,
+            "name": ingredient.name,
+            "product_id": None,
+            "product_name": None,
+            "price": None,
+            "quantity": 0,
+            "match": "none",
+            "confidence": 0.0,
+        }
+        for product_id, confidence in sorted(found, key=lambda item: -item[1]):
+            product = products.get(product_id)
+            if product is None or confidence < MIN_CONFIDENCE:
+                continue
+            quantity = packs_needed(ingredient, product.name)
+            if product.stock < quantity:
+                continue
+            entry.update(product_id=product.id, product_name=product.name, price=float(product.price),
+                         quantity=quantity, match=level, confidence=round(confidence, 3))
+            break
+        results.append(entry)
+    return results
+
+
+_index_lock = threading.Lock()
+_checked_at = float("-inf")
+
+
+@lazy_singleton
+def _open_index() -> IngredientIndex:
+    return IngredientIndex()
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """
+    Process-wide index. Built on first use if the file is empty, and rebuilt when
+    the catalogue signature differs from the last build (checked every INDEX_CHECK_SECONDS).
+    """
+    global _checked_at
+    index = _open_index()
+    if time.monotonic() - _checked_at < INDEX_CHECK_SECONDS:
+        return index
+    with _index_lock:
+        if time.monotonic() - _checked_at >= INDEX_CHECK_SECONDS:
+            if not len(index):
+                index.build()
+            else:
+                try:
+                    if catalogue_signature() != index.signature:
+                        index.build()
+                except Exception as e:
+                    print(f"Could not check the catalogue for ingredient index changes: {e}")
+            _checked_at = time.monotonic()
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="rebuild the alias index from the catalogue")
+    match = commands.add_parser("match", help="resolve ingredients to products")
+    match.add_argument("ingredients", nargs="+")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "build":
+        count = IngredientIndex().build()
+        print(f"{count} aliases built in {time.perf_counter() - started:.1f} s")
+    else:
+        for entry in resolve(args.ingredients):
+            product = f"{entry['quantity']} x {entry['product_name']} (#{entry['product_id']})" if entry["product_id"] else "no match"
+            print(f"  {entry['ingredient']!r:40} -> {product}  [{entry['match']} {entry['confidence']}]")
+        print(f"resolved in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,350 @@
+"""
+Local intent router for the SuperAgent.
+
+Picks the sub-agent for a message without a model call in most cases:
+  1. high-precision regex rules (explicit cart commands, goodbyes, "recipe for ...")
+  2. a small TF-IDF + softmax regression classifier trained on labelled utterances
+  3. the LLM router, only when the classifier's confidence is below the threshold
+
+Pure Python, trained in a few milliseconds on first use. Run this file to print
+routing accuracy and latency on a held-out set:
+
+    python agents/intent_router.py
+"""
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+SHOPPING_LIST = "shopping-list"
+CART_MANAGER = "cart-manager"
+RECIPE_SHOPPING = "recipe-shopping"
+END = "end"
+LABELS = (SHOPPING_LIST, CART_MANAGER, RECIPE_SHOPPING, END)
+
+# below this classifier probability the LLM router is consulted
+CONFIDENCE_THRESHOLD = 0.6
+
+# ------------------ Rules --------------------
+# Only patterns that are (nearly) never wrong; anything ambiguous is left to the classifier.
+RULES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"^\W*(bye|goodbye|good bye|see you|that'?s all|that is all|exit|quit|stop|no thanks?|thanks?,? bye)\W*$"), END),
+    (re.compile(r"^\W*(thanks?|thank you)( so much| a lot)?\W*$"), END),
+    (re.compile(r"\b(add|put|throw|remove|delete|take)\b.*\b(to|into|in|from|out of)\s+(my\s+|the\s+)?(cart|basket)\b"), CART_MANAGER),
+    (re.compile(r"\b(show|view|see|open|display|what'?s in|what is in)\b.*\b(my\s+|the\s+)?(cart|basket)\b"), CART_MANAGER),
+    (re.compile(r"\b(check ?out|place (my |the |an )?order|empty (my |the )?cart|clear (my |the )?cart)\b"), CART_MANAGER),
+    (re.compile(r"\brecipes?\b.*\b(for|with|using)\b|\bhow (do|can|should) (i|you|we) (make|cook|bake|prepare)\b"), RECIPE_SHOPPING),
+    (re.compile(r"\b(shopping|grocery|groceries) list\b|\bmeal plan"), SHOPPING_LIST),
+]
+
+# ------------------ Training data --------------------
+TRAINING_DATA: List[Tuple[str, str]] = [
+    # shopping list
+    ("add milk to my list", SHOPPING_LIST),
+    ("create a weekly meal plan", SHOPPING_LIST),
+    ("i need ingredients for pasta", SHOPPING_LIST),
+    ("make me a shopping list for the week", SHOPPING_LIST),
+    ("what should i buy for a healthy breakfast", SHOPPING_LIST),
+    ("i am allergic to nuts what groceries can i get", SHOPPING_LIST),
+    ("is this list vegan friendly", SHOPPING_LIST),
+    ("check if my groceries are within a 50 dollar budget", SHOPPING_LIST),
+    ("plan my groceries for a family of four", SHOPPING_LIST),
+    ("i want to buy some groceries for the week", SHOPPING_LIST),
+    ("list the things i need for a picnic", SHOPPING_LIST),
+    ("what snacks should i get for a party", SHOPPING_LIST),
+    ("help me plan food for a camping trip", SHOPPING_LIST),
+    ("i need gluten free groceries", SHOPPING_LIST),
+    ("does bread contain any allergens", SHOPPING_LIST),
+    ("are eggs and milk vegan", SHOPPING_LIST),
+    ("stay under 30 dollars for my groceries", SHOPPING_LIST),
+    ("i'm on a budget what can i buy", SHOPPING_LIST),
+    ("give me a list of healthy foods", SHOPPING_LIST),
+    ("what do i need for the week", SHOPPING_LIST),
+    ("put eggs and bread on my list", SHOPPING_LIST),
+    ("i need to stock up on fruit and vegetables", SHOPPING_LIST),
+    ("suggest cheap groceries for a student", SHOPPING_LIST),
+    ("organize my groceries by aisle", SHOPPING_LIST),
+    ("i prefer dairy free options", SHOPPING_LIST),
+    ("what food should i buy for lunch boxes", SHOPPING_LIST),
+    ("i need things for a barbecue", SHOPPING_LIST),
+    ("low sugar items for my diabetic dad", SHOPPING_LIST),
+    ("high protein foods to buy", SHOPPING_LIST),
+    ("list items for a birthday party", SHOPPING_LIST),
+    # cart manager
+    ("add 2 apples to cart", CART_MANAGER),
+    ("remove bread from cart", CART_MANAGER),
+    ("show my cart", CART_MANAGER),
+    ("update the quantity of milk to 3", CART_MANAGER),
+    ("add an iphone 14 to my cart", CART_MANAGER),
+    ("buy three bananas", CART_MANAGER),
+    ("i want to order two packs of rice", CART_MANAGER),
+    ("checkout please", CART_MANAGER),
+    ("place the order to my home address", CART_MANAGER),
+    ("what is in my basket", CART_MANAGER),
+    ("delete the chips", CART_MANAGER),
+    ("change the apples to five", CART_MANAGER),
+    ("how much is my cart", CART_MANAGER),
+    ("what's the total", CART_MANAGER),
+    ("get me a bottle of olive oil", CART_MANAGER),
+    ("order a dozen eggs", CART_MANAGER),
+    ("i don't want the cheese anymore", CART_MANAGER),
+    ("take out the soda", CART_MANAGER),
+    ("increase the milk quantity", CART_MANAGER),
+    ("reduce bananas to one", CART_MANAGER),
+    ("add samsung headphones", CART_MANAGER),
+    ("search for running shoes", CART_MANAGER),
+    ("find me a laptop under 500", CART_MANAGER),
+    ("do you have organic honey", CART_MANAGER),
+    ("purchase a phone charger", CART_MANAGER),
+    ("add one more of those", CART_MANAGER),
+    ("clear everything in my cart", CART_MANAGER),
+    ("i'd like to pay now", CART_MANAGER),
+    ("ship it to 221b baker street", CART_MANAGER),
+    ("put 4 yogurts in the cart", CART_MANAGER),
+    # recipe shopping
+    ("find a recipe for dinner", RECIPE_SHOPPING),
+    ("how do i make lasagna", RECIPE_SHOPPING),
+    ("suggest vegetarian recipes", RECIPE_SHOPPING),
+    ("what can i cook with chicken and rice", RECIPE_SHOPPING),
+    ("i want to make pancakes for 6 people", RECIPE_SHOPPING),
+    ("give me a quick pasta recipe", RECIPE_SHOPPING),
+    ("how long should i bake a cake", RECIPE_SHOPPING),
+    ("what ingredients are in a margherita pizza", RECIPE_SHOPPING),
+    ("substitute for eggs in baking", RECIPE_SHOPPING),
+    ("cooking tips for steak", RECIPE_SHOPPING),
+    ("i have tomatoes and onions what can i make", RECIPE_SHOPPING),
+    ("teach me to cook curry", RECIPE_SHOPPING),
+    ("a dessert recipe with chocolate", RECIPE_SHOPPING),
+    ("how to prepare sushi at home", RECIPE_SHOPPING),
+    ("easy dinner ideas for tonight", RECIPE_SHOPPING),
+    ("what should i cook tonight", RECIPE_SHOPPING),
+    ("shopping list for a chicken biryani recipe", RECIPE_SHOPPING),
+    ("ingredients for banana bread", RECIPE_SHOPPING),
+    ("i want to bake cookies", RECIPE_SHOPPING),
+    ("instructions for making soup", RECIPE_SHOPPING),
+    ("healthy breakfast recipes", RECIPE_SHOPPING),
+    ("how many minutes do i boil an egg", RECIPE_SHOPPING),
+    ("what goes into a caesar salad", RECIPE_SHOPPING),
+    ("vegan dinner recipe", RECIPE_SHOPPING),
+    ("make a smoothie with spinach", RECIPE_SHOPPING),
+    ("how do you roast vegetables", RECIPE_SHOPPING),
+    ("recipe using leftover rice", RECIPE_SHOPPING),
+    ("what can i make with potatoes", RECIPE_SHOPPING),
+    ("dish ideas for a dinner party", RECIPE_SHOPPING),
+    ("cook something with salmon", RECIPE_SHOPPING),
+    # end
+    ("bye", END),
+    ("goodbye", END),
+    ("thanks that's all", END),
+    ("thank you", END),
+    ("that's it for today", END),
+    ("i'm done", END),
+    ("exit", END),
+    ("stop", END),
+    ("end the conversation", END),
+    ("nothing else thanks", END),
+    ("no that's everything", END),
+    ("see you later", END),
+    ("quit", END),
+    ("we are done here", END),
+    ("ok bye", END),
+    ("that will be all", END),
+    ("thanks for your help", END),
+    ("nope all good", END),
+    ("talk to you later", END),
+    ("i'm finished", END),
+]
+
+# held out, used only by the benchmark below
+EVAL_DATA: List[Tuple[str, str]] = [
+    ("add bananas to my shopping list", SHOPPING_LIST),
+    ("plan meals for next week on a budget", SHOPPING_LIST),
+    ("which of these groceries have gluten", SHOPPING_LIST),
+    ("i need food for a kids party", SHOPPING_LIST),
+    ("make a grocery list for a vegan week", SHOPPING_LIST),
+    ("what should i buy for the weekend", SHOPPING_LIST),
+    ("are these items vegan", SHOPPING_LIST),
+    ("i'm allergic to shellfish check my list", SHOPPING_LIST),
+    ("put 3 oranges in my cart", CART_MANAGER),
+    ("remove the milk", CART_MANAGER),
+    ("show me what's in my cart", CART_MANAGER),
+    ("i want to check out", CART_MANAGER),
+    ("add a pair of headphones", CART_MANAGER),
+    ("change bread quantity to 2", CART_MANAGER),
+    ("buy a bag of rice", CART_MANAGER),
+    ("how much do i owe", CART_MANAGER),
+    ("find a recipe for lentil soup", RECIPE_SHOPPING),
+    ("how can i make tiramisu", RECIPE_SHOPPING),
+    ("what can i cook with eggs and cheese", RECIPE_SHOPPING),
+    ("give me a recipe with mushrooms", RECIPE_SHOPPING),
+    ("how do i bake bread", RECIPE_SHOPPING),
+    ("dinner ideas with beef", RECIPE_SHOPPING),
+    ("ingredients for pad thai", RECIPE_SHOPPING),
+    ("i want to cook something italian", RECIPE_SHOPPING),
+    ("thanks bye", END),
+    ("that's all for now", END),
+    ("goodbye and thank you", END),
+    ("i'm done shopping", END),
+    ("stop please", END),
+    ("nothing more", END),
+]
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class IntentClassifier:
+    """TF-IDF features (words and word bigrams) with a multinomial logistic regression."""
+
+    def __init__(self, epochs: int = 40, learning_rate: float = 0.5, l2: float = 1e-4, seed: int = 7):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.seed = seed
+        self.labels: Tuple[str, ...] = ()
+        self.idf: Dict[str, float] = {}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.bias: Dict[str, float] = {}
+
+    def vectorize(self, text: str) -> Dict[str, float]:
+        counts = Counter(token for token in tokenize(text) if token in self.idf)
+        vector = {token: count * self.idf[token] for token, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            vector = {token: value / norm for token, value in vector.items()}
+        return vector
+
+    def fit(self, data: Sequence[Tuple[str, str]]) -> "IntentClassifier":
+        self.labels = tuple(sorted({label for _, label in data}))
+        document_frequency = Counter()
+        for text, _ in data:
+            document_frequency.update(set(tokenize(text)))
+        n = len(data)
+        self.idf = {token: math.log((1 + n) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+        samples = [(self.vectorize(text), label) for text, label in data]
+        rng = random.Random(self.seed)
+        for epoch in range(self.epochs):
+            rng.shuffle(samples)
+            rate = self.learning_rate / (1 + 0.1 * epoch)
+            for vector, target in samples:
+                probabilities = self._probabilities(vector)
+                for label in self.labels:
+                    gradient = probabilities[label] - (1.0 if label == target else 0.0)
+                    self.bias[label] -= rate * gradient
+                    weights = self.weights[label]
+                    for token, value in vector.items():
+                        weight = weights.get(token, 0.0)
+                        weights[token] = weight - rate * (gradient * value + self.l2 * weight)
+        return self
+
+    def _probabilities(self, vector: Dict[str, float]) -> Dict[str, float]:
+        scores = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(weights.get(token, 0.0) * value for token, value in vector.items())
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        return self._probabilities(self.vectorize(text))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+
+class RouteDecision(NamedTuple):
+    agent: str
+    confidence: float
+    source: str  # "rule", "model" or "llm"
+
+
+class IntentRouter:
+    """
+    Rules first, then the classifier; the LLM fallback (if given) is called only
+    when the classifier's confidence is below `threshold`.
+    llm_fallback(message, context) must return one of LABELS.
+    """
+
+    def __init__(
+        self,
+        llm_fallback: Optional[Callable[[str, str], str]] = None,
+        threshold: float = CONFIDENCE_THRESHOLD,
+        training_data: Sequence[Tuple[str, str]] = TRAINING_DATA,
+    ):
+        self.llm_fallback = llm_fallback
+        self.threshold = threshold
+        self.training_data = training_data
+        self._classifier: Optional[IntentClassifier] = None
+        self.stats = Counter()
+
+    @property
+    def classifier(self) -> IntentClassifier:
+        if self._classifier is None:
+            self._classifier = IntentClassifier().fit(self.training_data)
+        return self._classifier
+
+    def route(self, message: str, context: str = "") -> RouteDecision:
+        text = message.lower().strip()
+        for pattern, agent in RULES:
+            if pattern.search(text):
+                self.stats["rule"] += 1
+                return RouteDecision(agent, 1.0, "rule")
+
+        agent, confidence = self.classifier.predict(text)
+        if confidence >= self.threshold or self.llm_fallback is None:
+            self.stats["model"] += 1
+            return RouteDecision(agent, confidence, "model")
+
+        try:
+            llm_agent = self.llm_fallback(message, context)
+        except Exception as e:
+            print(f"LLM routing failed, using classifier: {e}")
+            self.stats["model"] += 1
+            return RouteDecision(agent, confidence, "model")
+        self.stats["llm"] += 1
+        return RouteDecision(llm_agent, confidence, "llm")
+
+
+# ------------------ Main Function for testing --------------------
+if __name__ == "__main__":
+    started = time.perf_counter()
+    router = IntentRouter()
+    router.classifier
+    print(f"trained on {len(TRAINING_DATA)} utterances in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    latencies = []
+    correct = 0
+    confident = 0
+    confident_correct = 0
+    for text, expected in EVAL_DATA:
+        started = time.perf_counter()
+        decision = router.route(text)
+        latencies.append(time.perf_counter() - started)
+        correct += decision.agent == expected
+        if decision.confidence >= router.threshold:
+            confident += 1
+            confident_correct += decision.agent == expected
+        else:
+            print(f"  low confidence ({decision.confidence:.2f}, would ask the LLM): {text!r} -> {decision.agent}")
+        if decision.agent != expected:
+            print(f"  wrong: {text!r} -> {decision.agent} ({decision.source}), expected {expected}")
+
+    latencies.sort()
+    n = len(EVAL_DATA)
+    print(f"accuracy without LLM  : {correct / n:.1%} ({correct}/{n})")
+    print(f"resolved locally      : {confident / n:.1%} (accuracy {confident_correct / max(confident, 1):.1%})")
+    print(f"by source             : {dict(router.stats)}")
+    print(f"latency p50 / p99     : {latencies[n // 2] * 1e6:.0f} us / {latencies[int(n * 0.99) - 1] * 1e6:.0f} us")
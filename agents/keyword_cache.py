@@ -0,0 +1,247 @@
+"""
+Persistent keyword-expansion cache for product search.
+
+Two tables in one SQLite file (keyword_cache.sqlite in AGENT_DATA_DIR, or KEYWORD_CACHE_PATH):
+  expansions  normalised term -> related keywords (from the LLM agent or precomputed)
+  synonyms    reverse index: synonym -> catalogue term whose expansion listed it
+
+lookup() answers from memory: first the term's own expansion, then the reverse
+index, so a user word that never appears in the catalogue ("soda") resolves to
+the catalogue words it is a synonym of ("cola") without an LLM or HTTP call.
+
+The precompute job fills both tables for the whole catalogue vocabulary:
+
+    python agents/keyword_cache.py precompute [--limit 500] [--workers 8]
+    python agents/keyword_cache.py lookup soda
+    python agents/keyword_cache.py stats
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from utils.data_store import connect, data_path, lazy_singleton
+DATAMUSE_URL = "https://api.datamuse.com/words"
+MAX_KEYWORDS = 10
+
+_NON_WORD = re.compile(r"[^a-z0-9\s-]+")
+_SPACES = re.compile(r"\s+")
+
+
+# words that end in "s" but are not plurals
+SINGULAR_EXCEPTIONS = frozenset("hummus couscous molasses brussels swiss lens news series species".split())
+
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us")) or word in SINGULAR_EXCEPTIONS:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_term(term: str) -> str:
+    """Lowercase, drop punctuation, collapse spaces and singularize each word: 'Apples!' -> 'apple'."""
+    term = _NON_WORD.sub(" ", str(term).lower())
+    return " ".join(singularize(word) for word in _SPACES.split(term.strip()) if word)
+
+
+class KeywordCache:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path("keyword_cache.sqlite", "KEYWORD_CACHE_PATH")
+        self._lock = threading.Lock()
+        self._db = connect(self.path)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS expansions (
+                term TEXT PRIMARY KEY,
+                keywords TEXT NOT NULL,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS synonyms (
+                synonym TEXT NOT NULL,
+                term TEXT NOT NULL,
+                PRIMARY KEY (synonym, term)
+            );
+            """
+        )
+        self._expansions: Optional[Dict[str, List[str]]] = None
+        self._reverse: Optional[Dict[str, List[str]]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self._expansions is not None:
+            return
+        expansions = {term: json.loads(keywords) for term, keywords in self._db.execute("SELECT term, keywords FROM expansions")}
+        reverse: Dict[str, List[str]] = {}
+        for synonym, term in self._db.execute("SELECT synonym, term FROM synonyms"):
+            reverse.setdefault(synonym, []).append(term)
+        self._expansions, self._reverse = expansions, reverse
+
+    def lookup(self, term: str) -> Optional[List[str]]:
+        """Return cached keywords for a term, or None if neither table knows it."""
+        key = normalize_term(term)
+        with self._lock:
+            self._load()
+            keywords = self._expansions.get(key)
+            if keywords is None and key in self._reverse:
+                # catalogue terms first, then their own expansions
+                keywords = list(self._reverse[key])
+                for catalogue_term in self._reverse[key]:
+                    keywords += self._expansions.get(catalogue_term, [])
+                keywords = _dedupe(keywords)[:MAX_KEYWORDS]
+            if keywords is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return keywords
+
+    def store(self, term: str, keywords: Iterable[str], source: str = "llm"):
+        """Save an expansion and index each keyword back to the term."""
+        key = normalize_term(term)
+        keywords = _dedupe(keywords)[:MAX_KEYWORDS]
+        with self._lock:
+            self._load()
+            self._db.execute(
+                "INSERT OR REPLACE INTO expansions (term, keywords, source, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(keywords), source, time.time()),
+            )
+            synonyms = {normalize_term(keyword) for keyword in keywords} - {key, ""}
+            self._db.executemany(
+                "INSERT OR IGNORE INTO synonyms (synonym, term) VALUES (?, ?)",
+                [(synonym, key) for synonym in synonyms],
+            )
+            self._db.commit()
+            self._expansions[key] = keywords
+            for synonym in synonyms:
+                terms = self._reverse.setdefault(synonym, [])
+                if key not in terms:
+                    terms.append(key)
+
+    def expand(self, term: str, generate: Callable[[str], List[str]]) -> List[str]:
+        """Cached keywords for term, calling generate(term) and storing the result on a miss."""
+        keywords = self.lookup(term)
+        if keywords is None:
+            keywords = generate(term)
+            if keywords:
+                self.store(term, keywords)
+        return keywords
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._load()
+            return {
+                "terms": len(self._expansions),
+                "synonyms": len(self._reverse),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _dedupe(words: Iterable[str]) -> List[str]:
+    seen: Set[str] = set()
+    unique = []
+    for word in words:
+        word = str(word).strip()
+        if len(word) > 1 and word.lower() not in seen:
+            seen.add(word.lower())
+            unique.append(word)
+    return unique
+
+
+@lazy_singleton
+def get_keyword_cache() -> KeywordCache:
+    """Process-wide cache, opened on first use."""
+    return KeywordCache()
+
+
+# ------------------ Offline precompute job --------------------
+
+def catalogue_vocabulary() -> List[str]:
+    """Distinct normalised words from product names, brands and category names."""
+    from backend.app import database, models
+
+    db = database.SessionLocal()
+    try:
+        texts = [name for (name,) in db.query(models.Product.name)]
+        texts += [brand for (brand,) in db.query(models.Product.brand_name).distinct() if brand]
+        texts += [name for (name,) in db.query(models.Category.name)]
+    finally:
+        db.close()
+
+    vocabulary = set()
+    for text in texts:
+        for word in normalize_term(text).split():
+            if len(word) > 2 and not word.isdigit():
+                vocabulary.add(word)
+    return sorted(vocabulary)
+
+
+def datamuse_expansion(term: str) -> List[str]:
+    """Synonyms ("means like") for a term straight from Datamuse, no LLM involved."""
+    from utils.http_client import http_client
+
+    words = http_client.get_json(DATAMUSE_URL, params={"ml": term, "max": MAX_KEYWORDS}, ttl=0)
+    return [item["word"] for item in words]
+
+
+def precompute(cache: KeywordCache, terms: List[str], workers: int = 8, refresh: bool = False) -> int:
+    if not refresh:
+        terms = [term for term in terms if cache.lookup(term) is None]
+    done = 0
+
+    def work(term):
+        try:
+            return term, datamuse_expansion(term)
+        except Exception as e:
+            print(f"  {term}: {e}")
+            return term, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for term, keywords in pool.map(work, terms):
+            if keywords:
+                cache.store(term, keywords, source="precomputed")
+                done += 1
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    job = commands.add_parser("precompute", help="expand the whole catalogue vocabulary")
+    job.add_argument("--limit", type=int, default=None, help="only the first N terms")
+    job.add_argument("--workers", type=int, default=8)
+    job.add_argument("--refresh", action="store_true", help="re-fetch terms that are already cached")
+    lookup = commands.add_parser("lookup", help="show what a term resolves to")
+    lookup.add_argument("term")
+    commands.add_parser("stats")
+    args = parser.parse_args()
+
+    cache = get_keyword_cache()
+    if args.command == "precompute":
+        terms = catalogue_vocabulary()[:args.limit]
+        started = time.perf_counter()
+        stored = precompute(cache, terms, args.workers, args.refresh)
+        print(f"{len(terms)} catalogue terms, {stored} expanded in {time.perf_counter() - started:.1f} s")
+        print(cache.stats())
+    elif args.command == "lookup":
+        started = time.perf_counter()
+        keywords = cache.lookup(args.term)
+        print(f"{normalize_term(args.term)!r} -> {keywords} ({(time.perf_counter() - started) * 1e6:.0f} us)")
+    else:
+        print(cache.stats())
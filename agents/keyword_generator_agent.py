@@ -3,13 +3,26 @@ from langchain_core.prompts import PromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 from langchain_core.tools import tool
-import requests
 import os
 import re
+import sys
 from typing import List
+from llm_cache import shared_cache
+from keyword_cache import get_keyword_cache
+
+# Add the parent directory to the path to find the shared utils
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from utils.http_client import http_client
 
 load_dotenv()
 
+DATAMUSE_URL = "https://api.datamuse.com/words"
+# word lists change rarely
+DATAMUSE_CACHE_TTL = 7 * 24 * 60 * 60
+
 @tool
 def get_synonyms(word: str) -> List[str]:
     """
@@ -20,11 +33,9 @@ def get_synonyms(word: str) -> List[str]:
         A list of similar words.
     """
     try:
-        url = f"https://api.datamuse.com/words?ml={word}"
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
+        words = http_client.get_json(DATAMUSE_URL, params={"ml": word}, ttl=DATAMUSE_CACHE_TTL)
         
-        synonyms = [item['word'] for item in resp.json()[:10]]
+        synonyms = [item['word'] for item in words[:10]]
         return synonyms if synonyms else [word]
     except Exception as e:
         print(f"Error getting synonyms: {e}")
@@ -40,11 +51,9 @@ def get_related_words(word: str) -> List[str]:
         A list of related words.
     """
     try:
-        url = f"https://api.datamuse.com/words?rel_trg={word}"
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
+        words = http_client.get_json(DATAMUSE_URL, params={"rel_trg": word}, ttl=DATAMUSE_CACHE_TTL)
         
-        related = [item['word'] for item in resp.json()[:5]]
+        related = [item['word'] for item in words[:5]]
         return related if related else []
     except Exception as e:
         print(f"Error getting related words: {e}")
@@ -57,7 +66,8 @@ llm = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash",
     google_api_key=gemini_api_key,
     temperature=0.7,
-    max_output_tokens=1024
+    max_output_tokens=1024,
+    cache=shared_cache  # keyword expansion for the same word is asked over and over
 )
 
 # Define tools
@@ -149,6 +159,9 @@ def parse_keyword_output(output_text: str) -> List[str]:
 def generate_keywords(input_text: str) -> List[str]:
     """
     Generate keywords for the given input text.
+    Answers from the persistent keyword cache when the term (or a word it is a
+    known synonym of) has been expanded before; otherwise runs the agent and
+    caches its result.
     
     Args:
         input_text: The word to generate keywords for
@@ -156,6 +169,11 @@ def generate_keywords(input_text: str) -> List[str]:
     Returns:
         List of keywords (strings)
     """
+    cache = get_keyword_cache()
+    cached = cache.lookup(input_text)
+    if cached is not None:
+        return cached if input_text.lower() in [kw.lower() for kw in cached] else cached + [input_text]
+
     try:
         response = agent_executor.invoke({"input": input_text})
         output = response.get("output", "")
@@ -166,6 +184,9 @@ def generate_keywords(input_text: str) -> List[str]:
         # Always include the original word if not already present
         if input_text.lower() not in [kw.lower() for kw in keywords]:
             keywords.append(input_text)
+
+        if len(keywords) > 1:
+            cache.store(input_text, keywords)
         
         return keywords
         
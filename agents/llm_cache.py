@@ -0,0 +1,344 @@
+"""
+Shared response cache for the agents' Gemini calls.
+
+LLMCache is a LangChain cache: pass it as `cache=` when building a chat model and
+every generate call is looked up first. Entries are keyed on the serialized prompt
+and the model's llm_string (model name + parameters), so different models or
+temperatures never share answers.
+
+  * exact matching on (llm_string, prompt)
+  * optional near-duplicate matching: for a ReAct agent's first step, the user's
+    question is compared by cosine similarity with earlier questions asked of the
+    same prompt template (step prompts that already contain tool observations
+    are never matched approximately). A cached first step carries the tool call
+    and its Action Input, so a near duplicate must also have exactly the same
+    content words and numbers: only filler words and word order may differ,
+    never "$20" vs "$50" or "peanuts" vs "gluten"
+  * TTL and an LRU bound on in-memory entries
+  * write-through SQLite persistence, so a restart starts warm
+  * hit/miss counters, exported in Prometheus format
+
+State-dependent agents opt out with `cache=False` on their model (cart manager).
+
+    LLM_CACHE_PATH       SQLite file, default llm_cache.sqlite in AGENT_DATA_DIR ("" disables persistence)
+    LLM_CACHE_TTL        seconds, default 86400
+    LLM_CACHE_SIZE       in-memory entries, default 5000
+    LLM_CACHE_SEMANTIC   "1" to enable near-duplicate matching
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load.dump import dumps
+from langchain_core.load.load import loads
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from utils.data_store import connect, data_path
+from utils.tracing import tracer
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+SEMANTIC_THRESHOLD = 0.92
+EMBEDDING_DIMENSIONS = 512
+
+Vector = Dict[int, float]
+
+# the user's question in a ReAct prompt, when no step has run yet
+_QUESTION = re.compile(r"Question:\s*(?P<question>[^\n]*)\s*$")
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+# filler words count little, so "show me my cart please" stays close to "show my cart"
+# while a different item ("pasta" / "pizza") moves the vector far enough to miss
+_FILLER = frozenset(
+    "a an the my me i i'm to for of in on and or please can could would you "
+    "some any is are it this that with want need like just".split()
+)
+
+
+def hashed_embedding(text: str) -> Vector:
+    """
+    Cheap local embedding: hashed word counts (filler words down-weighted) plus
+    character trigrams for spelling variants, L2 normalised.
+    """
+    words = _WORD.findall(text.lower())
+    features = Counter()
+    for word in words:
+        features[zlib.crc32(word.encode()) % EMBEDDING_DIMENSIONS] += 0.15 if word in _FILLER else 1.0
+    content = " ".join(word for word in words if word not in _FILLER)
+    padded = f" {content} "
+    for i in range(len(padded) - 2):
+        features[zlib.crc32(b"#" + padded[i:i + 3].encode()) % EMBEDDING_DIMENSIONS] += 0.2
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    return {index: value / norm for index, value in features.items()} if norm else {}
+
+
+def content_tokens(text: str) -> frozenset:
+    """Every word and number in text except filler words; near duplicates must agree on all of them."""
+    return frozenset(word for word in _WORD.findall(text.lower()) if word not in _FILLER)
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+def _prompt_text(prompt: str) -> str:
+    """Chat models pass the messages serialized as JSON; pull out their text content."""
+    try:
+        data = json.loads(prompt)
+    except ValueError:
+        return prompt
+    parts = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            content = node.get("content")
+            if isinstance(content, str):
+                parts.append(content)
+            for value in node.values():
+                if isinstance(value, (dict, list)):
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(data)
+    return "\n".join(parts) if parts else prompt
+
+
+def split_question(prompt: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a first-step ReAct prompt into (template_fingerprint, question).
+    Returns None if the prompt is not eligible for near-duplicate matching.
+    """
+    text = _prompt_text(prompt).rstrip()
+    match = _QUESTION.search(text)
+    if not match or not match.group("question").strip():
+        return None
+    template = text[:match.start()]
+    fingerprint = hashlib.sha1(template.encode()).hexdigest()
+    return fingerprint, match.group("question").strip()
+
+
+class _Entry(NamedTuple):
+    value: RETURN_VAL_TYPE
+    expires_at: float
+    llm_string: str
+    fingerprint: Optional[str]
+    vector: Optional[Vector]
+    tokens: Optional[frozenset]
+
+
+class LLMCache(BaseCache):
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        semantic: bool = False,
+        semantic_threshold: float = SEMANTIC_THRESHOLD,
+        embed: Callable[[str], Vector] = hashed_embedding,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.semantic_threshold = semantic_threshold
+        self.embed = embed
+        self.stats = Counter()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = connect(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, prompt TEXT NOT NULL, "
+                "value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._warm()
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        return cls(
+            path=data_path("llm_cache.sqlite", "LLM_CACHE_PATH") or None,
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+            semantic=os.getenv("LLM_CACHE_SEMANTIC", "0") == "1",
+        )
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def _make_entry(self, prompt: str, llm_string: str, value: RETURN_VAL_TYPE, expires_at: float) -> _Entry:
+        fingerprint = vector = tokens = None
+        if self.semantic:
+            split = split_question(prompt)
+            if split is not None:
+                fingerprint, question = split
+                vector = self.embed(question)
+                tokens = content_tokens(question)
+        return _Entry(value, expires_at, llm_string, fingerprint, vector, tokens)
+
+    def _warm(self):
+        """Load the most recent unexpired entries from disk into memory."""
+        now = time.time()
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, llm_string, prompt, value, expires_at FROM llm_cache ORDER BY expires_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for key, llm_string, prompt, value, expires_at in reversed(rows):
+            try:
+                self._entries[key] = self._make_entry(prompt, llm_string, loads(value), expires_at)
+            except Exception as e:
+                print(f"Skipping unreadable LLM cache entry: {e}")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits_exact"] += 1
+                    tracer.annotate(cache_hit=True, cache="exact")
+                    return entry.value
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+            if self.semantic:
+                value = self._lookup_similar(prompt, llm_string, now)
+                if value is not None:
+                    self.stats["hits_semantic"] += 1
+                    tracer.annotate(cache_hit=True, cache="semantic")
+                    return value
+
+            self.stats["misses"] += 1
+            tracer.annotate(cache_hit=False)
+            return None
+
+    def _lookup_similar(self, prompt: str, llm_string: str, now: float) -> Optional[RETURN_VAL_TYPE]:
+        split = split_question(prompt)
+        if split is None:
+            return None
+        fingerprint, question = split
+        vector = self.embed(question)
+        tokens = content_tokens(question)
+        best_key, best_score = None, self.semantic_threshold
+        for key, entry in self._entries.items():
+            if entry.fingerprint != fingerprint or entry.llm_string != llm_string or entry.expires_at <= now:
+                continue
+            # the cached step replays its Action Input, so every item, amount and constraint must match
+            if entry.tokens != tokens:
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key].value
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        expires_at = time.time() + self.ttl_seconds
+        entry = self._make_entry(prompt, llm_string, return_val, expires_at)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stats["updates"] += 1
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+                if self._db is not None:
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (evicted,))
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, llm_string, prompt, value, expires_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, llm_string, prompt, dumps(list(return_val)), expires_at),
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    print(f"Error persisting LLM cache entry: {e}")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["hits_exact"] + self.stats["hits_semantic"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def metrics_lines(self) -> List[str]:
+        lines = ["# TYPE llm_cache_lookups_total counter"]
+        for result in ("hits_exact", "hits_semantic", "misses"):
+            lines.append(f'llm_cache_lookups_total{{result="{result}"}} {self.stats[result]}')
+        lines += [
+            "# TYPE llm_cache_evictions_total counter",
+            f"llm_cache_evictions_total {self.stats['evictions']}",
+            "# TYPE llm_cache_entries gauge",
+            f"llm_cache_entries {len(self._entries)}",
+            "# TYPE llm_cache_hit_ratio gauge",
+            f"llm_cache_hit_ratio {self.hit_rate:.4f}",
+        ]
+        return lines
+
+
+shared_cache = LLMCache.from_env()
+
+# Export the counters on the backend's /metrics endpoint when running inside the API
+try:
+    from backend.app.utils import metrics as metrics_utils
+    metrics_utils.registry.register_collector("llm_cache", shared_cache.metrics_lines)
+except ImportError:
+    pass
+
+
+# ------------------ Main Function for testing --------------------
+if __name__ == "__main__":
+    from langchain_core.outputs import Generation
+
+    cache = LLMCache(path=None, semantic=True)
+    template = "You are VoiceCart.\nAnswer the question.\n\nQuestion: "
+    llm_string = "gemini-2.0-flash temperature=0.7"
+    cache.update(template + "show my cart", llm_string, [Generation(text="Action: agent_get_cart")])
+    cache.update(template + "find a recipe for pasta", llm_string, [Generation(text="Action: search_recipes")])
+
+    cache.update(template + "will this list fit a 20 dollar budget", llm_string, [Generation(text="Action: check_budget 20")])
+
+    for question in ["show my cart", "show me my cart", "find a recipe for pasta", "find a recipe for pizza", "add milk",
+                     "will this list fit a 20 dollar budget please", "will this list fit a 50 dollar budget"]:
+        started = time.perf_counter()
+        value = cache.lookup(template + question, llm_string)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(f"{question!r:32} -> {value[0].text if value else 'miss':24} {elapsed:6.0f} us")
+    print(dict(cache.stats), f"hit rate {cache.hit_rate:.0%}")
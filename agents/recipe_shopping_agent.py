@@ -16,6 +16,9 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
 from utils.json_formatters import beautify_json
+from utils.http_client import http_client
+from recipe_store import get_recipe_store, scale_ingredients
+from ingredient_matcher import resolve as resolve_ingredients
 
 load_dotenv()
 spoonacular_api_key = os.getenv("SPOONACULAR_API_KEY")
@@ -26,8 +29,25 @@ if not spoonacular_api_key:
 # Base URL for Spoonacular API
 SPOONACULAR_BASE_URL = "https://api.spoonacular.com/recipes"
 
+# How long Spoonacular responses are reused from the shared HTTP cache
+SEARCH_CACHE_TTL = 60 * 60
+RECIPE_CACHE_TTL = 24 * 60 * 60
+
 # ------------------ Recipe Tools --------------------
 
+def _format_recipe(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Shorten a recipe for the agent's observation.
+    """
+    return {
+        "id": recipe["id"],
+        "title": recipe["title"],
+        "readyInMinutes": recipe.get("readyInMinutes", "N/A"),
+        "servings": recipe.get("servings", "N/A"),
+        "summary": recipe.get("summary", "")[:200] + "..." if recipe.get("summary", "") else "No summary available"
+    }
+
+
 @tool
 def search_recipes(input_data: str) -> str:
     """
@@ -46,6 +66,12 @@ def search_recipes(input_data: str) -> str:
         if not query:
             return "Error: query string is required"
         
+        # Answer from the local recipe store when it already knows enough matches
+        store = get_recipe_store()
+        local_results = store.search(query, number)
+        if len(local_results) >= number:
+            return json.dumps({"recipes": [_format_recipe(recipe) for recipe in local_results]}, indent=2)
+        
         url = f"{SPOONACULAR_BASE_URL}/complexSearch"
         params = {
             "apiKey": spoonacular_api_key,
@@ -54,25 +80,16 @@ def search_recipes(input_data: str) -> str:
             "addRecipeInformation": True,
             "fillIngredients": True
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = http_client.get_json(url, params=params, ttl=SEARCH_CACHE_TTL)
         
         if not data.get("results"):
             return f"No recipes found for query: {query}"
         
+        store.store_recipes(data["results"])
+        store.remember_search(query, [recipe["id"] for recipe in data["results"]], number)
+        
         # Format the results for better readability
-        formatted_results = []
-        for recipe in data["results"]:
-            formatted_recipe = {
-                "id": recipe["id"],
-                "title": recipe["title"],
-                "readyInMinutes": recipe.get("readyInMinutes", "N/A"),
-                "servings": recipe.get("servings", "N/A"),
-                "summary": recipe.get("summary", "")[:200] + "..." if recipe.get("summary", "") else "No summary available"
-            }
-            formatted_results.append(formatted_recipe)
+        formatted_results = [_format_recipe(recipe) for recipe in data["results"]]
         
         return json.dumps({"recipes": formatted_results}, indent=2)
         
@@ -101,48 +118,26 @@ def get_recipe_ingredients(input_data: str) -> str:
         if not recipe_id:
             return "Error: recipe_id is required"
         
-        # Get recipe information
-        url = f"{SPOONACULAR_BASE_URL}/{recipe_id}/information"
-        params = {
-            "apiKey": spoonacular_api_key,
-            "includeNutrition": False
-        }
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        recipe_data = response.json()
-        original_servings = recipe_data.get("servings", 1)
-        
-        # Calculate scaling factor
-        scaling_factor = target_servings / original_servings
+        # Scale from the local recipe store; fetch recipe information only once
+        store = get_recipe_store()
+        recipe = store.get_recipe(recipe_id)
+        if recipe is None:
+            url = f"{SPOONACULAR_BASE_URL}/{recipe_id}/information"
+            params = {
+                "apiKey": spoonacular_api_key,
+                "includeNutrition": False
+            }
+            
+            recipe_data = http_client.get_json(url, params=params, ttl=RECIPE_CACHE_TTL)
+            if not recipe_data.get("extendedIngredients"):
+                return f"No ingredients found for recipe ID: {recipe_id}"
+            store.store_recipe(recipe_data)
+            recipe = store.get_recipe(recipe_id)
         
-        # Extract and scale ingredients
-        ingredients = recipe_data.get("extendedIngredients", [])
-        if not ingredients:
+        if not recipe["ingredients"]:
             return f"No ingredients found for recipe ID: {recipe_id}"
         
-        scaled_ingredients = []
-        for ingredient in ingredients:
-            original_amount = ingredient.get("amount", 0)
-            scaled_amount = original_amount * scaling_factor
-            
-            ingredient_info = {
-                "name": ingredient.get("name", "Unknown ingredient"),
-                "original_amount": original_amount,
-                "scaled_amount": round(scaled_amount, 2),
-                "unit": ingredient.get("unit", ""),
-                "aisle": ingredient.get("aisle", "Unknown aisle")
-            }
-            scaled_ingredients.append(ingredient_info)
-        
-        result = {
-            "recipe_title": recipe_data.get("title", "Unknown Recipe"),
-            "original_servings": original_servings,
-            "target_servings": target_servings,
-            "scaling_factor": round(scaling_factor, 2),
-            "ingredients": scaled_ingredients
-        }
+        result = scale_ingredients(recipe, target_servings)
         
         return json.dumps(result, indent=2)
         
@@ -172,6 +167,11 @@ def get_recipe_by_ingredients(input_data: str) -> str:
         if not ingredients:
             return "Error: ingredients list is required"
         
+        # Recipes already in the local store that use the ingredients
+        local_results = get_recipe_store().find_by_ingredients(ingredients, number)
+        if len(local_results) >= number:
+            return json.dumps({"recipes": local_results}, indent=2)
+        
         # Convert ingredients list to comma-separated string
         ingredients_str = ",".join(ingredients)
         
@@ -184,10 +184,7 @@ def get_recipe_by_ingredients(input_data: str) -> str:
             "ignorePantry": True
         }
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = http_client.get_json(url, params=params, ttl=SEARCH_CACHE_TTL)
         
         if not data:
             return f"No recipes found with ingredients: {', '.join(ingredients)}"
@@ -303,8 +300,54 @@ def generate_shopping_list_from_recipe(input_data: str) -> str:
         return f"Error generating shopping list: {str(e)}"
 
 
+@tool
+def match_recipe_to_products(input_data: str) -> str:
+    """
+    Match every ingredient of a recipe to a product in the store, with how many to buy.
+    Args:
+        input_data: JSON string with "recipe_id" and "servings"
+        Example: {"recipe_id": 12345, "servings": 8}
+    Returns:
+        JSON with cart-ready items (product_id, quantity) and the ingredients that had no match
+    """
+    try:
+        ingredients_result = get_recipe_ingredients(input_data)
+        if "error" in ingredients_result.lower() or "no ingredients" in ingredients_result.lower():
+            return ingredients_result
+        ingredients_data = json.loads(ingredients_result)
+        
+        # one batched lookup for the whole ingredient list
+        matches = resolve_ingredients(ingredients_data["ingredients"])
+        items = [match for match in matches if match["product_id"]]
+        
+        result = {
+            "recipe_title": ingredients_data["recipe_title"],
+            "servings": ingredients_data["target_servings"],
+            "items": [
+                {
+                    "ingredient": match["ingredient"],
+                    "product_id": match["product_id"],
+                    "product_name": match["product_name"],
+                    "quantity": match["quantity"],
+                    "price": match["price"],
+                    "match": match["match"]
+                }
+                for match in items
+            ],
+            "unmatched": [match["ingredient"] for match in matches if not match["product_id"]],
+            "estimated_total": round(sum(match["price"] * match["quantity"] for match in items), 2)
+        }
+        
+        return json.dumps(result, indent=2)
+        
+    except json.JSONDecodeError:
+        return "Error: Invalid ingredient data received"
+    except Exception as e:
+        return f"Error matching products: {str(e)}"
+
+
 # Create the list of tools
-tools = [search_recipes, get_recipe_ingredients, get_recipe_by_ingredients, generate_shopping_list_from_recipe]
+tools = [search_recipes, get_recipe_ingredients, get_recipe_by_ingredients, generate_shopping_list_from_recipe, match_recipe_to_products]
 
 # ReAct agent prompt
 prompt = PromptTemplate(
@@ -314,7 +357,8 @@ prompt = PromptTemplate(
 2. Get detailed ingredient lists scaled for any number of people
 3. Find recipes based on available ingredients
 4. Generate organized shopping lists from recipes
-5. Provide helpful cooking and meal planning advice
+5. Match a recipe's ingredients to products in the store, ready to add to the cart
+6. Provide helpful cooking and meal planning advice
 
 You have access to these tools:
 {tools}
@@ -336,6 +380,7 @@ Important guidelines:
 - Organize shopping lists in a user-friendly way
 - Provide helpful context about recipes (cooking time, difficulty, etc.)
 - If a user asks for a recipe for X people, search for recipes first, then get ingredients for the chosen recipe
+- If a user wants to buy or cook a recipe, use match_recipe_to_products to list the products and quantities to add to the cart
 
 Question: {input}
 {agent_scratchpad}""",
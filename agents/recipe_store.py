@@ -0,0 +1,364 @@
+"""
+Local recipe store for the recipe agent, so warm lookups skip Spoonacular.
+
+One SQLite file (recipe_store.sqlite in AGENT_DATA_DIR, or RECIPE_STORE_PATH) holds:
+  recipes      id, title, servings, ready time, summary; complete = ingredients known
+  ingredients  per-recipe ingredient rows (name, amount, unit, aisle)
+  recipes_fts  FTS5 index over title and ingredient names (rowid = recipe id)
+  searches     normalised query -> recipe ids Spoonacular returned for it
+
+Recipes are stored as the agent fetches them (complexSearch results and
+/information responses), so repeated searches, ingredient lookups and serving
+scaling are answered locally. The store can also be seeded offline:
+
+    python agents/recipe_store.py seed --queries pasta,chicken,pancake --per-query 20
+    python agents/recipe_store.py import recipes.json
+    python agents/recipe_store.py search "chicken pasta"
+    python agents/recipe_store.py stats
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from utils.data_store import connect, data_path, lazy_singleton
+SPOONACULAR_BASE_URL = "https://api.spoonacular.com/recipes"
+SEARCH_TTL_SECONDS = 7 * 24 * 60 * 60
+SUMMARY_CHARS = 200
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(str(text).lower())
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(sorted(set(_tokens(query))))
+
+
+def scale_ingredients(recipe: Dict[str, Any], servings: float) -> Dict[str, Any]:
+    """The get_recipe_ingredients result for a stored recipe, scaled to servings."""
+    original_servings = recipe.get("servings") or 1
+    scaling_factor = servings / original_servings
+    return {
+        "recipe_title": recipe.get("title", "Unknown Recipe"),
+        "original_servings": original_servings,
+        "target_servings": servings,
+        "scaling_factor": round(scaling_factor, 2),
+        "ingredients": [
+            {
+                "name": ingredient["name"],
+                "original_amount": ingredient["amount"],
+                "scaled_amount": round(ingredient["amount"] * scaling_factor, 2),
+                "unit": ingredient["unit"],
+                "aisle": ingredient["aisle"],
+            }
+            for ingredient in recipe.get("ingredients", [])
+        ],
+    }
+
+
+class RecipeStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or data_path("recipe_store.sqlite", "RECIPE_STORE_PATH")
+        self._lock = threading.Lock()
+        self._db = connect(self.path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS recipes (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                servings REAL,
+                ready_in_minutes INTEGER,
+                summary TEXT,
+                complete INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ingredients (
+                recipe_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                amount REAL NOT NULL,
+                unit TEXT NOT NULL,
+                aisle TEXT NOT NULL,
+                PRIMARY KEY (recipe_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS searches (
+                query TEXT PRIMARY KEY,
+                recipe_ids TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            """
+        )
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(title, ingredients)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: fall back to LIKE matching on titles
+            self.fts = False
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    # ---- writes ----
+
+    def store_recipe(self, recipe: Dict[str, Any]):
+        """Save a Spoonacular recipe (an /information response or a complexSearch result)."""
+        self.store_recipes([recipe])
+
+    def store_recipes(self, recipes: Iterable[Dict[str, Any]]):
+        now = time.time()
+        with self._lock:
+            for recipe in recipes:
+                self._upsert(recipe, now)
+            self._db.commit()
+
+    def _upsert(self, recipe: Dict[str, Any], now: float):
+        recipe_id = int(recipe["id"])
+        extended = recipe.get("extendedIngredients")
+        existing = self._db.execute("SELECT complete FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        complete = bool(extended) or bool(existing and existing["complete"])
+        summary = recipe.get("summary") or ""
+        self._db.execute(
+            "INSERT OR REPLACE INTO recipes (id, title, servings, ready_in_minutes, summary, complete, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (recipe_id, recipe.get("title", "Unknown Recipe"), recipe.get("servings"),
+             recipe.get("readyInMinutes"), summary[:SUMMARY_CHARS], int(complete), now),
+        )
+        if extended:
+            self._db.execute("DELETE FROM ingredients WHERE recipe_id = ?", (recipe_id,))
+            self._db.executemany(
+                "INSERT INTO ingredients (recipe_id, position, name, amount, unit, aisle) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (recipe_id, position, ingredient.get("name", "Unknown ingredient"),
+                     ingredient.get("amount", 0) or 0, ingredient.get("unit", "") or "",
+                     ingredient.get("aisle", "Unknown aisle") or "Unknown aisle")
+                    for position, ingredient in enumerate(extended)
+                ],
+            )
+        if self.fts:
+            names = " ".join(
+                row["name"] for row in self._db.execute("SELECT name FROM ingredients WHERE recipe_id = ?", (recipe_id,))
+            )
+            self._db.execute("DELETE FROM recipes_fts WHERE rowid = ?", (recipe_id,))
+            self._db.execute(
+                "INSERT INTO recipes_fts (rowid, title, ingredients) VALUES (?, ?, ?)",
+                (recipe_id, recipe.get("title", ""), names),
+            )
+
+    def remember_search(self, query: str, recipe_ids: List[int], number: int):
+        """Record the ids Spoonacular returned when asked for `number` recipes matching query."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, recipe_ids, number, fetched_at) VALUES (?, ?, ?, ?)",
+                (normalize_query(query), json.dumps(recipe_ids), number, time.time()),
+            )
+            self._db.commit()
+
+    # ---- reads ----
+
+    def get_recipe(self, recipe_id: int, require_ingredients: bool = True) -> Optional[Dict[str, Any]]:
+        """A stored recipe with its ingredients, or None (also when ingredients are required but unknown)."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM recipes WHERE id = ?", (int(recipe_id),)).fetchone()
+            if row is None or (require_ingredients and not row["complete"]):
+                self.misses += 1
+                return None
+            recipe = self._recipe(row)
+            recipe["ingredients"] = [
+                dict(ingredient) for ingredient in self._db.execute(
+                    "SELECT name, amount, unit, aisle FROM ingredients WHERE recipe_id = ? ORDER BY position",
+                    (recipe["id"],),
+                )
+            ]
+            self.hits += 1
+            return recipe
+
+    @staticmethod
+    def _recipe(row: sqlite3.Row) -> Dict[str, Any]:
+        servings = row["servings"]
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "readyInMinutes": row["ready_in_minutes"] if row["ready_in_minutes"] is not None else "N/A",
+            "servings": int(servings) if servings and float(servings).is_integer() else (servings or "N/A"),
+            "summary": row["summary"],
+        }
+
+    def _recipes(self, ids: List[int]) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = {row["id"]: row for row in self._db.execute(f"SELECT * FROM recipes WHERE id IN ({placeholders})", ids)}
+        return [self._recipe(rows[recipe_id]) for recipe_id in ids if recipe_id in rows]
+
+    def search(self, query: str, number: int = 5, max_age: float = SEARCH_TTL_SECONDS) -> List[Dict[str, Any]]:
+        """
+        Recipes for a query: what Spoonacular returned for the same query earlier,
+        otherwise stored recipes matching every query word in the title or ingredients
+        (best matches first).
+        """
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+        with self._lock:
+            row = self._db.execute(
+                "SELECT recipe_ids, number, fetched_at FROM searches WHERE query = ?", (normalize_query(query),)
+            ).fetchone()
+            if row is not None and row["number"] >= number and row["fetched_at"] > time.time() - max_age:
+                # Spoonacular's own answer for this query, possibly fewer than asked for
+                self.hits += 1
+                return self._recipes(json.loads(row["recipe_ids"]))[:number]
+
+            if self.fts:
+                match = " ".join(f'"{token}"*' for token in tokens)
+                ids = [r[0] for r in self._db.execute(
+                    "SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH ? "
+                    "ORDER BY bm25(recipes_fts, 10.0, 1.0) LIMIT ?",
+                    (match, number),
+                )]
+            else:
+                clauses = " AND ".join("lower(title) LIKE ?" for _ in tokens)
+                ids = [r[0] for r in self._db.execute(
+                    f"SELECT id FROM recipes WHERE {clauses} LIMIT ?", [f"%{t}%" for t in tokens] + [number]
+                )]
+            found = self._recipes(ids)
+            if len(found) >= number:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return found
+
+    def find_by_ingredients(self, ingredients: List[str], number: int = 5) -> List[Dict[str, Any]]:
+        """
+        Stored recipes ranked like Spoonacular's findByIngredients (ranking=1):
+        most requested ingredients used first, then fewest missing.
+        """
+        wanted = [ingredient.lower().strip() for ingredient in ingredients if ingredient.strip()]
+        if not wanted:
+            return []
+        with self._lock:
+            recipe_rows = self._db.execute("SELECT id, title FROM recipes WHERE complete = 1").fetchall()
+            names: Dict[int, List[str]] = {}
+            for recipe_id, name in self._db.execute("SELECT recipe_id, name FROM ingredients ORDER BY recipe_id, position"):
+                names.setdefault(recipe_id, []).append(name)
+
+        ranked = []
+        for row in recipe_rows:
+            used, missed = [], []
+            for name in names.get(row["id"], []):
+                lowered = name.lower()
+                (used if any(w in lowered or lowered in w for w in wanted) else missed).append(name)
+            if used:
+                ranked.append((-len(used), len(missed), {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "used_ingredients": used,
+                    "missed_ingredients": missed,
+                    "unused_ingredients": [w for w in wanted if not any(w in n.lower() or n.lower() in w for n in used)],
+                }))
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        found = [recipe for _, _, recipe in ranked[:number]]
+        with self._lock:
+            if len(found) >= number:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recipes, complete = self._db.execute("SELECT COUNT(*), COALESCE(SUM(complete), 0) FROM recipes").fetchone()
+            searches = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return {"recipes": recipes, "with_ingredients": complete, "searches": searches,
+                "fts": self.fts, "hits": self.hits, "misses": self.misses}
+
+
+@lazy_singleton
+def get_recipe_store() -> RecipeStore:
+    """Process-wide store, opened on first use."""
+    return RecipeStore()
+
+
+# ------------------ Offline seeding --------------------
+
+def seed(store: RecipeStore, queries: List[str], per_query: int, api_key: str) -> int:
+    """Fetch full recipes for each query (complexSearch + informationBulk) into the store."""
+    from utils.http_client import http_client
+
+    stored = 0
+    for query in queries:
+        results = http_client.get_json(
+            f"{SPOONACULAR_BASE_URL}/complexSearch",
+            params={"apiKey": api_key, "query": query, "number": min(per_query, 100),
+                    "addRecipeInformation": True, "fillIngredients": True},
+            ttl=0,
+        ).get("results", [])
+        store.store_recipes(results)
+        store.remember_search(query, [recipe["id"] for recipe in results], per_query)
+        missing = [str(recipe["id"]) for recipe in results if not recipe.get("extendedIngredients")]
+        if missing:
+            store.store_recipes(http_client.get_json(
+                f"{SPOONACULAR_BASE_URL}/informationBulk",
+                params={"apiKey": api_key, "ids": ",".join(missing)},
+                ttl=0,
+            ))
+        stored += len(results)
+        print(f"  {query}: {len(results)} recipes")
+    return stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    job = commands.add_parser("seed", help="fetch recipes for a list of queries from Spoonacular")
+    job.add_argument("--queries", required=True, help="comma separated")
+    job.add_argument("--per-query", type=int, default=20)
+    dump = commands.add_parser("import", help="load a JSON list of Spoonacular recipe objects")
+    dump.add_argument("file")
+    lookup = commands.add_parser("search", help="search the local store")
+    lookup.add_argument("query")
+    lookup.add_argument("--number", type=int, default=5)
+    commands.add_parser("stats")
+    args = parser.parse_args()
+
+    store = get_recipe_store()
+    started = time.perf_counter()
+    if args.command == "seed":
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("SPOONACULAR_API_KEY")
+        if not api_key:
+            raise SystemExit("SPOONACULAR_API_KEY not found in environment variables")
+        queries = [query.strip() for query in args.queries.split(",") if query.strip()]
+        count = seed(store, queries, args.per_query, api_key)
+        print(f"{count} recipes stored in {time.perf_counter() - started:.1f} s")
+        print(store.stats())
+    elif args.command == "import":
+        with open(args.file) as f:
+            recipes = json.load(f)
+        store.store_recipes(recipes)
+        print(f"{len(recipes)} recipes imported in {time.perf_counter() - started:.1f} s")
+        print(store.stats())
+    elif args.command == "search":
+        results = store.search(args.query, args.number)
+        elapsed = (time.perf_counter() - started) * 1000
+        for recipe in results:
+            print(f"  {recipe['id']:>8}  {recipe['title']}")
+        print(f"{len(results)} recipes in {elapsed:.2f} ms")
+    else:
+        print(store.stats())
@@ -7,7 +7,6 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 import os
 import json
-from dummydb import products_db
 # Add these lines at the top of your file
 import sys
 import os
@@ -24,17 +23,8 @@ from utils.json_formatters import beautify_json
 load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 
-# ------------------ Allergy keyword DB --------------------
-allergen_keywords = {
-    "nuts": ["peanut", "almond", "walnut", "cashew", "pecan", "hazelnut", "pistachio", "tree nuts"],
-    "dairy": ["milk", "cheese", "butter", "cream", "lactose", "casein", "whey"],
-    "gluten": ["wheat", "barley", "rye", "oats", "gluten"],
-    "eggs": ["egg", "albumin", "lecithin"],
-    "soy": ["soy", "soybean", "tofu", "tempeh"],
-    "shellfish": ["shrimp", "crab", "lobster", "shellfish"],
-    "fish": ["salmon", "tuna", "cod", "fish"],
-    "sesame": ["sesame", "tahini"]
-}
+from diet_engine import check_list
+import budget_service
 
 # ------------------ LLM --------------------
 
@@ -73,17 +63,10 @@ def check_for_allergies(input_data: str) -> str:
     
     warnings = []
     
-    for item in shopping_list:
-        item_name = str(item).lower()
-        item_warnings = []
-        for allergy in user_allergies:
-            allergy_keywords = allergen_keywords.get(str(allergy).lower(), [])
-            for keyword in allergy_keywords:
-                if keyword in item_name:
-                    item_warnings.append(allergy)
-                    break
-        if item_warnings:
-            warnings.append(f"⚠️ '{item}' may contain: {', '.join(item_warnings)}")
+    # one scan per item for all allergies, plus the product's catalogue profile
+    for result in check_list(shopping_list, user_allergies):
+        if result["allergens"]:
+            warnings.append(f"⚠️ '{result['item']}' may contain: {', '.join(result['allergens'])}")
     
     return "ALLERGEN WARNINGS:\n" + "\n".join(warnings) if warnings else "✅ No allergens detected."
 
@@ -121,25 +104,27 @@ def check_budget(input_data: str) -> str:
     # Convert all items to strings to prevent joining issues
     shopping_list = [str(item) for item in shopping_list]
     
-    total_cost = 0.0
-    missing_items = []
-
-    for item in shopping_list:
-        item_name = item.lower()
-        if item_name in products_db:
-            total_cost += products_db[item_name]["price"]
-        else:
-            missing_items.append(item)  # This should be a string now
-
-    if missing_items:
-        # Convert any non-string items to strings before joining
-        missing_items_str = [str(item) for item in missing_items]
-        return f"⚠️ Items not found: {', '.join(missing_items_str)}"
+    # live catalogue prices for the whole list in one batch
+    report = budget_service.check_budget(shopping_list, budget)
+    total_cost = report["total"]
+    
+    lines = []
+    if report["missing"]:
+        lines.append(f"⚠️ Items not found: {', '.join(report['missing'])}")
 
     if total_cost > budget:
-        return f"❌ Budget exceeded! Limit: ${budget}, Cost: ${total_cost:.2f}"
+        lines.append(f"❌ Budget exceeded! Limit: ${budget}, Cost: ${total_cost:.2f}")
+        for suggestion in report["suggestions"]:
+            lines.append(
+                f"💡 Swap {suggestion['instead_of']} for {suggestion['product_name']} "
+                f"(${suggestion['cost']:.2f}, saves ${suggestion['saves']:.2f})"
+            )
+        if report["suggestions"]:
+            lines.append(f"Cost with swaps: ${report['total_after_suggestions']:.2f}")
+    else:
+        lines.append(f"✅ Within budget! Limit: ${budget}, Cost: ${total_cost:.2f}")
     
-    return f"✅ Within budget! Limit: ${budget}, Cost: ${total_cost:.2f}"
+    return "\n".join(lines)
 
 
 @tool
@@ -169,11 +154,7 @@ def check_vegan_status(input_data: str) -> str:
     if not isinstance(shopping_list, list):
         return "Error: shopping_list must be a list."
     
-    non_vegan = []
-    for item in shopping_list:
-        item_name = str(item).lower()
-        if item_name in products_db and not products_db[item_name]["vegan"]:
-            non_vegan.append(item)
+    non_vegan = [str(result["item"]) for result in check_list(shopping_list) if not result["vegan"]]
     
     if non_vegan:
         return f"❌ Not Vegan: {', '.join(non_vegan)}"
@@ -0,0 +1,133 @@
+"""
+Per-turn context shared by the cart manager's tools.
+
+Without it every tool call opens its own DB session and looks the user up again,
+so an agent turn with five tool calls costs five sessions and five identical user
+queries. Inside `tool_turn()` the tools share one session, opened on first use,
+and each user is loaded once and kept as a detached principal (the routers only
+read its columns):
+
+    with tool_turn() as context:
+        agent_executor.invoke(...)      # tools call tool_session() / get_user()
+    # committed if the turn finished, rolled back if it raised; session closed
+
+A tool that raises inside tool_session() rolls the shared session back, so the
+next tool in the turn starts clean. Outside a turn (and in threads started during
+it, e.g. the plan-and-execute pool, where the context variable is not set)
+tool_session() opens and closes a session per call as before.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class ToolContext:
+    """One DB session and a user cache for the tool calls of a single agent turn."""
+
+    def __init__(self, session_factory: Optional[Callable[..., Any]] = None):
+        self._session_factory = session_factory
+        self._db = None
+        self._users: Dict[Any, Any] = {}
+        self.sessions_opened = 0
+        self.user_queries = 0
+
+    @property
+    def db(self):
+        if self._db is None:
+            if self._session_factory is None:
+                from backend.app import database
+                self._session_factory = database.SessionLocal
+            self._db = self._session_factory()
+            self.sessions_opened += 1
+        return self._db
+
+    def get_user(self, user_id):
+        """The user with this id (None if there is none), queried once per turn."""
+        from backend.app import models
+
+        try:
+            key = int(user_id)
+        except (TypeError, ValueError):
+            key = user_id
+        if key not in self._users:
+            self.user_queries += 1
+            user = self.db.query(models.User).filter(models.User.id == key).first()
+            if user is not None:
+                # a detached snapshot: the routers' commits and a tool's rollback would
+                # otherwise expire it and reload it on the next attribute access
+                self.db.expunge(user)
+            self._users[key] = user
+        return self._users[key]
+
+    def close(self, commit: bool = True):
+        """Commit (or roll back) whatever the turn left pending and close the session."""
+        if self._db is None:
+            return
+        try:
+            if commit:
+                self._db.commit()
+            else:
+                self._db.rollback()
+        finally:
+            self._db.close()
+            self._db = None
+            self._users.clear()
+
+
+_current: ContextVar[Optional[ToolContext]] = ContextVar("tool_context", default=None)
+
+
+def current_tool_context() -> Optional[ToolContext]:
+    return _current.get()
+
+
+@contextmanager
+def tool_turn(session_factory: Optional[Callable[..., Any]] = None) -> Iterator[ToolContext]:
+    """Run one agent turn with a shared tool context. Nested turns reuse the outer one."""
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+
+    context = ToolContext(session_factory)
+    token = _current.set(context)
+    try:
+        yield context
+    except BaseException:
+        context.close(commit=False)
+        raise
+    else:
+        context.close(commit=True)
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def tool_session():
+    """The turn's session inside tool_turn(), otherwise a session of its own for this call."""
+    context = _current.get()
+    if context is None:
+        from backend.app import database
+        db = database.SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+
+    db = context.db
+    try:
+        yield db
+    except BaseException:
+        # leave the session usable for the turn's next tool
+        db.rollback()
+        raise
+
+
+def get_user(user_id, db):
+    """Look the user up, through the turn's cache when db is the turn's session."""
+    context = _current.get()
+    if context is not None and context._db is db:
+        return context.get_user(user_id)
+    from backend.app import models
+    return db.query(models.User).filter(models.User.id == user_id).first()
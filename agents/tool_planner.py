@@ -0,0 +1,254 @@
+"""
+Plan-and-execute mode for requests made of independent lookups.
+
+The ReAct agents make one tool call per LLM step, so "find milk, eggs and bread"
+or "check these for nuts and keep it under $20" pays an LLM round trip per
+lookup, strictly in sequence. Here one LLM call plans all the tool calls, the
+calls run concurrently on a shared thread pool, and one more LLM call writes the
+answer from the results: two model calls however many lookups there are, and the
+lookups take as long as the slowest one.
+
+Only read-only tools can be planned; anything that changes the cart, or where one
+step needs another's result, is left to the routed ReAct agent (the planner
+returns an empty plan). An empty plan costs a wasted LLM call before the agent
+starts, so looks_multi_step() already turns away messages that chain their steps
+("find a pasta recipe and check it for nuts"). Each tool opens its own DB session,
+so concurrent calls draw from the engine's connection pool (see db_pool_size in
+backend/app/config.py).
+
+    python agents/tool_planner.py --calls 4 --latency 0.3
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from cart_command_parser import parse_command
+from utils.tracing import tracer
+
+# "auto" plans requests that look like several lookups, "off" never plans
+PLAN_MODE = os.getenv("AGENT_PLAN_MODE", "auto").lower()
+PLAN_WORKERS = int(os.getenv("AGENT_PLAN_WORKERS", "8"))
+MAX_PLAN_STEPS = 8
+
+# tools that may run in a plan, by module; none of them write
+PLANNABLE_TOOLS = {
+    "agent_search_product": "cartmanager_agent",
+    "agent_get_cart": "cartmanager_agent",
+    "check_for_allergies": "shopinglist_react_agent",
+    "check_budget": "shopinglist_react_agent",
+    "check_vegan_status": "shopinglist_react_agent",
+    "search_recipes": "recipe_shopping_agent",
+    "get_recipe_ingredients": "recipe_shopping_agent",
+    "get_recipe_by_ingredients": "recipe_shopping_agent",
+    "match_recipe_to_products": "recipe_shopping_agent",
+}
+
+# kinds of lookup a message can ask for; two or more kinds, or one lookup over a list, is worth planning
+_LOOKUPS = {
+    "allergies": re.compile(r"\b(?:allerg\w*|nut[- ]free|gluten|dairy[- ]free|lactose)\b"),
+    "budget": re.compile(r"\b(?:budget|afford|under \$?\d+|within \$?\d+|total cost)\b"),
+    "vegan": re.compile(r"\b(?:vegan|plant[- ]based)\b"),
+    "search": re.compile(r"\b(?:search|find|look up|look for|price of|prices of|how much (?:is|are)|do you (?:have|sell))\b"),
+    "recipe": re.compile(r"\b(?:recipes?|how (?:do i|to) (?:make|cook))\b"),
+    "cart": re.compile(r"\b(?:my cart|my basket|in (?:my|the) cart)\b"),
+}
+_LIST = re.compile(r",|\band\b|\bplus\b")
+_WRITES = re.compile(r"\b(?:add|put|remove|delete|drop|change|set|update|order|checkout|check out|buy|pay)\b")
+# a later step refers to an earlier one's result: "... then check it", "are those vegan"
+_DEPENDS = re.compile(r"\b(?:then|after that|it|its|them|they|those|these ones|the (?:recipe|ingredients|results?))\b")
+# checks that, next to a recipe lookup, apply to the recipe's ingredients
+_RECIPE_CHECKS = {"allergies", "budget", "vegan"}
+
+PLANNER_PROMPT = """You plan tool calls for a grocery shopping assistant.
+Split the user's request into tool calls that do not depend on each other's results, so they can run at the same time.
+Use only these tools:
+{tools}
+
+Respond with only a JSON list, e.g.
+[{{"tool": "agent_search_product", "input": "milk"}}, {{"tool": "agent_search_product", "input": "eggs"}}]
+A tool that takes JSON gets its input as a JSON string. Use at most {max_steps} calls.
+Respond with [] if the request changes the cart or places an order, if a call needs another call's result,
+or if it needs no tools.
+
+User ID: {user_id}
+Request: {message}"""
+
+ANSWER_PROMPT = """You are a grocery shopping assistant. Answer the user's request using these tool results.
+Use a clear list format, mention prices, warnings and anything that was not found.
+
+Request: {message}
+
+Tool results:
+{results}"""
+
+
+class ToolCall(NamedTuple):
+    tool: str
+    input: str
+
+
+class ToolResult(NamedTuple):
+    call: ToolCall
+    output: str
+    seconds: float
+
+
+def looks_multi_step(message: str) -> bool:
+    """True when the message asks for several independent lookups and changes nothing."""
+    text = message.lower()
+    if _WRITES.search(text) or _DEPENDS.search(text) or parse_command(text):
+        return False
+    kinds = {kind for kind, pattern in _LOOKUPS.items() if pattern.search(text)}
+    if "recipe" in kinds and kinds & _RECIPE_CHECKS:
+        return False
+    return len(kinds) >= 2 or (len(kinds) == 1 and bool(_LIST.search(text)))
+
+
+def should_plan(message: str) -> bool:
+    return PLAN_MODE != "off" and looks_multi_step(message)
+
+
+_tools: Dict[str, Any] = {}
+_tools_lock = threading.Lock()
+
+
+def get_tools() -> Dict[str, Any]:
+    """The plannable tools by name, imported from their agent modules on first use."""
+    if not _tools:
+        with _tools_lock:
+            if not _tools:
+                import importlib
+                for name, module in PLANNABLE_TOOLS.items():
+                    _tools[name] = getattr(importlib.import_module(module), name)
+    return _tools
+
+
+def _parse_plan(response: str, tools: Dict[str, Any]) -> List[ToolCall]:
+    match = re.search(r"\[.*\]", response, re.DOTALL)
+    if not match:
+        return []
+    try:
+        steps = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    plan = []
+    for step in steps if isinstance(steps, list) else []:
+        if not isinstance(step, dict) or step.get("tool") not in tools:
+            continue
+        tool_input = step.get("input", "")
+        if not isinstance(tool_input, str):
+            tool_input = json.dumps(tool_input)
+        call = ToolCall(step["tool"], tool_input)
+        if call not in plan:
+            plan.append(call)
+    return plan[:MAX_PLAN_STEPS]
+
+
+def make_plan(llm, message: str, user_id: int, tools: Optional[Dict[str, Any]] = None) -> List[ToolCall]:
+    """Ask the LLM for the independent tool calls a request needs. [] means leave it to the agent."""
+    tools = tools or get_tools()
+    prompt = PLANNER_PROMPT.format(
+        tools="\n".join(f"{name}: {' '.join(tool.description.split())}" for name, tool in tools.items()),
+        max_steps=MAX_PLAN_STEPS,
+        user_id=user_id,
+        message=message,
+    )
+    return _parse_plan(llm.predict(prompt), tools)
+
+
+def _call_tool(tool, tool_input: str, user_id: int) -> str:
+    # tools that act for a user get the session's user id, never one the model wrote
+    if "user_id" in tool.args:
+        payload = {"user_id": user_id}
+        others = [arg for arg in tool.args if arg != "user_id"]
+        if len(others) == 1:
+            payload[others[0]] = tool_input
+        return tool.invoke(payload)
+    return tool.invoke(tool_input)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PLAN_WORKERS, thread_name_prefix="plan-tool")
+    return _executor
+
+
+def execute_plan(plan: List[ToolCall], user_id: int, tools: Optional[Dict[str, Any]] = None) -> List[ToolResult]:
+    """Run the planned calls concurrently. Results come back in plan order; a failing call reports its error."""
+    tools = tools or get_tools()
+    # worker threads don't inherit the current span, so hand it over explicitly
+    parent = tracer.current_span()
+
+    def run(call: ToolCall) -> ToolResult:
+        started = time.perf_counter()
+        with tracer.span(call.tool, "tool", parent, input=call.input):
+            try:
+                output = str(_call_tool(tools[call.tool], call.input, user_id))
+            except Exception as e:
+                output = f"Error: {e}"
+        return ToolResult(call, output, time.perf_counter() - started)
+
+    if len(plan) == 1:
+        return [run(plan[0])]
+    return list(_get_executor().map(run, plan))
+
+
+def answer(llm, message: str, results: List[ToolResult]) -> str:
+    """Write the reply to the user from the tool results."""
+    lines = "\n".join(f"{result.call.tool}({result.call.input}) -> {result.output}" for result in results)
+    return llm.predict(ANSWER_PROMPT.format(message=message, results=lines)).strip()
+
+
+if __name__ == "__main__":
+    # Sequential vs planned execution of simulated lookups; no model or DB calls are made
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=4, help="independent lookups in the request")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per tool call")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per LLM step")
+    args = parser.parse_args()
+
+    class SlowTool:
+        args = {"product_name": {}}
+        description = "simulated lookup"
+
+        def invoke(self, tool_input):
+            time.sleep(args.latency)
+            return f"found {tool_input}"
+
+    fake_tools = {"agent_search_product": SlowTool()}
+    plan = [ToolCall("agent_search_product", f"item {i}") for i in range(args.calls)]
+
+    # ReAct: one LLM step per tool call plus the final answer, tools one after another
+    started = time.perf_counter()
+    for call in plan:
+        time.sleep(args.llm_latency)
+        _call_tool(fake_tools[call.tool], call.input, user_id=1)
+    time.sleep(args.llm_latency)
+    sequential = time.perf_counter() - started
+
+    # plan-and-execute: plan, all tool calls at once, answer
+    started = time.perf_counter()
+    time.sleep(args.llm_latency)
+    results = execute_plan(plan, user_id=1, tools=fake_tools)
+    time.sleep(args.llm_latency)
+    planned = time.perf_counter() - started
+
+    assert [result.output for result in results] == [f"found item {i}" for i in range(args.calls)]
+    print(f"{args.calls} lookups: ReAct {sequential:.2f} s, plan-and-execute {planned:.2f} s "
+          f"({planned / sequential:.0%} of the wall-clock time)")
+    for message in ["find milk, eggs and bread", "is this vegan and within a $20 budget?",
+                    "find a pasta recipe and check it for nuts", "vegan pancake recipes under $10",
+                    "add 2 apples and bread", "show my cart", "find milk"]:
+        print(f"  {message!r:45} -> {'plan' if looks_multi_step(message) else 'agent'}")
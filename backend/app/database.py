@@ -7,7 +7,16 @@ load_dotenv()
 
 SQL_ALCHEMY_DATABASE_URL= settings.database_url
 
-engine = create_engine(SQL_ALCHEMY_DATABASE_URL, echo=True)
+# One pooled engine per process; agent tools running concurrently each check out their own connection
+engine = create_engine(
+    SQL_ALCHEMY_DATABASE_URL,
+    echo=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -28,8 +28,13 @@ from backend.app.routers import (
     cart, 
     orders, 
     search, 
-    chat
+    chat,
+    export,
+    analytics,
+    metrics
 )
+from backend.app.utils import metrics as metrics_utils
+from backend.app.utils.chat_writer import chat_writer
 
 # Create database tables
 models.Base.metadata.create_all(bind=database.engine)
@@ -40,6 +45,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Request metrics: latency, SQL count/time and response size per route, see /metrics
+metrics_utils.install_sql_hooks(database.engine)
+app.add_middleware(metrics_utils.MetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -57,6 +66,21 @@ app.include_router(cart.router)
 app.include_router(orders.router)
 app.include_router(search.router)
 app.include_router(chat.router)
+app.include_router(export.router)
+app.include_router(analytics.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+async def start_background_workers():
+    await chat_writer.start()
+    # subscribe this worker's WebSocket manager to the pub/sub bus
+    await chat.manager.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await chat.manager.stop()
+    # flush chat messages still waiting in the write-behind queue
+    await chat_writer.stop()
 
 @app.get("/")
 def root():
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, JSON, Enum, DECIMAL, LargeBinary
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, JSON, Enum, DECIMAL, LargeBinary, Index, Date
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import TIMESTAMP
@@ -89,6 +89,11 @@ class Orders(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    # order history is read per user, newest first
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
@@ -128,4 +133,51 @@ class ChatMessage(Base):
 
     user = relationship("User", back_populates="chat_messages")
 
+    # history and context windows are read per user, newest first
+    __table_args__ = (
+        Index("ix_chat_messages_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+
+# --- Analytics rollups ---
+# Incrementally maintained daily aggregates, written in the same transaction as
+# checkout / cancellation (see utils/analytics.py) and rebuildable from orders.
+# Cancelled figures are tracked separately, net = sold - cancelled.
 
+class ProductSalesDaily(Base):
+    __tablename__ = "product_sales_daily"
+
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    day = Column(Date, primary_key=True, nullable=False)
+    orders = Column(Integer, default=0, nullable=False)
+    units_sold = Column(Integer, default=0, nullable=False)
+    revenue = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
+    units_cancelled = Column(Integer, default=0, nullable=False)
+    revenue_cancelled = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_product_sales_daily_day", "day"),
+    )
+
+class CategorySalesDaily(Base):
+    __tablename__ = "category_sales_daily"
+
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    day = Column(Date, primary_key=True, nullable=False)
+    units_sold = Column(Integer, default=0, nullable=False)
+    revenue = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
+    units_cancelled = Column(Integer, default=0, nullable=False)
+    revenue_cancelled = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_category_sales_daily_day", "day"),
+    )
+
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True, nullable=False)
+    orders = Column(Integer, default=0, nullable=False)
+    revenue = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
+    orders_cancelled = Column(Integer, default=0, nullable=False)
+    revenue_cancelled = Column(DECIMAL(precision=12, scale=2), default=0, nullable=False)
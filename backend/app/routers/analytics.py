@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models, schemas, database, oauth2
+from ..utils import analytics as analytics_utils
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+)
+
+# All dashboards read the precomputed daily rollups (see utils/analytics.py),
+# never the raw orders / order_items tables.
+
+DEFAULT_WINDOW_DAYS = 30
+
+
+def _require_admin(current_user: schemas.UserOut):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to view analytics")
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """
+    Resolve the requested window, defaulting to the last 30 days.
+    Raises HTTPException if start is after end.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    return start, end
+
+
+def _daily_rows(db: Session, start: date, end: date) -> List[schemas.DailyRevenueOut]:
+    rows = db.query(models.SalesDaily).filter(models.SalesDaily.day.between(start, end)).order_by(models.SalesDaily.day).all()
+    return [
+        schemas.DailyRevenueOut(
+            day=row.day,
+            orders=row.orders,
+            revenue=float(row.revenue),
+            orders_cancelled=row.orders_cancelled,
+            revenue_cancelled=float(row.revenue_cancelled),
+            net_revenue=float(row.revenue - row.revenue_cancelled),
+        )
+        for row in rows
+    ]
+
+
+@router.get("/top-sellers", response_model=List[schemas.TopSellerOut])
+def get_top_sellers(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    sort_by: str = Query(default="units", pattern="^(units|revenue)$"),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve the best selling products in the window, net of cancellations.
+    Products can be ranked by units sold or by revenue.
+    Only admins can view analytics.
+    """
+    _require_admin(current_user)
+    start, end = _date_range(start, end)
+
+    rollup = models.ProductSalesDaily
+    units = func.sum(rollup.units_sold - rollup.units_cancelled)
+    revenue = func.sum(rollup.revenue - rollup.revenue_cancelled)
+    rows = (
+        db.query(rollup.product_id, models.Product.name, units.label("units_sold"), revenue.label("revenue"))
+        .join(models.Product, models.Product.id == rollup.product_id)
+        .filter(rollup.day.between(start, end))
+        .group_by(rollup.product_id, models.Product.name)
+        .order_by((units if sort_by == "units" else revenue).desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        schemas.TopSellerOut(product_id=row.product_id, name=row.name, units_sold=int(row.units_sold or 0), revenue=float(row.revenue or 0))
+        for row in rows
+    ]
+
+
+@router.get("/revenue/daily", response_model=List[schemas.DailyRevenueOut])
+def get_daily_revenue(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve order count and revenue per day in the window.
+    Days without orders are omitted.
+    Only admins can view analytics.
+    """
+    _require_admin(current_user)
+    start, end = _date_range(start, end)
+    return _daily_rows(db, start, end)
+
+
+@router.get("/revenue/categories", response_model=List[schemas.CategoryRevenueOut])
+def get_category_revenue(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve units sold and revenue per category in the window, net of cancellations.
+    A product in several categories counts towards each of them.
+    Only admins can view analytics.
+    """
+    _require_admin(current_user)
+    start, end = _date_range(start, end)
+
+    rollup = models.CategorySalesDaily
+    units = func.sum(rollup.units_sold - rollup.units_cancelled)
+    revenue = func.sum(rollup.revenue - rollup.revenue_cancelled)
+    rows = (
+        db.query(rollup.category_id, models.Category.name, units.label("units_sold"), revenue.label("revenue"))
+        .join(models.Category, models.Category.id == rollup.category_id)
+        .filter(rollup.day.between(start, end))
+        .group_by(rollup.category_id, models.Category.name)
+        .order_by(revenue.desc())
+        .all()
+    )
+    return [
+        schemas.CategoryRevenueOut(category_id=row.category_id, name=row.name, units_sold=int(row.units_sold or 0), revenue=float(row.revenue or 0))
+        for row in rows
+    ]
+
+
+@router.get("/cancellations", response_model=schemas.CancellationRateOut)
+def get_cancellation_rate(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve the share of orders placed in the window that were later cancelled,
+    overall and per day.
+    Only admins can view analytics.
+    """
+    _require_admin(current_user)
+    start, end = _date_range(start, end)
+
+    daily = _daily_rows(db, start, end)
+    orders = sum(row.orders for row in daily)
+    orders_cancelled = sum(row.orders_cancelled for row in daily)
+    return schemas.CancellationRateOut(
+        start=start,
+        end=end,
+        orders=orders,
+        orders_cancelled=orders_cancelled,
+        cancellation_rate=orders_cancelled / orders if orders else 0.0,
+        daily=daily,
+    )
+
+
+@router.post("/rebuild", response_model=schemas.RollupRebuildOut)
+def rebuild_rollups(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.UserOut = Depends(oauth2.get_current_user),
+):
+    """
+    Recompute the rollups for the window from raw order history.
+    Use it to backfill orders placed before the rollups existed or to repair drift.
+    Only admins can rebuild analytics.
+    """
+    _require_admin(current_user)
+    start, end = _date_range(start, end)
+
+    rows_written = analytics_utils.rebuild_rollups(db, start, end)
+    db.commit()
+    return schemas.RollupRebuildOut(start=start, end=end, rows_written=rows_written)
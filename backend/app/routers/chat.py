@@ -1,5 +1,5 @@
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from datetime import datetime
 from jose import JWTError
@@ -9,6 +9,7 @@ import sys
 import os
 from .. import models, schemas, oauth2, database
 
+from ..utils import chat_history, pubsub
 from .websockets_server import ConnectionManager
 
 router = APIRouter(
@@ -16,7 +17,7 @@ router = APIRouter(
     tags=["chat"],
 )
 
-manager = ConnectionManager()
+manager = ConnectionManager(bus=pubsub.bus)
 
 @router.websocket("/ws/{user_id}")
 async def chat_with_agent(
@@ -63,7 +64,7 @@ async def chat_with_agent(
     # If we reach here, authentication was successful
     try:
         print(f"🔌 Connecting WebSocket for user {current_user.id}")
-        await manager.connect(websocket)
+        await manager.connect(websocket, current_user.id)
         
         # Send welcome message as JSON
         welcome_message = {
@@ -99,7 +100,7 @@ async def chat_test(
 ):
     """Test WebSocket endpoint without authentication"""
     try:
-        await manager.connect(websocket)
+        await manager.connect(websocket, 999)
         
         welcome_message = {
             "message": "Hello! This is a test connection to VoiceCart assistant.",
@@ -120,6 +121,34 @@ async def chat_test(
         print(f"Test chat error: {e}")
         manager.disconnect(websocket, 999)
 
+@router.get("/history", response_model=schemas.ChatHistoryPage)
+def get_chat_history(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve the current user's chat messages, newest first.
+    Pagination is keyset based on (created_at, id): pass the returned next_cursor
+    to fetch older messages.
+    """
+    messages, next_cursor = chat_history.history_page(db, current_user.id, limit, cursor)
+    return {"messages": messages, "next_cursor": next_cursor}
+
+@router.get("/context", response_model=schemas.ChatContextOut)
+def get_chat_context(
+    turns: int = Query(default=5, ge=1, le=50),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.get_current_user),
+):
+    """
+    Retrieve the last `turns` exchanges of the current user's chat, oldest first,
+    with a short summary of what was asked before them.
+    Used to restore an agent's context on reconnect.
+    """
+    return chat_history.load_context_window(db, current_user.id, turns)
+
 @router.get("/test")
 async def test_chat():
     """Test endpoint to verify chat router is working"""
@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from .. import database, oauth2, schemas
+from ..utils import export as export_utils
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _stream(records_fn, columns, format: str):
+    """
+    Generator backing a StreamingResponse.
+    It opens its own session because the request-scoped one from get_db may be
+    closed before the response body has finished streaming.
+    """
+    db = database.SessionLocal()
+    try:
+        records = records_fn(db)
+        if format == "csv":
+            yield from export_utils.csv_chunks(records, columns)
+        else:
+            yield from export_utils.ndjson_chunks(records)
+    finally:
+        db.close()
+
+
+@router.get("/products")
+def export_products(format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"), current_user: schemas.UserOut = Depends(oauth2.get_current_user)):
+    """
+    Stream the full product catalogue as NDJSON or CSV.
+    Rows are read through a server-side cursor and sent as they arrive, so memory
+    use stays constant regardless of catalogue size. Images are not included.
+    Only admins can export the catalogue.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to export products")
+
+    return StreamingResponse(
+        _stream(export_utils.iter_products, export_utils.PRODUCT_EXPORT_COLUMNS, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=products.{format}"},
+    )
+
+
+@router.get("/orders")
+def export_orders(format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"), current_user: schemas.UserOut = Depends(oauth2.get_current_user)):
+    """
+    Stream the full order history as NDJSON (one order with its items per line)
+    or CSV (one row per order item).
+    Only admins can export orders.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to export orders")
+
+    if format == "csv":
+        records_fn = export_utils.iter_order_rows
+    else:
+        records_fn = export_utils.iter_orders
+
+    return StreamingResponse(
+        _stream(records_fn, export_utils.ORDER_EXPORT_COLUMNS, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=orders.{format}"},
+    )
@@ -0,0 +1,30 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from .. import oauth2, schemas
+from ..utils import metrics as metrics_utils
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus scrape endpoint: per-route latency, SQL query count and time,
+    and response size histograms for this worker.
+    """
+    return PlainTextResponse(metrics_utils.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/slow", response_model=List[dict])
+def get_slow_requests(current_user: schemas.UserOut = Depends(oauth2.get_current_user)):
+    """
+    Retrieve the most recent slow requests with the SQL they ran, slowest statement first.
+    Only admins can view the samples since statements may contain user data.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to view slow requests")
+    return metrics_utils.registry.slow_request_samples()
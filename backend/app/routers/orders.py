@@ -1,9 +1,13 @@
+import json
+from collections import Counter
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.params import Body
-from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
 from .. import models, schemas, oauth2, database
 from . import cart
+from ..utils import analytics, pagination, products as product_utils, pubsub
 from datetime import datetime, timedelta
 
 router = APIRouter(
@@ -32,6 +36,7 @@ def create_order(address: str, total_amount: Optional[float], db: Session = Depe
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty. Please add items to the cart before placing an order.")
     
     # remove items from cart and reduce the stock
+    prices = {}
     for item in cart_items:
         product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
         if not product:
@@ -43,6 +48,7 @@ def create_order(address: str, total_amount: Optional[float], db: Session = Depe
         # Reduce the stock and delete item from cart
         product.stock -= item.quantity
         product.num_sold += item.quantity  # Increment order count for the product
+        prices[item.product_id] = product.price
         db.commit()
 
     # Create the order
@@ -56,30 +62,78 @@ def create_order(address: str, total_amount: Optional[float], db: Session = Depe
     db.commit()
     db.refresh(new_order)
 
+    order_items = []
     for item in cart_items:
         order_item = models.OrderItem(
             order_id=new_order.id,
             product_id=item.product_id,
             quantity=item.quantity,
-            price=product.price  # Assuming product has a price attribute
+            price=prices[item.product_id]  # price of this product at the time of order
         )
         db.add(order_item)
+        order_items.append(order_item)
+
+    # update the sales rollups in the same transaction as the order items
+    analytics.record_order(db, new_order, order_items)
     db.commit()
 
     cart.clear_cart(db, current_user)  # Clear the cart after processing the order
 
     return new_order
 
-@router.get("/", response_model=List[schemas.OrderOut])
-def get_orders(db: Session = Depends(database.get_db), current_user: int = Depends(oauth2.get_current_user)): # TODO: add query parameters later
+@router.get("/", response_model=schemas.OrderPage)
+def get_orders(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order_status: Optional[str] = Query(default=None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(database.get_db),
+    current_user: int = Depends(oauth2.get_current_user),
+):
     """
-    Retrieve all orders for the current user.
-    Raises HTTPException if no orders are found for the user.
+    Retrieve a page of orders for the current user, newest first.
+    Pagination is keyset based on (created_at, id): pass the returned next_cursor
+    to fetch the following page. Orders can be filtered by status and creation date.
+    Items and a slim product summary are select-in loaded, so a page costs a
+    constant number of queries regardless of how many orders and items it holds.
+    Raises HTTPException if the user has no orders at all.
     """
-    orders = db.query(models.Orders).filter(models.Orders.user_id == current_user.id).all()
-    if not orders:
+    query = db.query(models.Orders).filter(models.Orders.user_id == current_user.id)
+
+    if order_status:
+        query = query.filter(models.Orders.status == order_status)
+    if created_from:
+        query = query.filter(models.Orders.created_at >= created_from)
+    if created_to:
+        query = query.filter(models.Orders.created_at < created_to)
+    if cursor:
+        cursor_created_at, cursor_id = pagination.decode_cursor(cursor)
+        query = query.filter(
+            tuple_(models.Orders.created_at, models.Orders.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    orders = (
+        query.options(
+            selectinload(models.Orders.items)
+            .selectinload(models.OrderItem.product)
+            .load_only(models.Product.id, models.Product.name, models.Product.price, models.Product.brand_name)
+        )
+        .order_by(models.Orders.created_at.desc(), models.Orders.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    if not orders and cursor is None and not (order_status or created_from or created_to):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No orders found")
-    return orders
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        next_cursor = pagination.encode_cursor(last.created_at, last.id)
+
+    return {"orders": orders, "next_cursor": next_cursor}
 
 @router.get("/{order_id}", response_model=schemas.OrderOut)
 def get_order(order_id: int, db: Session = Depends(database.get_db), current_user: int = Depends(oauth2.get_current_user)):
@@ -107,8 +161,16 @@ def update_order(order_id: int, orderUpdate: schemas.OrderUpdate, db: Session =
 
     Currently, total_amount cannot be updated.
     If the order is cancelled, additional refund logic can be added later.
+
+    The order row is locked (SELECT ... FOR UPDATE) until the commit, so two concurrent
+    cancellations cannot both see it open and restore its stock twice.
     """
-    order = db.query(models.Orders).filter(models.Orders.id == order_id, models.Orders.user_id == current_user.id).first()
+    order = (
+        db.query(models.Orders)
+        .filter(models.Orders.id == order_id, models.Orders.user_id == current_user.id)
+        .with_for_update()
+        .first()
+    )
     
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
@@ -125,12 +187,11 @@ def update_order(order_id: int, orderUpdate: schemas.OrderUpdate, db: Session =
     
         if new_status == "Cancelled":
             # TODO: add refund logic if needed
+            quantities = Counter()
             for item in order.items:
-                product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-                if product:
-                    product.stock += item.quantity
-                    product.num_sold -= item.quantity
-                    # db.commit()
+                quantities[item.product_id] += item.quantity
+            product_utils.restore_stock(db, quantities)
+            analytics.record_order(db, order, order.items, cancelled=True)
 
     if orderUpdate.address:
         # Address of order cannot be updated 24 hours after the order is placed
@@ -140,5 +201,99 @@ def update_order(order_id: int, orderUpdate: schemas.OrderUpdate, db: Session =
 
     db.commit()
     db.refresh(order)
+
+    if new_status:
+        notify_order_status(order.user_id, order.id, order.status)
     
-    return order
\ No newline at end of file
+    return order
+
+def notify_order_status(user_id: int, order_id: int, order_status: str):
+    """
+    Push an order status change to the user's open chat sockets, on any worker.
+    """
+    message = json.dumps({"type": "order_status", "order_id": order_id, "status": order_status})
+    pubsub.bus.publish_threadsafe(pubsub.user_envelope(user_id, message))
+
+FINAL_STATUSES = ("Delivered", "Cancelled")
+
+def cancel_orders(db: Session, order_ids: List[int]) -> List[schemas.OrderCancelResult]:
+    """
+    Cancel several orders at once.
+    Orders and their items are loaded in two queries, stock and num_sold are restored
+    with aggregated UPDATE ... FROM (VALUES ...) statements and the statuses are set
+    with a single UPDATE, so the cost does not grow with orders x items round trips.
+    Orders that do not exist, or are already delivered or cancelled, are skipped
+    and reported in the per-order results.
+    The caller is responsible for committing, so everything happens in one transaction.
+    The orders are locked (in id order, so concurrent calls cannot deadlock) until that
+    commit, so an order cancelled concurrently elsewhere is not cancelled twice.
+    """
+    order_ids = list(dict.fromkeys(order_ids))  # dedupe, keep request order
+    orders = (
+        db.query(models.Orders)
+        .options(selectinload(models.Orders.items))
+        .filter(models.Orders.id.in_(order_ids))
+        .order_by(models.Orders.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    orders_by_id = {order.id: order for order in orders}
+
+    results = []
+    to_cancel = []
+    for order_id in order_ids:
+        order = orders_by_id.get(order_id)
+        if not order:
+            results.append(schemas.OrderCancelResult(order_id=order_id, cancelled=False, detail="Order not found"))
+        elif order.status in FINAL_STATUSES:
+            results.append(schemas.OrderCancelResult(order_id=order_id, cancelled=False, detail=f"Order is already {order.status.lower()}"))
+        else:
+            to_cancel.append(order)
+            results.append(schemas.OrderCancelResult(order_id=order_id, cancelled=True, detail="Order cancelled"))
+
+    if not to_cancel:
+        return results
+
+    quantities = Counter()
+    for order in to_cancel:
+        for item in order.items:
+            quantities[item.product_id] += item.quantity
+    product_utils.restore_stock(db, quantities)
+
+    db.query(models.Orders).filter(models.Orders.id.in_([order.id for order in to_cancel])).update(
+        {models.Orders.status: "Cancelled"}, synchronize_session=False
+    )
+    analytics.record_orders(db, [(order, order.items) for order in to_cancel], cancelled=True)
+    return results
+
+@router.post("/cancel", response_model=schemas.BulkCancelOut)
+def bulk_cancel_orders(request: schemas.BulkCancelRequest, db: Session = Depends(database.get_db), current_user: int = Depends(oauth2.get_current_user)):
+    """
+    Cancel many orders in one transaction, e.g. every open order containing a recalled product.
+    Orders can be given explicitly by id, selected by product_id, or both.
+    Stock is restored for every cancelled order.
+    Returns the outcome for each requested order.
+    Only admins can cancel orders in bulk.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to cancel orders in bulk")
+
+    order_ids = list(request.order_ids)
+    if request.product_id is not None:
+        order_ids += [
+            order_id for (order_id,) in db.query(models.OrderItem.order_id)
+            .join(models.Orders, models.Orders.id == models.OrderItem.order_id)
+            .filter(models.OrderItem.product_id == request.product_id, models.Orders.status.notin_(FINAL_STATUSES))
+        ]
+    if not order_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No orders to cancel")
+
+    results = cancel_orders(db, order_ids)
+    db.commit()
+
+    cancelled_ids = {result.order_id for result in results if result.cancelled}
+    if cancelled_ids:
+        for order_id, user_id in db.query(models.Orders.id, models.Orders.user_id).filter(models.Orders.id.in_(cancelled_ids)):
+            notify_order_status(user_id, order_id, "Cancelled")
+    return {"cancelled": sum(result.cancelled for result in results), "results": results}
@@ -1,9 +1,9 @@
 from time import sleep
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, or_, and_
+from sqlalchemy.orm import Session, defer
 from .. import models, schemas, database, oauth2
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 from ..utils import filter as filter_utils, products as product_utils   
 
 router = APIRouter(
@@ -70,6 +70,83 @@ def search_products(query: str, db: Session, limit: int = 20) -> List[models.Pro
         print(f"Search error: {e}")
         return []
 
+# weight of a term matching each field in search_products_multi
+NAME_WEIGHT = 3.0
+BRAND_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.5
+DESCRIPTION_WEIGHT = 1.0
+
+def _contains_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def search_products_multi(terms: Sequence[str], db: Session, limit: int = 10) -> List[Tuple[models.Product, float]]:
+    """
+    Search for products matching any of several terms in a single query.
+    Each term scores a product by where it matches (name > brand > category >
+    description); scores are summed over all terms, so products matching several
+    keywords rank first. Results are unique by product id, best first.
+    The image column is deferred.
+
+    Args:
+        terms: Search terms, e.g. generated keywords
+        db: Database session
+        limit: Maximum number of results
+
+    Returns:
+        List of (Product, score) tuples
+    """
+    patterns = list(dict.fromkeys(_contains_pattern(term.strip()) for term in terms if term and term.strip()))
+    if not patterns:
+        return []
+
+    # names of the matching categories of each product, only for categories that match some term
+    category_names = (
+        db.query(
+            models.ProductCategory.product_id.label("product_id"),
+            func.string_agg(models.Category.name, " | ").label("names"),
+        )
+        .join(models.Category, models.Category.id == models.ProductCategory.category_id)
+        .filter(or_(*[models.Category.name.ilike(pattern, escape="\\") for pattern in patterns]))
+        .group_by(models.ProductCategory.product_id)
+        .subquery()
+    )
+
+    score = sum(
+        case((models.Product.name.ilike(pattern, escape="\\"), NAME_WEIGHT), else_=0.0)
+        + case((models.Product.brand_name.ilike(pattern, escape="\\"), BRAND_WEIGHT), else_=0.0)
+        + case((category_names.c.names.ilike(pattern, escape="\\"), CATEGORY_WEIGHT), else_=0.0)
+        + case((models.Product.description.ilike(pattern, escape="\\"), DESCRIPTION_WEIGHT), else_=0.0)
+        for pattern in patterns
+    ).label("score")
+
+    matches_any = or_(
+        category_names.c.product_id.isnot(None),
+        *[
+            or_(
+                models.Product.name.ilike(pattern, escape="\\"),
+                models.Product.brand_name.ilike(pattern, escape="\\"),
+                models.Product.description.ilike(pattern, escape="\\"),
+            )
+            for pattern in patterns
+        ],
+    )
+
+    try:
+        rows = (
+            db.query(models.Product, score)
+            .outerjoin(category_names, category_names.c.product_id == models.Product.id)
+            .options(defer(models.Product.image))
+            .filter(models.Product.for_sale == True, matches_any)
+            .order_by(score.desc(), models.Product.num_sold.desc(), models.Product.id)
+            .limit(limit)
+            .all()
+        )
+        return [(product, float(product_score)) for product, product_score in rows]
+    except Exception as e:
+        print(f"Search error: {e}")
+        return []
+
 @router.get("/", response_model=List[schemas.ProductOut])
 def search_products_endpoint(
     q: str = Query(..., min_length=1, description="Search query"),
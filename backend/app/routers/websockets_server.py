@@ -1,10 +1,18 @@
 import asyncio
+import json
+import re
+import time
+from contextlib import suppress
 from fastapi import WebSocket, WebSocketDisconnect
 from sqlmodel import Session
-from typing import List
+from typing import AsyncIterator, Optional
 import uuid
 from jose import JWTError
 from .. import models, oauth2
+from ..config import settings
+from ..utils.chat_writer import chat_writer
+from ..utils.connections import ConnectionRegistry
+from ..utils.pubsub import PubSubBus
 from dotenv import load_dotenv
 import os
 
@@ -30,25 +38,194 @@ if gemini_api_key:
 else:
     print("❌ Cannot initialize GenAI client: No API key provided")
 
+LLM_MODEL = "gemini-1.5-flash"
+
+# Bounds concurrent model calls per worker so a burst of chats cannot exhaust
+# the upstream quota or the thread pool used by the sync fallback.
+llm_limiter = asyncio.Semaphore(settings.llm_max_concurrency)
+
+# messages a single socket may queue while its previous message is being answered
+MAX_PENDING_MESSAGES = 8
+
+async def generate_content(contents: str):
+    """
+    Call the model without blocking the event loop.
+    Uses the SDK's async client when available, otherwise offloads the sync
+    call to a worker thread.
+    """
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        return await aio.models.generate_content(model=LLM_MODEL, contents=contents)
+    return await asyncio.to_thread(client.models.generate_content, model=LLM_MODEL, contents=contents)
+
+async def stream_content(contents: str) -> AsyncIterator[str]:
+    """
+    Yield text deltas from the model as they are generated.
+    Falls back to one delta holding the whole reply when streaming is unavailable.
+    """
+    aio = getattr(client, "aio", None)
+    if aio is not None:
+        async for chunk in await aio.models.generate_content_stream(model=LLM_MODEL, contents=contents):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+        return
+    response = await generate_content(contents)
+    yield response.text if response and hasattr(response, 'text') else "No response from agent."
+
+async def iterate_with_deadline(iterator: AsyncIterator[str], timeout: float) -> AsyncIterator[str]:
+    """Re-yield an async iterator, raising asyncio.TimeoutError once `timeout` seconds have passed overall."""
+    deadline = time.monotonic() + timeout
+    iterator = iterator.__aiter__()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+        except StopAsyncIteration:
+            return
+        yield item
+
+# a chunk is flushed at the end of a sentence, or at a word boundary once it gets this long,
+# so text-to-speech on the client can start before the whole reply exists
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。])\s+|\n+")
+MAX_CHUNK_CHARS = 200
+
+def split_sentences(buffer: str):
+    """
+    Split buffered text into complete sentence chunks and the unfinished remainder.
+    Returns (chunks, remainder).
+    """
+    chunks = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        chunk = buffer[start:match.start()].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = match.end()
+    remainder = buffer[start:]
+    while len(remainder) > MAX_CHUNK_CHARS:
+        cut = remainder.rfind(" ", 0, MAX_CHUNK_CHARS)
+        cut = cut if cut > 0 else MAX_CHUNK_CHARS
+        chunks.append(remainder[:cut].strip())
+        remainder = remainder[cut:].lstrip()
+    return chunks, remainder
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, bus: Optional[PubSubBus] = None):
+        # with a bus, send_to_user and broadcast reach sockets held by other workers too
+        self.bus = bus
+        self.registry = ConnectionRegistry(
+            max_queue=settings.ws_send_queue_size,
+            send_timeout=settings.ws_send_timeout_seconds,
+            enqueue_timeout=settings.ws_enqueue_timeout_seconds,
+        )
         
     async def agent_response(self, user_message: str) -> str:
-        """Get response from the agent with fallback."""
+        """
+        Get response from the agent with fallback.
+        The call is awaited on the event loop, limited by llm_limiter and bounded by
+        settings.llm_timeout_seconds. Cancelling the awaiting task (e.g. when the
+        socket disconnects) aborts the call.
+        """
         if not client:
             return self.get_fallback_response(user_message)
         
         try:
-            response = client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=user_message
-            )
+            async with llm_limiter:
+                response = await asyncio.wait_for(
+                    generate_content(user_message),
+                    timeout=settings.llm_timeout_seconds
+                )
             return response.text if response and hasattr(response, 'text') else "No response from agent."
+        except asyncio.TimeoutError:
+            print(f"GenAI API timeout after {settings.llm_timeout_seconds}s")
+            return self.get_fallback_response(user_message)
         except Exception as e:
             print(f"GenAI API error: {e}")
             return self.get_fallback_response(user_message)
     
+    async def agent_response_stream(self, user_message: str) -> AsyncIterator[str]:
+        """
+        Stream the agent's reply as sentence-sized chunks.
+        Same limiter, timeout and fallback behaviour as agent_response; if the model
+        fails after some chunks were sent, the reply simply ends there.
+        """
+        if not client:
+            yield self.get_fallback_response(user_message)
+            return
+
+        emitted = False
+        try:
+            async with llm_limiter:
+                buffer = ""
+                async for delta in iterate_with_deadline(stream_content(user_message), settings.llm_timeout_seconds):
+                    buffer += delta
+                    chunks, buffer = split_sentences(buffer)
+                    for chunk in chunks:
+                        emitted = True
+                        yield chunk
+                if buffer.strip():
+                    emitted = True
+                    yield buffer.strip()
+        except asyncio.TimeoutError:
+            print(f"GenAI API timeout after {settings.llm_timeout_seconds}s")
+            if not emitted:
+                yield self.get_fallback_response(user_message)
+        except Exception as e:
+            print(f"GenAI API error: {e}")
+            if not emitted:
+                yield self.get_fallback_response(user_message)
+
+    async def stream_personal_message(
+        self, user_message: str, websocket: WebSocket, user_id: uuid.UUID, db: Session
+    ):
+        """
+        Answer a user message as a stream of JSON frames:
+            {"type": "delta", "message_id", "index", "delta"}   one per sentence chunk
+            {"type": "done", "message_id", "message", "ttft_ms", "total_ms"}
+        The client can start text-to-speech on the first delta. The complete reply
+        is persisted once the stream is done.
+        """
+        message_id = str(uuid.uuid4())
+        started = time.perf_counter()
+        ttft_ms = None
+        chunks = []
+        async for chunk in self.agent_response_stream(user_message):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 2)
+            await self._send(websocket, json.dumps({
+                "type": "delta",
+                "message_id": message_id,
+                "index": len(chunks),
+                "delta": chunk,
+            }))
+            chunks.append(chunk)
+
+        message = " ".join(chunks)
+        await self._send(websocket, self._done_frame(
+            message_id, message, ttft_ms, round((time.perf_counter() - started) * 1000, 2)
+        ))
+        await self._save_message(user_id, models.SenderType.AGENT, message)
+
+    @staticmethod
+    def _done_frame(message_id: str, message: str, ttft_ms: Optional[float] = None, total_ms: Optional[float] = None) -> str:
+        return json.dumps({
+            "type": "done",
+            "message_id": message_id,
+            "message": message,
+            "ttft_ms": ttft_ms,
+            "total_ms": total_ms,
+        })
+
+    async def _save_message(self, user_id: uuid.UUID, sender: models.SenderType, message: str):
+        """
+        Queue a chat message for the write-behind writer instead of committing on
+        the event loop; it is inserted with other sessions' messages in one batch.
+        """
+        await chat_writer.enqueue(int(user_id), sender, message)
+
     def get_fallback_response(self, user_message: str) -> str:
         """Simple fallback responses when API is not available"""
         message_lower = user_message.lower()
@@ -64,72 +241,106 @@ class ConnectionManager:
         else:
             return "I'm VoiceCart, your shopping assistant. I can help you search for products and manage your cart. What would you like to do?"
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, user_id: Optional[int] = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.registry.register(websocket, user_id)
+
+    def disconnect(self, websocket: WebSocket, user_id: Optional[int] = None):
+        # user_id is accepted for callers that pass it; the registry finds the socket directly
+        self.registry.unregister(websocket)
+
+    async def _send(self, websocket: WebSocket, message: str) -> bool:
+        """
+        Send through the socket's queue so a slow client cannot stall the caller.
+        Sockets that were never registered are written to directly.
+        """
+        connection = self.registry.get(websocket)
+        if connection is None:
+            await websocket.send_text(message)
+            return True
+        return await connection.send(message)
+
+    async def start(self):
+        """Subscribe to the pub/sub bus, if any. Called on application startup."""
+        if self.bus is not None:
+            await self.bus.start(self._deliver)
+
+    async def stop(self):
+        if self.bus is not None:
+            await self.bus.stop()
 
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+    async def _deliver(self, envelope: dict):
+        """Bus handler: hand a published message to the sockets of this worker."""
+        if envelope["kind"] == "user":
+            await self.registry.send_to_user(envelope["user_id"], envelope["message"])
+        else:
+            await self.registry.broadcast(envelope["message"])
+
+    async def send_to_user(self, user_id: int, message: str):
+        """Send to every open socket of a user, on whichever worker it is connected."""
+        if self.bus is None:
+            await self.registry.send_to_user(user_id, message)
+        else:
+            await self.bus.publish_to_user(user_id, message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                print(f"Broadcast error: {e}")
+        """
+        Send to every open socket of every worker. Sockets are written to
+        concurrently and slow clients are evicted instead of delaying the rest.
+        """
+        if self.bus is None:
+            await self.registry.broadcast(message)
+        else:
+            await self.bus.publish_broadcast(message)
 
     async def send_personal_message(
         self, message: str, websocket: WebSocket, user_id: uuid.UUID, db: Session
     ):
-        try:
-            # Create chat message (fix the enum usage)
-            chat_message = models.ChatMessage(
-                user_id=int(user_id),  # Convert UUID to int if needed
-                message=message,
-                sender="agent",  # Use string instead of enum
-            )
-            
-            # Use sync database operations (remove asyncio.to_thread)
-            db.add(chat_message)
-            db.commit()
-            db.refresh(chat_message)
+        """Send a complete agent message as a single "done" frame, the same shape that ends a stream."""
+        await self._save_message(user_id, models.SenderType.AGENT, message)
+        await self._send(websocket, self._done_frame(str(uuid.uuid4()), message))
 
-            # Send via WebSocket
-            await websocket.send_text(f"Agent: {message}")
-            
-        except Exception as e:
-            print(f"Error saving/sending message: {e}")
-            # Still send the message even if DB fails
-            await websocket.send_text(f"Agent: {message}")
+    async def _answer_messages(
+        self, pending: asyncio.Queue, user_id: uuid.UUID, websocket: WebSocket, db: Session
+    ):
+        """
+        Answer queued user messages one at a time, in the order they arrived.
+        A message that fails gets the fallback reply; the loop keeps serving the rest.
+        """
+        while True:
+            data = await pending.get()
+            try:
+                await self.stream_personal_message(data, websocket, user_id, db)
+            except Exception as e:
+                print(f"Error answering message from user {user_id}: {e}")
+                with suppress(Exception):
+                    await self.send_personal_message(self.get_fallback_response(data), websocket, user_id, db)
 
     async def websocket_agent_chat(
         self, user_id: uuid.UUID, websocket: WebSocket, db: Session
     ):
+        # Answers are produced by a separate task so the receive loop keeps
+        # listening while the model runs and notices a disconnect immediately.
+        pending: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_MESSAGES)
+        responder = None
         try:
             # Send welcome message
             welcome_msg = "Hello! I'm VoiceCart, your shopping assistant. How can I help you today?"
             await self.send_personal_message(welcome_msg, websocket, user_id, db)
+
+            responder = asyncio.create_task(self._answer_messages(pending, user_id, websocket, db))
             
             while True:
                 data = await websocket.receive_text()
                 
                 # Save user message
-                try:
-                    chat_message = models.ChatMessage(
-                        user_id=int(user_id),  # Convert UUID to int if needed
-                        message=data,
-                        sender="user",  # Use string instead of enum
-                    )
-                    db.add(chat_message)
-                    db.commit()
-                    db.refresh(chat_message)
-                except Exception as db_error:
-                    print(f"Database error: {db_error}")
+                await self._save_message(user_id, models.SenderType.USER, data)
                 
-                # Get agent response
-                agent_response = await self.agent_response(data)
-                await self.send_personal_message(agent_response, websocket, user_id, db)
+                # Hand over to the responder; blocks if the user floods the socket.
+                # A responder that died would never drain the queue, so stop instead.
+                if responder.done():
+                    raise RuntimeError("the message responder stopped")
+                await pending.put(data)
                 
         except WebSocketDisconnect:
             print(f"User {user_id} disconnected")
@@ -137,3 +348,9 @@ class ConnectionManager:
         except Exception as e:
             print(f"WebSocket error: {e}")
             self.disconnect(websocket)
+        finally:
+            # Abort any in-flight model call for this socket
+            if responder is not None:
+                responder.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await responder
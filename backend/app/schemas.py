@@ -1,6 +1,7 @@
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
+from .models import SenderType
 
 # --- Token Schemas ---
 class Token(BaseModel):
@@ -167,6 +168,40 @@ class OrderOut(BaseModel):
     class Config:
         orm_mode = True
 
+# slim variants used by the paginated order history
+class ProductSummary(BaseModel):
+    id: int
+    name: str
+    price: float
+    brand_name: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class OrderItemSummaryOut(BaseModel):
+    product_id: int
+    quantity: int
+    price: float
+    product: Optional[ProductSummary] = None
+
+    class Config:
+        orm_mode = True
+
+class OrderSummaryOut(BaseModel):
+    id: int
+    address: Optional[str] = None
+    total_amount: float
+    status: str
+    created_at: datetime
+    items: List[OrderItemSummaryOut] = []
+
+    class Config:
+        orm_mode = True
+
+class OrderPage(BaseModel):
+    orders: List[OrderSummaryOut] = []
+    next_cursor: Optional[str] = None
+
 # --- Review Schemas ---
 class ReviewCreate(BaseModel):
     product_id: int
@@ -197,10 +232,75 @@ class OrderUpdate(BaseModel):
     status: Optional[str]  # e.g., "Pending", "Shipped", "Delivered", "Cancelled"
     address: Optional[str] = None  # Optional, can be updated later
 
+class BulkCancelRequest(BaseModel):
+    order_ids: List[int] = []
+    product_id: Optional[int] = None  # cancel every open order containing this product
+
+class OrderCancelResult(BaseModel):
+    order_id: int
+    cancelled: bool
+    detail: str
+
+class BulkCancelOut(BaseModel):
+    cancelled: int
+    results: List[OrderCancelResult] = []
+
+# --- Analytics Schemas ---
+class TopSellerOut(BaseModel):
+    product_id: int
+    name: str
+    units_sold: int
+    revenue: float
+
+class DailyRevenueOut(BaseModel):
+    day: date
+    orders: int
+    revenue: float
+    orders_cancelled: int
+    revenue_cancelled: float
+    net_revenue: float
+
+class CategoryRevenueOut(BaseModel):
+    category_id: int
+    name: str
+    units_sold: int
+    revenue: float
+
+class CancellationRateOut(BaseModel):
+    start: date
+    end: date
+    orders: int
+    orders_cancelled: int
+    cancellation_rate: float
+    daily: List[DailyRevenueOut] = []
+
+class RollupRebuildOut(BaseModel):
+    start: date
+    end: date
+    rows_written: Dict[str, int]
+
 # --- Chat Schemas ---
 class ChatInput(BaseModel):
     input_text: str
 
+class ChatMessageOut(BaseModel):
+    id: int
+    sender: SenderType
+    message: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessageOut] = []
+    next_cursor: Optional[str] = None
+
+class ChatContextOut(BaseModel):
+    messages: List[ChatMessageOut] = []  # oldest first
+    summary: Optional[str] = None  # what the user asked before the window
+    has_earlier: bool = False
+
 
 # For forward references (self-referencing models)
 User.update_forward_refs()
@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import case, distinct, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .. import models
+
+CANCELLED = "Cancelled"
+
+
+def _increment(db: Session, model, key_columns: Sequence[str], rows: List[Dict[str, Any]]):
+    """
+    Upsert rollup rows, adding the given values to any existing row with the same key.
+    All rows must carry the same columns.
+    """
+    if not rows:
+        return
+    stmt = pg_insert(model).values(rows)
+    value_columns = [column for column in rows[0] if column not in key_columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in value_columns},
+    )
+    db.execute(stmt)
+
+
+def record_orders(db: Session, orders: Iterable[Tuple[models.Orders, Iterable[models.OrderItem]]], cancelled: bool = False):
+    """
+    Fold a batch of orders into the daily rollups.
+    Called inside the checkout (cancelled=False) and cancellation (cancelled=True)
+    transactions, so the rollups commit or roll back together with the order.
+    Orders are bucketed by the day they were placed; a cancellation is booked
+    against the original order day so per-day cancellation rates stay meaningful.
+    The caller is responsible for committing.
+    """
+    product_totals: Dict[Tuple[int, date], Dict[str, Any]] = defaultdict(lambda: {"orders": 0, "units": 0, "revenue": Decimal(0)})
+    day_totals: Dict[date, Dict[str, Any]] = defaultdict(lambda: {"orders": 0, "revenue": Decimal(0)})
+
+    for order, items in orders:
+        day = order.created_at.date() if order.created_at else date.today()
+        day_totals[day]["orders"] += 1
+        day_totals[day]["revenue"] += Decimal(str(order.total_amount or 0))
+        seen = set()
+        for item in items:
+            entry = product_totals[(item.product_id, day)]
+            entry["units"] += item.quantity
+            entry["revenue"] += Decimal(str(item.price)) * item.quantity
+            if item.product_id not in seen:
+                entry["orders"] += 1
+                seen.add(item.product_id)
+
+    if not day_totals:
+        return
+
+    # one lookup for the categories of every product in the batch
+    product_ids = {product_id for product_id, _ in product_totals}
+    categories_by_product: Dict[int, List[int]] = defaultdict(list)
+    if product_ids:
+        for product_id, category_id in db.query(models.ProductCategory.product_id, models.ProductCategory.category_id).filter(
+            models.ProductCategory.product_id.in_(product_ids)
+        ):
+            categories_by_product[product_id].append(category_id)
+
+    category_totals: Dict[Tuple[int, date], Dict[str, Any]] = defaultdict(lambda: {"units": 0, "revenue": Decimal(0)})
+    for (product_id, day), entry in product_totals.items():
+        for category_id in categories_by_product.get(product_id, []):
+            category_totals[(category_id, day)]["units"] += entry["units"]
+            category_totals[(category_id, day)]["revenue"] += entry["revenue"]
+
+    if cancelled:
+        product_rows = [
+            {"product_id": product_id, "day": day, "units_cancelled": e["units"], "revenue_cancelled": e["revenue"]}
+            for (product_id, day), e in product_totals.items()
+        ]
+        category_rows = [
+            {"category_id": category_id, "day": day, "units_cancelled": e["units"], "revenue_cancelled": e["revenue"]}
+            for (category_id, day), e in category_totals.items()
+        ]
+        day_rows = [
+            {"day": day, "orders_cancelled": e["orders"], "revenue_cancelled": e["revenue"]}
+            for day, e in day_totals.items()
+        ]
+    else:
+        product_rows = [
+            {"product_id": product_id, "day": day, "orders": e["orders"], "units_sold": e["units"], "revenue": e["revenue"]}
+            for (product_id, day), e in product_totals.items()
+        ]
+        category_rows = [
+            {"category_id": category_id, "day": day, "units_sold": e["units"], "revenue": e["revenue"]}
+            for (category_id, day), e in category_totals.items()
+        ]
+        day_rows = [
+            {"day": day, "orders": e["orders"], "revenue": e["revenue"]}
+            for day, e in day_totals.items()
+        ]
+
+    _increment(db, models.ProductSalesDaily, ["product_id", "day"], product_rows)
+    _increment(db, models.CategorySalesDaily, ["category_id", "day"], category_rows)
+    _increment(db, models.SalesDaily, ["day"], day_rows)
+
+
+def record_order(db: Session, order: models.Orders, items: Iterable[models.OrderItem], cancelled: bool = False):
+    """
+    Fold a single order into the daily rollups. See record_orders.
+    """
+    record_orders(db, [(order, items)], cancelled=cancelled)
+
+
+def rebuild_rollups(db: Session, start: date, end: date) -> Dict[str, int]:
+    """
+    Batch job: recompute every rollup row for days in [start, end] from the raw
+    orders and order_items tables with three INSERT ... SELECT statements.
+    Use it to backfill history or repair drift. The caller is responsible for committing.
+    Returns the number of rows written per rollup table.
+    """
+    day = func.date(models.Orders.created_at)
+    in_range = day.between(start, end)
+    is_cancelled = models.Orders.status == CANCELLED
+    line_revenue = models.OrderItem.price * models.OrderItem.quantity
+
+    for model in (models.ProductSalesDaily, models.CategorySalesDaily, models.SalesDaily):
+        db.query(model).filter(model.day.between(start, end)).delete(synchronize_session=False)
+
+    product_select = (
+        select(
+            models.OrderItem.product_id,
+            day,
+            func.count(distinct(models.Orders.id)),
+            func.sum(models.OrderItem.quantity),
+            func.sum(line_revenue),
+            func.sum(case((is_cancelled, models.OrderItem.quantity), else_=0)),
+            func.sum(case((is_cancelled, line_revenue), else_=0)),
+        )
+        .join(models.Orders, models.Orders.id == models.OrderItem.order_id)
+        .where(in_range)
+        .group_by(models.OrderItem.product_id, day)
+    )
+    category_select = (
+        select(
+            models.ProductCategory.category_id,
+            day,
+            func.sum(models.OrderItem.quantity),
+            func.sum(line_revenue),
+            func.sum(case((is_cancelled, models.OrderItem.quantity), else_=0)),
+            func.sum(case((is_cancelled, line_revenue), else_=0)),
+        )
+        .join(models.Orders, models.Orders.id == models.OrderItem.order_id)
+        .join(models.ProductCategory, models.ProductCategory.product_id == models.OrderItem.product_id)
+        .where(in_range)
+        .group_by(models.ProductCategory.category_id, day)
+    )
+    day_select = (
+        select(
+            day,
+            func.count(models.Orders.id),
+            func.sum(models.Orders.total_amount),
+            func.sum(case((is_cancelled, 1), else_=0)),
+            func.sum(case((is_cancelled, models.Orders.total_amount), else_=0)),
+        )
+        .where(in_range)
+        .group_by(day)
+    )
+
+    written = {}
+    written["product_sales_daily"] = db.execute(insert(models.ProductSalesDaily).from_select(
+        ["product_id", "day", "orders", "units_sold", "revenue", "units_cancelled", "revenue_cancelled"], product_select
+    )).rowcount
+    written["category_sales_daily"] = db.execute(insert(models.CategorySalesDaily).from_select(
+        ["category_id", "day", "units_sold", "revenue", "units_cancelled", "revenue_cancelled"], category_select
+    )).rowcount
+    written["sales_daily"] = db.execute(insert(models.SalesDaily).from_select(
+        ["day", "orders", "revenue", "orders_cancelled", "revenue_cancelled"], day_select
+    )).rowcount
+    return written
+
+
+if __name__ == "__main__":
+    # batch job: python -m backend.app.utils.analytics --days 30
+    import argparse
+    from datetime import timedelta
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups from order history")
+    parser.add_argument("--days", type=int, default=30, help="number of days back from today to rebuild")
+    args = parser.parse_args()
+
+    end = date.today()
+    start = end - timedelta(days=args.days - 1)
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db, start, end)
+        db.commit()
+        print(f"Rebuilt rollups for {start} .. {end}: {written}")
+    finally:
+        db.close()
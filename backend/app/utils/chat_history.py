@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.orm import Session
+from .. import models
+from . import pagination
+
+# user messages before the context window that go into the summary
+SUMMARY_MESSAGES = 10
+SUMMARY_MESSAGE_CHARS = 80
+
+
+def history_page(
+    db: Session, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[models.ChatMessage], Optional[str]]:
+    """
+    Fetch one page of a user's chat messages, newest first.
+    Keyset pagination on (created_at, id) served by ix_chat_messages_user_id_created_at,
+    so deep pages cost the same as the first one.
+    Returns (messages, next_cursor); next_cursor is None on the last page.
+    """
+    query = db.query(models.ChatMessage).filter(models.ChatMessage.user_id == user_id)
+    if cursor:
+        cursor_created_at, cursor_id = pagination.decode_cursor(cursor)
+        query = query.filter(
+            tuple_(models.ChatMessage.created_at, models.ChatMessage.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    messages = (
+        query.order_by(models.ChatMessage.created_at.desc(), models.ChatMessage.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        last = messages[-1]
+        next_cursor = pagination.encode_cursor(last.created_at, last.id)
+    return messages, next_cursor
+
+
+def load_context_window(
+    db: Session, user_id: int, turns: int = 5, summary_messages: int = SUMMARY_MESSAGES
+) -> Dict[str, Any]:
+    """
+    Load what an agent needs to pick a conversation back up, in one query:
+    the last `turns` exchanges (two messages per turn), oldest first, and a short
+    summary of the user messages just before them.
+    Only the newest window + 2 * summary_messages rows are read through the index;
+    agent replies outside the window are filtered out in SQL, so long histories
+    are never replayed.
+    Returns {"messages", "summary", "has_earlier"}.
+    """
+    window = turns * 2
+    chat = models.ChatMessage
+    recent = (
+        db.query(
+            chat.id,
+            chat.sender,
+            chat.message,
+            chat.created_at,
+            func.row_number().over(order_by=(chat.created_at.desc(), chat.id.desc())).label("position"),
+        )
+        .filter(chat.user_id == user_id)
+        .order_by(chat.created_at.desc(), chat.id.desc())
+        .limit(window + 2 * summary_messages)
+        .subquery()
+    )
+    rows = (
+        db.query(recent)
+        .filter(or_(recent.c.position <= window, recent.c.sender == models.SenderType.USER))
+        .order_by(recent.c.position.desc())
+        .all()
+    )
+
+    messages = [row for row in rows if row.position <= window]
+    earlier = [row for row in rows if row.position > window]
+    summary = None
+    if earlier:
+        asked = "; ".join(_shorten(row.message) for row in earlier[-summary_messages:])
+        summary = f"Earlier in this conversation the user asked: {asked}"
+    return {"messages": messages, "summary": summary, "has_earlier": bool(earlier)}
+
+
+def _shorten(message: str) -> str:
+    message = " ".join(message.split())
+    if len(message) <= SUMMARY_MESSAGE_CHARS:
+        return message
+    return message[:SUMMARY_MESSAGE_CHARS].rsplit(" ", 1)[0] + "..."
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from .. import database, models
+from ..config import settings
+from . import metrics as metrics_utils
+
+_STOP = object()
+
+
+class ChatMessageWriter:
+    """
+    Write-behind queue for chat messages.
+    Producers enqueue messages from any session; a single background task writes
+    them with one multi-row INSERT per batch, flushing when a batch is full or
+    when the oldest message has waited flush_interval seconds. The queue is bounded:
+    when it is full, enqueue waits (backpressure) instead of growing memory.
+    created_at is stamped at enqueue time so history order is preserved.
+    A batch whose INSERT fails (e.g. the database restarting) is retried with
+    exponential backoff before its messages are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.chat_write_batch_size,
+        flush_interval: float = settings.chat_write_flush_ms / 1000,
+        max_pending: int = settings.chat_write_queue_size,
+        retries: int = settings.chat_write_retries,
+        retry_backoff: float = settings.chat_write_retry_backoff_ms / 1000,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.messages_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.messages_dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, user_id: int, sender: models.SenderType, message: str):
+        record = {
+            "user_id": int(user_id),
+            "sender": sender,
+            "message": message,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if not self.running:
+            # not started (scripts, benchmarks): write straight through
+            await self._flush([record])
+            return
+        await self._queue.put(record)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        delay = self.retry_backoff
+        for attempt in range(self.retries + 1):
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.write_errors += 1
+                if attempt < self.retries:
+                    print(f"Error writing {len(batch)} chat messages, retrying in {delay:.2f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                    continue
+                self.messages_dropped += len(batch)
+                print(f"Dropped {len(batch)} chat messages after {attempt + 1} attempts "
+                      f"({self.messages_dropped} dropped in total): {e}")
+                return
+            self.messages_written += len(batch)
+            self.batches_written += 1
+            return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        db = database.SessionLocal()
+        try:
+            db.execute(insert(models.ChatMessage), batch)
+            db.commit()
+        finally:
+            db.close()
+
+    def metrics_lines(self) -> List[str]:
+        pending = self._queue.qsize() if self._queue is not None else 0
+        return [
+            "# TYPE chat_writer_messages_written_total counter",
+            f"chat_writer_messages_written_total {self.messages_written}",
+            "# TYPE chat_writer_batches_written_total counter",
+            f"chat_writer_batches_written_total {self.batches_written}",
+            "# TYPE chat_writer_write_errors_total counter",
+            f"chat_writer_write_errors_total {self.write_errors}",
+            "# TYPE chat_writer_messages_dropped_total counter",
+            f"chat_writer_messages_dropped_total {self.messages_dropped}",
+            "# TYPE chat_writer_pending gauge",
+            f"chat_writer_pending {pending}",
+        ]
+
+
+chat_writer = ChatMessageWriter()
+metrics_utils.registry.register_collector("chat_writer", chat_writer.metrics_lines)
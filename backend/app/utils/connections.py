@@ -0,0 +1,161 @@
+import asyncio
+from contextlib import suppress
+from typing import Callable, Dict, List, Optional
+
+from fastapi import WebSocket
+
+# close code sent to evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class ClientConnection:
+    """
+    One accepted WebSocket with its own bounded send queue.
+    A dedicated sender task drains the queue, so a slow client only delays its own
+    messages. If the queue stays full for enqueue_timeout seconds, or a single send
+    takes longer than send_timeout seconds, the client is evicted.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: Optional[int],
+        on_evict: Callable[["ClientConnection"], None],
+        max_queue: int,
+        send_timeout: float,
+        enqueue_timeout: float,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.send_timeout = send_timeout
+        self.enqueue_timeout = enqueue_timeout
+        self.closed = False
+        self._on_evict = on_evict
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def send(self, message: str) -> bool:
+        """
+        Queue a message for this client.
+        Returns False if the client is closed or was evicted for being too slow.
+        """
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(message), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.evict("send queue full")
+            return False
+
+    async def _send_loop(self):
+        # checking closed as well as relying on cancel(): wait_for can swallow a
+        # cancellation that races with send_text completing
+        while not self.closed:
+            message = await self._queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message), timeout=self.send_timeout)
+            except asyncio.TimeoutError:
+                self.evict("send timed out")
+                return
+            except Exception as e:
+                self.evict(f"send failed: {e}")
+                return
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        print(f"Evicting WebSocket of user {self.user_id}: {reason}")
+        self.close()
+        self._on_evict(self)
+        asyncio.get_running_loop().create_task(self._close_socket())
+
+    async def _close_socket(self):
+        with suppress(Exception):
+            await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+
+    def close(self):
+        """Stop the sender task. Messages still queued are dropped."""
+        if self.closed:
+            return
+        self.closed = True
+        if asyncio.current_task() is not self._sender:
+            self._sender.cancel()
+
+
+class ConnectionRegistry:
+    """
+    Live WebSockets indexed by user id, with several sockets allowed per user
+    (phone and browser, several tabs). Registration and removal are O(1) dict
+    operations; fan-out sends to all targets concurrently.
+    """
+
+    def __init__(self, max_queue: int = 100, send_timeout: float = 5.0, enqueue_timeout: float = 1.0):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.enqueue_timeout = enqueue_timeout
+        self._by_user: Dict[Optional[int], Dict[WebSocket, ClientConnection]] = {}
+        self._by_socket: Dict[WebSocket, ClientConnection] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._by_socket)
+
+    def register(self, websocket: WebSocket, user_id: Optional[int] = None) -> ClientConnection:
+        self.unregister(websocket)
+        connection = ClientConnection(
+            websocket,
+            user_id,
+            on_evict=self._evicted,
+            max_queue=self.max_queue,
+            send_timeout=self.send_timeout,
+            enqueue_timeout=self.enqueue_timeout,
+        )
+        self._by_socket[websocket] = connection
+        self._by_user.setdefault(user_id, {})[websocket] = connection
+        return connection
+
+    def unregister(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        connection = self._by_socket.pop(websocket, None)
+        if connection is None:
+            return None
+        user_sockets = self._by_user.get(connection.user_id)
+        if user_sockets is not None:
+            user_sockets.pop(websocket, None)
+            if not user_sockets:
+                del self._by_user[connection.user_id]
+        connection.close()
+        return connection
+
+    def _evicted(self, connection: ClientConnection):
+        self.evictions += 1
+        if self._by_socket.get(connection.websocket) is connection:
+            self.unregister(connection.websocket)
+
+    def get(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        return self._by_socket.get(websocket)
+
+    def connections_for(self, user_id: int) -> List[ClientConnection]:
+        return list(self._by_user.get(user_id, {}).values())
+
+    def user_ids(self) -> List[Optional[int]]:
+        return list(self._by_user)
+
+    async def _fan_out(self, connections: List[ClientConnection], message: str) -> int:
+        if not connections:
+            return 0
+        results = await asyncio.gather(*(connection.send(message) for connection in connections))
+        return sum(results)
+
+    async def send_to_user(self, user_id: int, message: str) -> int:
+        """Send to every socket of a user. Returns how many sockets accepted the message."""
+        return await self._fan_out(self.connections_for(user_id), message)
+
+    async def broadcast(self, message: str) -> int:
+        """Send to every connected socket. Returns how many sockets accepted the message."""
+        return await self._fan_out(list(self._by_socket.values()), message)
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy.orm import Session
+from .. import models
+
+# number of rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 1000
+
+PRODUCT_EXPORT_COLUMNS = [
+    "id", "name", "description", "specs", "price", "for_sale", "stock",
+    "brand_name", "created_at", "avg_rating", "num_reviews", "num_sold",
+]
+
+ORDER_EXPORT_COLUMNS = [
+    "order_id", "user_id", "status", "total_amount", "address", "created_at",
+    "product_id", "quantity", "price",
+]
+
+
+def _json_default(value: Any):
+    """
+    json.dumps fallback for the column types the models use (DECIMAL, TIMESTAMP).
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_products(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every product as a dict using a server-side cursor.
+    Only scalar columns are selected, so the image blobs are never loaded.
+    """
+    columns = [getattr(models.Product, name) for name in PRODUCT_EXPORT_COLUMNS]
+    query = (
+        db.query(*columns)
+        .order_by(models.Product.id)
+        .yield_per(batch_size)
+    )
+    for row in query:
+        yield dict(zip(PRODUCT_EXPORT_COLUMNS, row))
+
+
+def iter_order_rows(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream one flat row per order item (orders without items yield a single row
+    with empty item fields), ordered by order id so rows of one order are adjacent.
+    """
+    query = (
+        db.query(
+            models.Orders.id,
+            models.Orders.user_id,
+            models.Orders.status,
+            models.Orders.total_amount,
+            models.Orders.address,
+            models.Orders.created_at,
+            models.OrderItem.product_id,
+            models.OrderItem.quantity,
+            models.OrderItem.price,
+        )
+        .outerjoin(models.OrderItem, models.OrderItem.order_id == models.Orders.id)
+        .order_by(models.Orders.id, models.OrderItem.product_id)
+        .yield_per(batch_size)
+    )
+    for row in query:
+        yield dict(zip(ORDER_EXPORT_COLUMNS, row))
+
+
+def iter_orders(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream orders as nested dicts with their items, built from the flat rows
+    without holding more than one order in memory.
+    """
+    for order_id, rows in groupby(iter_order_rows(db, batch_size), key=lambda r: r["order_id"]):
+        rows = list(rows)
+        first = rows[0]
+        yield {
+            "id": order_id,
+            "user_id": first["user_id"],
+            "status": first["status"],
+            "total_amount": first["total_amount"],
+            "address": first["address"],
+            "created_at": first["created_at"],
+            "items": [
+                {"product_id": r["product_id"], "quantity": r["quantity"], "price": r["price"]}
+                for r in rows if r["product_id"] is not None
+            ],
+        }
+
+
+def ndjson_chunks(records: Iterable[Dict[str, Any]], rows_per_chunk: int = 500) -> Iterator[str]:
+    """
+    Serialise records as newline-delimited JSON, grouping several lines per chunk
+    so the response is not flushed once per row.
+    """
+    buffer: List[str] = []
+    for record in records:
+        buffer.append(json.dumps(record, default=_json_default))
+        if len(buffer) >= rows_per_chunk:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def csv_chunks(records: Iterable[Dict[str, Any]], columns: Sequence[str], rows_per_chunk: int = 500) -> Iterator[str]:
+    """
+    Serialise records as CSV (header first), emitting a chunk every rows_per_chunk rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for record in records:
+        writer.writerow([_csv_value(record.get(column)) for column in columns])
+        count += 1
+        if count >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            count = 0
+    remaining = buffer.getvalue()
+    if remaining:
+        yield remaining
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from ..config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# statements kept per request for slow-request samples
+MAX_STATEMENTS_PER_REQUEST = 50
+MAX_STATEMENT_LENGTH = 500
+
+
+class RequestStats:
+    """
+    Per-request accumulator for database activity.
+    It is bound to a context variable by the middleware; FastAPI copies the
+    context into the threadpool that runs sync endpoints and dependencies, so
+    queries issued there are attributed to the right request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: List[Tuple[float, str]] = []
+
+    def record_query(self, statement: str, duration: float):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.statements) < MAX_STATEMENTS_PER_REQUEST:
+            self.statements.append((duration, statement[:MAX_STATEMENT_LENGTH]))
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        sep = "," if labels else ""
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    In-process metrics store rendered in the Prometheus text exposition format.
+    Metrics are per worker process; scrape every worker or aggregate upstream.
+    """
+
+    def __init__(self, slow_request_ms: int, slow_request_samples: int):
+        self.slow_request_seconds = slow_request_ms / 1000
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.response_size: Dict[Tuple[str, str], Histogram] = {}
+        self.slow_requests = deque(maxlen=slow_request_samples)
+        self._collectors: Dict[str, Callable[[], List[str]]] = {}
+
+    def observe_request(self, method: str, route: str, status_code: int, duration: float, stats: RequestStats, response_bytes: int):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status_code)] += 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.db_queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            self.db_time[key] += stats.db_time
+            self.response_size.setdefault(key, Histogram(RESPONSE_SIZE_BUCKETS)).observe(response_bytes)
+            if duration >= self.slow_request_seconds:
+                self.slow_requests.append({
+                    "timestamp": datetime.now().isoformat(),
+                    "method": method,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_queries": stats.queries,
+                    "db_time_ms": round(stats.db_time * 1000, 2),
+                    "response_bytes": response_bytes,
+                    "statements": [
+                        {"duration_ms": round(d * 1000, 2), "sql": sql}
+                        for d, sql in sorted(stats.statements, reverse=True)
+                    ],
+                })
+
+    def register_collector(self, name: str, collector: Callable[[], List[str]]):
+        """
+        Add extra exposition lines (e.g. cache hit counters) to /metrics.
+        Registering the same name again replaces the previous collector.
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def slow_request_samples(self) -> List[dict]:
+        with self._lock:
+            return list(self.slow_requests)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Total HTTP requests by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, code), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{code}"}} {count}')
+
+            sections = [
+                ("http_request_duration_seconds", "Request latency in seconds.", self.latency),
+                ("http_request_db_queries", "SQL statements executed per request.", self.db_queries),
+                ("http_response_size_bytes", "Response body size in bytes.", self.response_size),
+            ]
+            for name, help_text, histograms in sections:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    lines.extend(histogram.render(name, f'method="{method}",route="{_escape(route)}"'))
+
+            lines.append("# HELP http_request_db_seconds_total Time spent in SQL per route.")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for (method, route), total in sorted(self.db_time.items()):
+                lines.append(f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {total}')
+
+            collectors = list(self._collectors.values())
+
+        for collector in collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(settings.slow_request_ms, settings.slow_request_samples)
+
+
+def install_sql_hooks(engine: Engine):
+    """
+    Attribute every SQL statement run on the engine to the current request.
+    Statements issued outside a request (startup, scripts) are ignored. A statement
+    that fails never reaches after_cursor_execute, so handle_error pops its start
+    time instead; otherwise the stack would pair later statements with stale times.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        stats = _current_request.get()
+        if stats is not None:
+            stats.record_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is None or exception_context.cursor is None:
+            return  # failed before a statement was sent (e.g. connecting)
+        started_times = conn.info.get("query_start_time")
+        if not started_times:
+            return
+        started = started_times.pop()
+        stats = _current_request.get()
+        if stats is not None and exception_context.statement is not None:
+            stats.record_query(exception_context.statement, time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, SQL query count and time, and response
+    size per route. Routes are labelled by their path template (/product/{id}) so
+    label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            _current_request.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.registry.observe_request(scope["method"], route, status_code, duration, stats, response_bytes)
@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Encode a (created_at, id) keyset position as an opaque url-safe token.
+    """
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a token produced by encode_cursor.
+    Raises HTTPException if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
@@ -1,3 +1,5 @@
+from typing import Dict
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from .. import models, schemas
 
@@ -15,4 +17,33 @@ def add_category(product: models.Product, db: Session) -> schemas.ProductOut:
         "categories": categories
     }
 
-    return schemas.ProductOut.model_validate(product_data, from_attributes=True)
\ No newline at end of file
+    return schemas.ProductOut.model_validate(product_data, from_attributes=True)
+
+# keeps each UPDATE well below the driver's bind parameter limits
+RESTORE_STOCK_CHUNK_SIZE = 1000
+
+def restore_stock(db: Session, quantities: Dict[int, int]) -> None:
+    """
+    Put cancelled quantities back into stock and take them off num_sold.
+    All products are updated with one aggregated UPDATE ... FROM (VALUES ...)
+    statement per chunk instead of one query per order item.
+    quantities maps product_id to the quantity to restore. The caller commits.
+    """
+    items = [(product_id, quantity) for product_id, quantity in quantities.items() if quantity]
+    for start in range(0, len(items), RESTORE_STOCK_CHUNK_SIZE):
+        chunk = items[start:start + RESTORE_STOCK_CHUNK_SIZE]
+        params = {}
+        values = []
+        for i, (product_id, quantity) in enumerate(chunk):
+            values.append(f"(:p{i}, :q{i})")
+            params[f"p{i}"] = product_id
+            params[f"q{i}"] = quantity
+        db.execute(
+            text(
+                "UPDATE products "
+                "SET stock = products.stock + v.qty, num_sold = products.num_sold - v.qty "
+                f"FROM (VALUES {', '.join(values)}) AS v(product_id, qty) "
+                "WHERE products.id = v.product_id"
+            ),
+            params,
+        )
@@ -0,0 +1,223 @@
+import abc
+import argparse
+import asyncio
+import json
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from ..config import settings
+
+Envelope = Dict[str, Any]
+Handler = Callable[[Envelope], Awaitable[None]]
+
+# a broker subscriber whose unsent backlog grows past this is dropped
+BROKER_MAX_BUFFER = 4 * 1024 * 1024
+
+
+def user_envelope(user_id: int, message: str) -> Envelope:
+    return {"kind": "user", "user_id": int(user_id), "message": message}
+
+
+def broadcast_envelope(message: str) -> Envelope:
+    return {"kind": "broadcast", "message": message}
+
+
+class PubSubBus(abc.ABC):
+    """
+    Carries user-targeted and broadcast messages to the ConnectionManager of every
+    worker. Each worker subscribes one handler with start(); publish() makes the
+    message reach the handler of every subscribed worker, including its own.
+    """
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._handler = None
+
+    @abc.abstractmethod
+    async def publish(self, envelope: Envelope):
+        """Deliver the envelope to the handler of every subscribed worker."""
+
+    async def publish_to_user(self, user_id: int, message: str):
+        await self.publish(user_envelope(user_id, message))
+
+    async def publish_broadcast(self, message: str):
+        await self.publish(broadcast_envelope(message))
+
+    def publish_threadsafe(self, envelope: Envelope):
+        """
+        Publish from sync code running in the threadpool (regular `def` routes).
+        Does not wait for delivery; a no-op if the bus was never started.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(envelope), self._loop)
+
+    async def _dispatch(self, envelope: Envelope):
+        if self._handler is None:
+            return
+        try:
+            await self._handler(envelope)
+        except Exception as e:
+            print(f"Pub/sub handler error: {e}")
+
+
+class InProcessBus(PubSubBus):
+    """Delivers straight to the local handler. Correct for a single worker only."""
+
+    async def publish(self, envelope: Envelope):
+        await self._dispatch(envelope)
+
+
+class BrokerBus(PubSubBus):
+    """
+    Publishes through a PubSubBroker over TCP (newline-delimited JSON) so messages
+    reach every worker connected to the same broker. Reconnects in the background
+    if the broker goes away; while disconnected, messages are delivered locally
+    only, so clients on this worker still get them.
+    """
+
+    def __init__(self, host: str, port: int, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._reader_task = asyncio.create_task(self._run())
+        # give the first connection a moment so early publishes go through the broker
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._connected.wait(), timeout=self.reconnect_delay)
+
+    async def stop(self):
+        await super().stop()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await self._reader_task
+            self._reader_task = None
+        self._close_writer()
+
+    async def publish(self, envelope: Envelope):
+        writer = self._writer
+        if writer is None:
+            await self._dispatch(envelope)
+            return
+        try:
+            writer.write(json.dumps(envelope).encode() + b"\n")
+            await writer.drain()
+        except Exception as e:
+            print(f"Pub/sub broker publish failed, delivering locally: {e}")
+            self._close_writer()
+            await self._dispatch(envelope)
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                print(f"Pub/sub broker {self.host}:{self.port} unavailable: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await self._dispatch(json.loads(line))
+            except (ConnectionError, ValueError) as e:
+                print(f"Pub/sub broker connection lost: {e}")
+            finally:
+                self._connected.clear()
+                self._close_writer()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class PubSubBroker:
+    """
+    Minimal local broker: every line a client sends is relayed to all connected
+    clients, the sender included. Needs no external service, so it can run next
+    to the workers on one host, or inside a test or benchmark process.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Pub/sub broker listening on {self.host}:{self.port}")
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for client in list(self._clients):
+                    if client.transport.get_write_buffer_size() > BROKER_MAX_BUFFER:
+                        print("Pub/sub broker dropping a slow subscriber")
+                        self._clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(line)
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+def create_bus() -> PubSubBus:
+    if settings.pubsub_backend == "broker":
+        return BrokerBus(settings.pubsub_broker_host, settings.pubsub_broker_port)
+    if settings.pubsub_backend != "memory":
+        raise ValueError(f"Unknown pubsub_backend: {settings.pubsub_backend}")
+    return InProcessBus()
+
+
+bus = create_bus()
+
+
+if __name__ == "__main__":
+    # python -m backend.app.utils.pubsub --port 8765
+    parser = argparse.ArgumentParser(description="Run the local pub/sub broker used by pubsub_backend=broker")
+    parser.add_argument("--host", default=settings.pubsub_broker_host)
+    parser.add_argument("--port", type=int, default=settings.pubsub_broker_port)
+    args = parser.parse_args()
+    asyncio.run(PubSubBroker(args.host, args.port).serve_forever())
@@ -0,0 +1,110 @@
+"""
+Benchmark: cancelling many orders with the old per-item loop vs orders.cancel_orders.
+
+Seeds a throwaway user, products and orders inside one transaction, cancels them
+both ways and rolls everything back, so the database is left untouched.
+
+    python benchmarks/bulk_cancel.py --orders 200 --items 5
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from backend.app import database, models
+from backend.app.routers.orders import cancel_orders
+
+
+class StatementCounter:
+    """Counts statements sent to the database while attached to the engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def seed(db, num_orders: int, items_per_order: int):
+    user = models.User(name="bench", email="bench-cancel@example.com", password="x")
+    db.add(user)
+    db.flush()
+
+    products = [models.Product(name=f"bench product {i}", price=Decimal("1.00"), stock=10_000) for i in range(items_per_order * 4)]
+    db.add_all(products)
+    db.flush()
+
+    orders = []
+    for n in range(num_orders):
+        order = models.Orders(user_id=user.id, total_amount=Decimal(items_per_order), status="Pending", address="bench")
+        db.add(order)
+        db.flush()
+        for i in range(items_per_order):
+            product = products[(n + i) % len(products)]
+            db.add(models.OrderItem(order_id=order.id, product_id=product.id, quantity=1, price=product.price))
+        orders.append(order)
+    db.flush()
+    return [order.id for order in orders]
+
+
+def legacy_cancel(db, order_ids):
+    """The pre-bulk code path: one order at a time, one product query per item."""
+    for order_id in order_ids:
+        order = db.query(models.Orders).filter(models.Orders.id == order_id).first()
+        order.status = "Cancelled"
+        for item in order.items:
+            product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
+            if product:
+                product.stock += item.quantity
+                product.num_sold -= item.quantity
+        db.flush()
+
+
+def run(label, fn, db, order_ids):
+    savepoint = db.begin_nested()
+    db.expire_all()
+    with StatementCounter(database.engine) as counter:
+        started = time.perf_counter()
+        fn(db, order_ids)
+        db.flush()
+        elapsed = time.perf_counter() - started
+    savepoint.rollback()
+    print(f"{label:<8} {elapsed * 1000:9.1f} ms  {counter.count:6d} statements")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    database.engine.echo = False
+    db = database.SessionLocal()
+    try:
+        order_ids = seed(db, args.orders, args.items)
+        print(f"Cancelling {args.orders} orders x {args.items} items")
+        run("legacy", legacy_cancel, db, order_ids)
+        run("bulk", cancel_orders, db, order_ids)
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
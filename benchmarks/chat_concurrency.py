@@ -0,0 +1,95 @@
+"""
+Load test: concurrent chat turns against a local stub model.
+
+Runs N concurrent ConnectionManager.agent_response calls with a stub client whose
+calls take a fixed latency, and reports wall time and the worst event loop stall
+seen by a ticker coroutine. With a blocking call the turns serialise (wall time
+~ N x latency, loop frozen for the whole run); with the async path the wall time
+is ~ ceil(N / LLM_MAX_CONCURRENCY) x latency and the loop stays responsive.
+
+    python benchmarks/chat_concurrency.py --chats 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.routers import websockets_server
+
+
+class StubModels:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, model, contents):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=f"stub reply to {contents}")
+
+
+class StubAsyncModels:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=f"stub reply to {contents}")
+
+
+class StubClient:
+    def __init__(self, latency: float):
+        self.models = StubModels(latency)
+        self.aio = SimpleNamespace(models=StubAsyncModels(latency))
+
+
+async def blocking_agent_response(user_message: str) -> str:
+    """The previous implementation: a sync SDK call made directly on the event loop."""
+    response = websockets_server.client.models.generate_content(model=websockets_server.LLM_MODEL, contents=user_message)
+    return response.text
+
+
+async def measure(label: str, respond, chats: int):
+    max_stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_stall
+        interval = 0.01
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_stall = max(max_stall, time.perf_counter() - started - interval)
+
+    tick_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(respond(f"message {i}") for i in range(chats)))
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick_task
+    print(f"{label:<10} {chats} chats in {elapsed:7.2f} s, worst event loop stall {max_stall * 1000:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub model latency in seconds")
+    parser.add_argument("--skip-blocking", action="store_true", help="skip the (slow) blocking baseline")
+    args = parser.parse_args()
+
+    websockets_server.client = StubClient(args.latency)
+    manager = websockets_server.ConnectionManager()
+
+    print(f"LLM_MAX_CONCURRENCY={websockets_server.settings.llm_max_concurrency}")
+    if not args.skip_blocking:
+        await measure("blocking", blocking_agent_response, args.chats)
+    await measure("async", manager.agent_response, args.chats)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
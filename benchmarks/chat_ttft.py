@@ -0,0 +1,100 @@
+"""
+Benchmark: time-to-first-token of the streaming chat protocol vs whole replies.
+
+A stub model emits a reply token by token with a fixed delay. The script measures
+when the client would get its first text frame:
+  * whole   - agent_response, one frame after the full reply (previous protocol)
+  * stream  - stream_personal_message, first "delta" frame (first sentence)
+
+    python benchmarks/chat_ttft.py --tokens 120 --token-delay 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.routers import websockets_server
+
+REPLY = (
+    "Sure, I found three kinds of apples for you. "
+    "Gala apples are on sale today. Fuji apples are the sweetest option. "
+    "Would you like me to add any of them to your cart? "
+)
+
+
+class StubAsyncModels:
+    def __init__(self, tokens: int, token_delay: float):
+        words = (REPLY * (tokens // len(REPLY.split()) + 1)).split()[:tokens]
+        self.tokens = [word + " " for word in words]
+        self.token_delay = token_delay
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self.token_delay * len(self.tokens))
+        return SimpleNamespace(text="".join(self.tokens))
+
+    async def generate_content_stream(self, model, contents):
+        async def chunks():
+            for token in self.tokens:
+                await asyncio.sleep(self.token_delay)
+                yield SimpleNamespace(text=token)
+        return chunks()
+
+
+class RecordingWebSocket:
+    """Collects frames with the time they were sent."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append((time.perf_counter(), text))
+
+
+class NullWriter:
+    """Stands in for the chat message writer so the benchmark needs no database."""
+
+    async def enqueue(self, user_id, sender, message):
+        pass
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=120)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds per generated token")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    websockets_server.client = SimpleNamespace(aio=SimpleNamespace(models=StubAsyncModels(args.tokens, args.token_delay)))
+    websockets_server.chat_writer = NullWriter()
+    manager = websockets_server.ConnectionManager()
+
+    whole, first_delta, done = [], [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        await manager.agent_response("recommend apples")
+        whole.append(time.perf_counter() - started)
+
+        websocket = RecordingWebSocket()
+        started = time.perf_counter()
+        await manager.stream_personal_message("recommend apples", websocket, 1, None)
+        deltas = [t for t, frame in websocket.frames if json.loads(frame)["type"] == "delta"]
+        first_delta.append(deltas[0] - started)
+        done.append(websocket.frames[-1][0] - started)
+
+    print(f"{args.tokens} tokens at {args.token_delay * 1000:.0f} ms/token, median of {args.runs} runs")
+    print(f"whole reply, first frame : {statistics.median(whole) * 1000:8.1f} ms")
+    print(f"streaming, first delta   : {statistics.median(first_delta) * 1000:8.1f} ms")
+    print(f"streaming, done frame    : {statistics.median(done) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Benchmark: commits needed to persist chat traffic with the write-behind writer.
+
+Simulates many concurrent chat sessions, each exchanging messages at a steady
+pace, and counts the INSERT/COMMIT round trips the ChatMessageWriter issues.
+The previous code committed every message on its own (two commits per exchange).
+The database write is replaced by a counter, so no database is needed.
+
+    python benchmarks/chat_write_behind.py --sessions 500 --exchanges 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app import models
+from backend.app.utils.chat_writer import ChatMessageWriter
+
+
+class CountingWriter(ChatMessageWriter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commits = 0
+        self.rows = 0
+
+    def _write(self, batch):
+        self.commits += 1
+        self.rows += len(batch)
+
+
+async def session(writer: ChatMessageWriter, user_id: int, exchanges: int, think_time: float):
+    for i in range(exchanges):
+        await writer.enqueue(user_id, models.SenderType.USER, f"user message {i}")
+        await asyncio.sleep(random.uniform(0, think_time))  # model latency
+        await writer.enqueue(user_id, models.SenderType.AGENT, f"agent reply {i}")
+        await asyncio.sleep(random.uniform(0, think_time))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--exchanges", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=0.2, help="max seconds between messages")
+    args = parser.parse_args()
+
+    writer = CountingWriter()
+    await writer.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(session(writer, user_id, args.exchanges, args.think_time) for user_id in range(args.sessions)))
+    await writer.stop()
+    elapsed = time.perf_counter() - started
+
+    messages = args.sessions * args.exchanges * 2
+    print(f"{args.sessions} sessions x {args.exchanges} exchanges = {messages} messages in {elapsed:.2f} s")
+    print(f"per-message commits (before) : {messages}")
+    print(f"write-behind commits (after) : {writer.commits} (avg batch {writer.rows / max(writer.commits, 1):.1f} rows)")
+    print(f"reduction                    : {messages / max(writer.commits, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
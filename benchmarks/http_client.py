@@ -0,0 +1,71 @@
+"""
+Time utils.http_client against a local stub server (no external API needed).
+
+  * pooling     - sequential calls over one keep-alive connection vs plain requests.get
+  * coalescing  - concurrent identical lookups waiting on a single upstream call
+
+The stub server and the pass/fail checks (connection count, retries, caching,
+coalescing) live in tests/test_http_client.py.
+
+    python benchmarks/http_client.py --calls 50 --threads 20 --delay 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import requests
+from tests.test_http_client import StubState, make_handler
+from utils.http_client import HttpClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="sequential uncached calls for the pooling check")
+    parser.add_argument("--threads", type=int, default=20, help="concurrent callers for the coalescing check")
+    parser.add_argument("--delay", type=float, default=0.2, help="stub response delay in seconds")
+    args = parser.parse_args()
+
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = HttpClient(cache_path=os.path.join(tmp, "http_cache.sqlite"), backoff_factor=0.01)
+
+        # pooling
+        state.connections = 0
+        started = time.perf_counter()
+        for i in range(args.calls):
+            requests.get(f"{base}/words", params={"ml": f"plain{i}"}, timeout=5).json()
+        plain = (time.perf_counter() - started, state.connections)
+        state.connections = 0
+        started = time.perf_counter()
+        for i in range(args.calls):
+            client.get_json(f"{base}/words", params={"ml": f"pooled{i}"}, ttl=0)
+        pooled = (time.perf_counter() - started, state.connections)
+        print(f"pooling     {args.calls} calls: requests.get {plain[1]} connections ({plain[0] * 1000:.0f} ms), "
+              f"HttpClient {pooled[1]} connections ({pooled[0] * 1000:.0f} ms)")
+
+        # coalescing
+        state.delay = args.delay
+        state.requests = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda _: client.get_json(f"{base}/words", params={"ml": "banana"}, ttl=0), range(args.threads)))
+        print(f"coalescing  {args.threads} concurrent lookups -> {state.requests} upstream request "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms, {client.stats['coalesced']} coalesced")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: keyword fallback search, one search per keyword vs search_products_multi.
+
+Seeds products and categories inside a transaction, runs the fallback both ways
+for a list of keywords and rolls everything back, so the database is left untouched.
+
+    python benchmarks/multi_search.py --products 5000 --keywords soda,pop,cola,soft drink,fizzy,lemonade
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app import database, models
+from backend.app.routers.search import search_products, search_products_multi
+from bulk_cancel import StatementCounter
+
+WORDS = ["cola", "lemonade", "apple", "bread", "milk", "cheese", "rice", "soap", "phone", "charger", "juice", "tea"]
+
+
+def seed(db, num_products: int):
+    categories = [models.Category(name=f"bench {word}") for word in WORDS]
+    db.add_all(categories)
+    db.flush()
+    products = []
+    for i in range(num_products):
+        word = WORDS[i % len(WORDS)]
+        products.append(models.Product(
+            name=f"bench {word} {i}",
+            description=f"a bench {WORDS[(i * 7) % len(WORDS)]} product",
+            brand_name=f"brand {i % 50}",
+            price=Decimal("1.00"),
+            stock=10,
+        ))
+    db.add_all(products)
+    db.flush()
+    db.add_all(
+        models.ProductCategory(product_id=product.id, category_id=categories[i % len(categories)].id)
+        for i, product in enumerate(products)
+    )
+    db.flush()
+
+
+def legacy_search(db, keywords):
+    """The previous fallback in agent_search_product."""
+    results = []
+    for keyword in keywords[:10]:
+        keyword_results = search_products(query=keyword, db=db)
+        if keyword_results:
+            results.extend(keyword_results)
+            if len(results) >= 10:
+                break
+    return results
+
+
+def multi_search(db, keywords):
+    return [product for product, score in search_products_multi(keywords, db=db, limit=10)]
+
+
+def run(label, fn, db, keywords):
+    db.expire_all()
+    with StatementCounter(database.engine) as counter:
+        started = time.perf_counter()
+        results = fn(db, keywords)
+        elapsed = time.perf_counter() - started
+    names = ", ".join(product.name for product in results[:3])
+    print(f"{label:<8} {elapsed * 1000:8.1f} ms  {counter.count:3d} statements  top: {names}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--keywords", default="soda,pop,cola,soft drink,fizzy,lemonade,beverage,drink,tonic,seltzer")
+    args = parser.parse_args()
+    keywords = [keyword.strip() for keyword in args.keywords.split(",") if keyword.strip()]
+
+    database.engine.echo = False
+    db = database.SessionLocal()
+    try:
+        seed(db, args.products)
+        print(f"{args.products} products, {len(keywords)} keywords")
+        run("legacy", legacy_search, db, keywords)
+        run("multi", multi_search, db, keywords)
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Check and time cross-worker WebSocket pushes through the local pub/sub broker.
+
+Starts a PubSubBroker in this process and several "workers", each a
+ConnectionManager with its own BrokerBus, as separate uvicorn workers would have.
+Every user's socket is registered on one worker only; messages are published
+from a different worker and the script checks they all arrive, then reports
+throughput and delivery latency. With InProcessBus the same pushes would reach
+only the sockets of the publishing worker.
+
+    python benchmarks/pubsub_fanout.py --workers 4 --users 1000 --messages 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.routers.websockets_server import ConnectionManager
+from backend.app.utils.pubsub import BrokerBus, PubSubBroker
+
+
+class TimingWebSocket:
+    def __init__(self):
+        self.latencies = []
+
+    async def send_text(self, text: str):
+        self.latencies.append(time.perf_counter() - float(text))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5, help="messages per user")
+    args = parser.parse_args()
+
+    broker = PubSubBroker()
+    await broker.start()
+    managers = [ConnectionManager(bus=BrokerBus(broker.host, broker.port)) for _ in range(args.workers)]
+    for manager in managers:
+        await manager.start()
+
+    sockets = {}
+    for user_id in range(args.users):
+        websocket = TimingWebSocket()
+        managers[user_id % args.workers].registry.register(websocket, user_id)
+        sockets[user_id] = websocket
+
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        for user_id in range(args.users):
+            # publish from a worker that does not hold the user's socket
+            publisher = managers[(user_id + 1) % args.workers]
+            await publisher.send_to_user(user_id, repr(time.perf_counter()))
+    expected = args.users * args.messages
+    while sum(len(s.latencies) for s in sockets.values()) < expected and time.perf_counter() - started < 30:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for s in sockets.values() for latency in s.latencies]
+    print(f"{args.workers} workers, {args.users} users, {expected} cross-worker messages")
+    print(f"delivered {len(latencies)}/{expected} in {elapsed:.2f} s ({len(latencies) / elapsed:.0f} msg/s)")
+    if latencies:
+        latencies.sort()
+        print(f"latency p50 {statistics.median(latencies) * 1000:.2f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+
+    for manager in managers:
+        await manager.stop()
+        for websocket in list(sockets.values()):
+            manager.registry.unregister(websocket)
+    await broker.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
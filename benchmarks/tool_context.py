@@ -0,0 +1,121 @@
+"""
+Benchmark: DB sessions and user queries for one cart-manager turn, per tool call vs tool_turn().
+
+Runs the tool calls of a typical agent turn (search, add, show, update, remove,
+show) twice: as separate calls, each opening its own session and loading the user,
+and inside agents/tool_context.tool_turn(), and checks that the turn used one
+session and one user query. Everything runs in a transaction on one connection
+(the routers' commits become savepoints) that is rolled back at the end, so the
+database is left untouched.
+
+    python benchmarks/tool_context.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "agents"))
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.app import database, models
+import cartmanager_agent
+from tool_context import tool_turn
+
+
+class SessionCounter:
+    """Counts sessions that touched the database and statements reading the users table."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sessions = 0
+        self.user_queries = 0
+
+    def _on_begin(self, session, transaction, connection):
+        if not session.info.get("bench_counted"):
+            session.info["bench_counted"] = True
+            self.sessions += 1
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement:
+            self.user_queries += 1
+
+    def __enter__(self):
+        self.sessions = self.user_queries = 0
+        event.listen(Session, "after_begin", self._on_begin)
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Session, "after_begin", self._on_begin)
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def seed(db):
+    user = models.User(name="bench", email="bench-tool-context@example.com", password="x")
+    product = models.Product(name="bench tool context tomato", price=Decimal("1.50"), stock=100)
+    db.add_all([user, product])
+    db.commit()
+    return user.id, product.id
+
+
+def agent_turn(user_id: int, product_id: int):
+    """The tool calls the cart manager makes for "add two bench tomatoes, then make it three, then remove them"."""
+    cartmanager_agent.agent_search_product.invoke("bench tool context tomato")
+    cartmanager_agent.agent_cart_adder.invoke(
+        {"cart_item": json.dumps({"product_id": product_id, "quantity": 2}), "user_id": user_id})
+    cartmanager_agent.agent_get_cart.invoke({"user_id": user_id})
+    cartmanager_agent.agent_update_cart_item.invoke(
+        {"product_id": product_id, "cart_item": json.dumps({"product_id": product_id, "quantity": 3}), "user_id": user_id})
+    cartmanager_agent.agent_delete_cart_item.invoke({"product_id": product_id, "user_id": user_id})
+    cartmanager_agent.agent_get_cart.invoke({"user_id": user_id})
+
+
+def run(label, fn):
+    with SessionCounter(database.engine) as counter:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed * 1000:8.1f} ms  {counter.sessions:3d} sessions  {counter.user_queries:3d} user queries")
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    database.engine.echo = False
+    connection = database.engine.connect()
+    outer = connection.begin()
+    # every session joins the outer transaction; their commits only release savepoints
+    database.SessionLocal.configure(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        db = database.SessionLocal()
+        user_id, product_id = seed(db)
+        db.close()
+
+        run("per call", lambda: agent_turn(user_id, product_id))
+
+        def in_turn():
+            with tool_turn():
+                agent_turn(user_id, product_id)
+
+        counter = run("tool_turn", in_turn)
+        assert counter.sessions == 1, f"expected 1 session per turn, got {counter.sessions}"
+        assert counter.user_queries == 1, f"expected 1 user query per turn, got {counter.user_queries}"
+    finally:
+        database.SessionLocal.configure(bind=database.engine, join_transaction_mode="conservative_savepoint")
+        outer.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
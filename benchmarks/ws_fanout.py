@@ -0,0 +1,101 @@
+"""
+Benchmark: broadcasting to thousands of WebSockets with a few slow consumers.
+
+Fake sockets accept messages instantly, except a handful that take --slow-delay
+seconds per send. Compares:
+  * sequential - the previous ConnectionManager.broadcast, awaiting each send_text
+  * registry   - ConnectionRegistry.broadcast, per-socket queues with eviction
+and reports wall time, messages delivered to the fast sockets and evictions.
+
+    python benchmarks/ws_fanout.py --sockets 5000 --slow 20 --messages 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.utils.connections import ConnectionRegistry
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+        self.close_code = None
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.close_code = code
+
+
+def make_sockets(count: int, slow: int, slow_delay: float):
+    return [FakeWebSocket(slow_delay if i < slow else 0.0) for i in range(count)]
+
+
+async def sequential_broadcast(sockets, message: str):
+    """The previous implementation."""
+    for websocket in sockets:
+        try:
+            await websocket.send_text(message)
+        except Exception as e:
+            print(f"Broadcast error: {e}")
+
+
+async def run_sequential(args):
+    sockets = make_sockets(args.sockets, args.slow, args.slow_delay)
+    started = time.perf_counter()
+    for i in range(args.messages):
+        await sequential_broadcast(sockets, f"message {i}")
+    return time.perf_counter() - started, sockets, 0
+
+
+async def run_registry(args):
+    sockets = make_sockets(args.sockets, args.slow, args.slow_delay)
+    registry = ConnectionRegistry(max_queue=args.queue, send_timeout=args.send_timeout, enqueue_timeout=args.enqueue_timeout)
+    for i, websocket in enumerate(sockets):
+        registry.register(websocket, user_id=i // 2)  # two sockets per user
+    started = time.perf_counter()
+    for i in range(args.messages):
+        await registry.broadcast(f"message {i}")
+    # let the sender tasks drain what is still queued
+    while any(c._queue.qsize() for c in registry._by_socket.values() if c.websocket.delay == 0):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for websocket in list(registry._by_socket):
+        registry.unregister(websocket)
+    await asyncio.sleep(0)
+    return elapsed, sockets, registry.evictions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=20, help="how many sockets are slow consumers")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds per send on a slow socket")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--queue", type=int, default=10, help="per-socket send queue size")
+    parser.add_argument("--send-timeout", type=float, default=0.02)
+    parser.add_argument("--enqueue-timeout", type=float, default=0.01)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    expected = (args.sockets - args.slow) * args.messages
+    print(f"{args.sockets} sockets ({args.slow} slow at {args.slow_delay * 1000:.0f} ms/send), {args.messages} broadcasts")
+    runs = [("registry", run_registry)]
+    if not args.skip_sequential:
+        runs.insert(0, ("sequential", run_sequential))
+    for label, run in runs:
+        elapsed, sockets, evictions = await run(args)
+        delivered = sum(s.received for s in sockets if s.delay == 0)
+        print(f"{label:<10} {elapsed:7.2f} s, fast sockets got {delivered}/{expected} messages, {evictions} evicted")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
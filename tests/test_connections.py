@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend.app.utils.connections import SLOW_CONSUMER_CLOSE_CODE, ConnectionRegistry
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = []
+        self.close_code = None
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(text)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.close_code = code
+
+
+async def drain(sockets, count: int, timeout: float = 5.0):
+    """Wait until every socket has received count messages."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while any(len(websocket.received) < count for websocket in sockets):
+        assert asyncio.get_running_loop().time() < deadline, "messages were not delivered"
+        await asyncio.sleep(0.01)
+
+
+def test_broadcast_reaches_every_fast_socket_and_evicts_slow_ones():
+    async def scenario():
+        registry = ConnectionRegistry(max_queue=2, send_timeout=0.05, enqueue_timeout=0.05)
+        fast = [FakeWebSocket() for _ in range(2000)]
+        slow = [FakeWebSocket(delay=1.0) for _ in range(5)]
+        for user_id, websocket in enumerate(fast + slow):
+            registry.register(websocket, user_id)
+
+        messages = [f"message {i}" for i in range(10)]
+        for message in messages:
+            await registry.broadcast(message)
+        await drain(fast, len(messages))
+        await asyncio.sleep(0.1)  # let the evicted sockets' close tasks run
+
+        assert all(websocket.received == messages for websocket in fast)
+        assert all(websocket.close_code == SLOW_CONSUMER_CLOSE_CODE for websocket in slow)
+        assert all(websocket.close_code is None for websocket in fast)
+        assert registry.evictions == len(slow)
+        assert len(registry) == len(fast)
+        assert all(registry.get(websocket) is None for websocket in slow)
+        for websocket in fast:
+            registry.unregister(websocket)
+
+    asyncio.run(scenario())
+
+
+def test_send_to_user_reaches_all_of_the_users_sockets():
+    async def scenario():
+        registry = ConnectionRegistry()
+        phone, browser, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        registry.register(phone, 1)
+        registry.register(browser, 1)
+        registry.register(other, 2)
+
+        assert await registry.send_to_user(1, "hello") == 2
+        await drain([phone, browser], 1)
+        await asyncio.sleep(0.01)
+        assert other.received == []
+        for websocket in (phone, browser, other):
+            registry.unregister(websocket)
+
+    asyncio.run(scenario())
+
+
+def test_unregister_removes_the_socket_from_both_maps():
+    async def scenario():
+        registry = ConnectionRegistry()
+        phone, browser = FakeWebSocket(), FakeWebSocket()
+        registry.register(phone, 1)
+        connection = registry.register(browser, 1)
+
+        assert registry.unregister(browser) is connection
+        assert connection.closed
+        assert registry.get(browser) is None
+        assert registry.connections_for(1) == [registry.get(phone)]
+
+        registry.unregister(phone)
+        assert len(registry) == 0
+        assert registry.user_ids() == []
+        assert registry.unregister(phone) is None
+        assert await registry.send_to_user(1, "anyone?") == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("requests")
+
+from utils.http_client import HttpClient
+
+
+class StubState:
+    """What the stub server has seen, and how it should behave."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state: StubState):
+    """
+    Datamuse-like JSON with a configurable delay; /flaky answers 503 for the first
+    state.failures requests. Counts TCP connections and requests.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+            url = urlparse(self.path)
+            if url.path == "/flaky":
+                with state.lock:
+                    fail = state.failures > 0
+                    state.failures -= 1
+                if fail:
+                    self._send(503, b'{"error": "unavailable"}', {"Retry-After": "0"})
+                    return
+            time.sleep(state.delay)
+            word = parse_qs(url.query).get("ml", ["word"])[0]
+            body = json.dumps([{"word": f"{word}-{i}", "score": 100 - i} for i in range(10)]).encode()
+            self._send(200, body, {"Cache-Control": "max-age=60"})
+
+        def _send(self, status, body, headers):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def stub():
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield state, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    return HttpClient(cache_path=str(tmp_path / "http_cache.sqlite"), backoff_factor=0.01)
+
+
+def test_sequential_calls_reuse_one_connection(stub, client):
+    state, base = stub
+    for i in range(20):
+        client.get_json(f"{base}/words", params={"ml": f"pooled{i}"}, ttl=0)
+    assert state.requests == 20
+    assert state.connections == 1
+
+
+def test_flaky_endpoint_is_retried(stub, client):
+    state, base = stub
+    state.failures = 2
+    data = client.get_json(f"{base}/flaky", params={"ml": "retry"}, ttl=0)
+    assert len(data) == 10
+    assert state.requests == 3
+
+
+def test_repeated_lookup_is_served_from_the_cache(stub, client):
+    state, base = stub
+    results = [client.get_json(f"{base}/words", params={"ml": "apple"}) for _ in range(5)]
+    assert all(result == results[0] for result in results)
+    assert state.requests == 1
+    assert client.stats["cache_hits"] == 4
+
+
+def test_cache_survives_a_new_client(stub, client, tmp_path):
+    state, base = stub
+    client.get_json(f"{base}/words", params={"ml": "apple"})
+    restarted = HttpClient(cache_path=str(tmp_path / "http_cache.sqlite"))
+    restarted.get_json(f"{base}/words", params={"ml": "apple"})
+    assert state.requests == 1
+
+
+def test_concurrent_identical_lookups_make_one_upstream_request(stub, client):
+    state, base = stub
+    state.delay = 0.3
+    threads = 10
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: client.get_json(f"{base}/words", params={"ml": "banana"}, ttl=0),
+                                range(threads)))
+    assert all(result == results[0] for result in results)
+    assert state.requests == 1
+    assert client.stats["coalesced"] == threads - 1
@@ -0,0 +1,148 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from tool_context import current_tool_context, tool_session, tool_turn
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def close(self):
+        self.calls.append("close")
+
+
+class SessionFactory:
+    def __init__(self):
+        self.sessions = []
+
+    def __call__(self):
+        session = FakeSession()
+        self.sessions.append(session)
+        return session
+
+
+def test_turn_shares_one_session_and_commits():
+    factory = SessionFactory()
+    with tool_turn(factory) as context:
+        with tool_session() as first:
+            pass
+        with tool_session() as second:
+            pass
+        assert first is second
+        assert context.sessions_opened == 1
+    assert len(factory.sessions) == 1
+    assert factory.sessions[0].calls == ["commit", "close"]
+    assert current_tool_context() is None
+
+
+def test_turn_without_tool_calls_opens_no_session():
+    factory = SessionFactory()
+    with tool_turn(factory):
+        pass
+    assert factory.sessions == []
+
+
+def test_failing_tool_rolls_back_and_turn_continues():
+    factory = SessionFactory()
+    with tool_turn(factory):
+        with pytest.raises(ValueError):
+            with tool_session():
+                raise ValueError("tool failed")
+        with tool_session() as db:
+            db.calls.append("next tool")
+    assert factory.sessions[0].calls == ["rollback", "next tool", "commit", "close"]
+
+
+def test_failing_turn_rolls_back_and_closes():
+    factory = SessionFactory()
+    with pytest.raises(RuntimeError):
+        with tool_turn(factory):
+            with tool_session():
+                pass
+            raise RuntimeError("agent failed")
+    assert factory.sessions[0].calls == ["rollback", "close"]
+    assert current_tool_context() is None
+
+
+def test_nested_turn_reuses_outer_context():
+    factory = SessionFactory()
+    with tool_turn(factory) as outer:
+        with tool_turn(SessionFactory()) as inner:
+            with tool_session():
+                pass
+        assert inner is outer
+        # the inner turn ending must not commit or close the outer turn's session
+        assert factory.sessions[0].calls == []
+    assert factory.sessions[0].calls == ["commit", "close"]
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def options(self, *options):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return list(self.rows)
+
+
+class QueryCountingSession(FakeSession):
+    """Answers user queries with one user and every other query with no rows."""
+
+    def __init__(self, user):
+        super().__init__()
+        self.user = user
+        self.queries = {}
+
+    def query(self, model):
+        self.queries[model.__name__] = self.queries.get(model.__name__, 0) + 1
+        return FakeQuery([self.user] if model.__name__ == "User" else [])
+
+    def expunge(self, instance):
+        self.calls.append("expunge")
+
+
+def test_user_is_queried_once_per_turn():
+    pytest.importorskip("backend.app.models")
+    from tool_context import get_user
+
+    session = QueryCountingSession(user=object())
+    with tool_turn(lambda: session) as context:
+        for user_id in (7, "7", 7):
+            with tool_session() as db:
+                assert get_user(user_id, db) is session.user
+        assert context.sessions_opened == 1
+        assert context.user_queries == 1
+    assert session.queries == {"User": 1}
+
+
+def test_cart_tools_share_the_turn_session_and_user(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", os.getenv("GEMINI_API_KEY") or "test-key")
+    cartmanager = pytest.importorskip("cartmanager_agent")
+
+    session = QueryCountingSession(user=SimpleNamespace(id=7))
+    with tool_turn(lambda: session) as context:
+        cartmanager.agent_get_cart.invoke({"user_id": 7})
+        cartmanager.agent_delete_cart_item.invoke({"product_id": 1, "user_id": 7})
+        cartmanager.agent_get_cart.invoke({"user_id": 7})
+        assert context.sessions_opened == 1
+        assert context.user_queries == 1
+    assert session.queries["User"] == 1
+    assert session.queries["Cart"] == 3
+    assert session.calls[-2:] == ["commit", "close"]
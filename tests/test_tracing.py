@@ -0,0 +1,101 @@
+import json
+import threading
+
+import pytest
+
+import tool_planner
+from utils.tracing import NULL_SPAN, Tracer
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    return str(tmp_path / "traces.jsonl")
+
+
+def read_traces(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def by_name(trace):
+    return {span["name"]: span for span in trace["spans"]}
+
+
+def test_child_spans_are_parented_and_exported_with_the_turn(trace_file):
+    tracer = Tracer(path=trace_file)
+    with tracer.span("turn", "turn") as turn:
+        with tracer.span("router", "router"):
+            pass
+        with tracer.span("cart-manager", "agent") as agent:
+            with tracer.span("agent_get_cart", "tool"):
+                pass
+            assert tracer.current_span() is agent
+    assert tracer.current_span() is None
+
+    [trace] = read_traces(trace_file)
+    spans = by_name(trace)
+    assert trace["trace_id"] == turn.trace_id
+    assert spans["turn"]["parent_id"] is None
+    assert spans["router"]["parent_id"] == spans["turn"]["span_id"]
+    assert spans["cart-manager"]["parent_id"] == spans["turn"]["span_id"]
+    assert spans["agent_get_cart"]["parent_id"] == spans["cart-manager"]["span_id"]
+
+
+def test_spans_outside_a_turn_are_not_recorded(trace_file):
+    tracer = Tracer(path=trace_file)
+    with tracer.span("db SELECT", "db") as span:
+        assert span is NULL_SPAN
+    assert Tracer(path=None).start("turn", "turn") is None
+
+
+def test_error_is_recorded_on_the_span(trace_file):
+    tracer = Tracer(path=trace_file)
+    with pytest.raises(ValueError):
+        with tracer.span("turn", "turn"):
+            with tracer.span("agent_search_product", "tool"):
+                raise ValueError("no such product")
+    spans = by_name(read_traces(trace_file)[0])
+    assert spans["agent_search_product"]["error"] == "ValueError: no such product"
+    assert spans["turn"]["error"] == "ValueError: no such product"
+
+
+def test_worker_threads_do_not_inherit_the_current_span(trace_file):
+    tracer = Tracer(path=trace_file)
+    seen = []
+    with tracer.span("turn", "turn"):
+        thread = threading.Thread(target=lambda: seen.append(tracer.current_span()))
+        thread.start()
+        thread.join()
+    assert seen == [None]
+
+
+def test_plan_executor_tool_spans_are_children_of_the_planning_span(trace_file, monkeypatch):
+    tracer = Tracer(path=trace_file)
+    monkeypatch.setattr(tool_planner, "tracer", tracer)
+    barrier = threading.Barrier(3, timeout=5)
+
+    class LookupTool:
+        args = {"product_name": {}}
+        description = "lookup"
+
+        def invoke(self, tool_input):
+            barrier.wait()  # all three calls run at once, on different pool threads
+            with tracer.span(f"db {tool_input}", "db"):
+                pass
+            return f"found {tool_input}"
+
+    plan = [tool_planner.ToolCall("agent_search_product", item) for item in ("milk", "eggs", "bread")]
+    with tracer.span("turn", "turn"):
+        with tracer.span("plan-and-execute", "agent"):
+            results = tool_planner.execute_plan(plan, user_id=1, tools={"agent_search_product": LookupTool()})
+
+    assert [result.output for result in results] == ["found milk", "found eggs", "found bread"]
+    [trace] = read_traces(trace_file)
+    spans = trace["spans"]
+    planning = next(span for span in spans if span["name"] == "plan-and-execute")
+    tool_spans = [span for span in spans if span["stage"] == "tool"]
+    assert sorted(span["attributes"]["input"] for span in tool_spans) == ["bread", "eggs", "milk"]
+    assert all(span["parent_id"] == planning["span_id"] for span in tool_spans)
+    for span in tool_spans:
+        [db_span] = [child for child in spans if child["name"] == f"db {span['attributes']['input']}"]
+        assert db_span["parent_id"] == span["span_id"]
@@ -0,0 +1,71 @@
+"""
+Local data files and lazily opened process-wide stores.
+
+The agents keep their SQLite files (keyword cache, recipe store, ingredient index,
+diet profiles, LLM and HTTP response caches) in one directory, outside the source
+tree:
+
+    AGENT_DATA_DIR      directory for the files (default: data/ at the project root)
+
+A file's own variable (e.g. RECIPE_STORE_PATH) still overrides that one file.
+
+    from utils.data_store import connect, data_path, lazy_singleton
+
+    @lazy_singleton
+    def get_recipe_store() -> RecipeStore:
+        return RecipeStore(data_path("recipe_store.sqlite", "RECIPE_STORE_PATH"))
+"""
+import functools
+import os
+import sqlite3
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+T = TypeVar("T")
+
+
+def data_dir() -> str:
+    return os.getenv("AGENT_DATA_DIR") or os.path.join(project_root, "data")
+
+
+def data_path(filename: str, env_var: Optional[str] = None) -> str:
+    """The file's path in the data directory, unless env_var is set (to a path, or "" to disable)."""
+    if env_var is not None and os.getenv(env_var) is not None:
+        return os.environ[env_var]
+    return os.path.join(data_dir(), filename)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open a SQLite file shared by the threads of this process, creating its directory."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+class lazy_singleton(Generic[T]):
+    """
+    Decorator for a factory whose result is created once per process, on first call,
+    under a lock. reset() forgets it so the next call creates a new one.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        functools.update_wrapper(self, factory)
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._ready = False
+        self._value: Optional[T] = None
+
+    def __call__(self) -> T:
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._value = self._factory()
+                    self._ready = True
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._ready = False
+            self._value = None
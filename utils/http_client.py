@@ -0,0 +1,185 @@
+"""
+Shared HTTP client for the external APIs the agents call (Spoonacular, Datamuse).
+
+  * one requests.Session per process: keep-alive connection pooling, so repeated
+    calls to the same host reuse a TLS connection
+  * a default (connect, read) timeout on every request
+  * bounded retries with exponential backoff on connection errors, 429 and 5xx,
+    honouring Retry-After
+  * an on-disk response cache (SQLite) for successful GET responses; the TTL comes
+    from the caller or from the response's Cache-Control max-age, and no-store
+    responses are never cached
+  * request coalescing: concurrent identical GETs share a single upstream call
+
+    from utils.http_client import http_client
+    data = http_client.get_json(url, params={...}, ttl=3600)
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.data_store import connect, data_path
+from utils.tracing import tracer
+
+DEFAULT_TIMEOUT = (3.05, 10)  # seconds to connect, seconds between bytes
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class HttpClient:
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        pool_size: int = 20,
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.stats = Counter()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if cache_path:
+            self._db = connect(cache_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        # hashed, so API keys in the query string never end up on disk
+        query = urlencode(sorted((params or {}).items()), doseq=True)
+        return hashlib.sha256(f"GET {url}?{query}".encode()).hexdigest()
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+    ) -> Any:
+        """
+        GET a JSON resource.
+        Served from the response cache when fresh; otherwise fetched once even if
+        several threads ask for it at the same time. ttl (seconds) overrides the
+        server's Cache-Control max-age; ttl=0 disables caching for the call.
+        Raises requests.RequestException on network errors and non-2xx responses,
+        after retries.
+        """
+        parts = urlsplit(url)
+        with tracer.span(f"GET {parts.netloc}{parts.path}", "http") as span:
+            return self._get_json(url, params, ttl, timeout, span)
+
+    def _get_json(self, url, params, ttl, timeout, span) -> Any:
+        key = self.cache_key(url, params)
+        body = self._cache_get(key)
+        span.set(cache_hit=body is not None)
+        if body is not None:
+            self.stats["cache_hits"] += 1
+            return json.loads(body)
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            self.stats["coalesced"] += 1
+            span.set(coalesced=True)
+            return json.loads(future.result())
+
+        try:
+            body = self._fetch(key, url, params, ttl, timeout)
+            future.set_result(body)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+        return json.loads(body)
+
+    def _fetch(self, key, url, params, ttl, timeout) -> bytes:
+        self.stats["requests"] += 1
+        try:
+            response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            self.stats["errors"] += 1
+            raise
+        body = response.content
+        ttl = self._ttl(response, ttl)
+        if ttl > 0:
+            self._cache_put(key, body, ttl)
+        return body
+
+    @staticmethod
+    def _ttl(response: requests.Response, ttl: Optional[float]) -> float:
+        if ttl is not None:
+            return ttl
+        cache_control = response.headers.get("Cache-Control", "")
+        if "no-store" in cache_control or "no-cache" in cache_control:
+            return 0
+        match = _MAX_AGE.search(cache_control)
+        return float(match.group(1)) if match else 0
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def _cache_put(self, key: str, body: bytes, ttl: float):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, body, expires_at) VALUES (?, ?, ?)",
+                (key, body, time.time() + ttl),
+            )
+            self._db.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired responses from the cache file. Returns how many were removed."""
+        if self._db is None:
+            return 0
+        with self._db_lock:
+            cursor = self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        return cursor.rowcount
+
+
+http_client = HttpClient(cache_path=data_path("http_cache.sqlite", "HTTP_CACHE_PATH") or None)
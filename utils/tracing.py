@@ -0,0 +1,412 @@
+"""
+Structured tracing for agent turns.
+
+One voice turn becomes one trace: a "turn" span from SuperAgent.process_message
+with child spans for the router, the sub-agent, each tool, each LLM call (with
+token counts and LLM-cache hits), each SQL statement and each external HTTP
+call (with response-cache hits). Spans are recorded only when AGENT_TRACE_FILE
+is set; each finished trace is appended to it as one JSON line, either in this
+module's own format or as an OTLP/JSON ExportTraceServiceRequest
+(AGENT_TRACE_FORMAT=otlp), which the OpenTelemetry Collector's otlpjsonfile
+receiver and most trace viewers can import.
+
+    with tracer.span("router", "router") as span:
+        decision = route(...)
+        span.set(agent=decision.agent)
+
+LLM and tool spans come from LangChain callbacks: pass callbacks() to the chat
+model or as an invoke config. Outside a turn (no open span), child spans are not
+recorded, so the backend's own requests are never traced.
+
+    AGENT_TRACE_FILE=traces.jsonl AGENT_TRACE_FORMAT=otlp uvicorn ...
+    python utils/tracing.py report traces.jsonl [--by name]
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_FILE = os.getenv("AGENT_TRACE_FILE")
+TRACE_FORMAT = os.getenv("AGENT_TRACE_FORMAT", "json").lower()  # "json" or "otlp"
+SERVICE_NAME = "voicecart-agents"
+
+# spans are grouped by stage in the report, in this order
+STAGES = ("turn", "router", "agent", "tool", "llm", "db", "http")
+MAX_STATEMENT_LENGTH = 200
+
+
+class Span:
+    __slots__ = ("name", "stage", "trace_id", "span_id", "parent_id", "start_ns", "_started", "duration_ns",
+                 "attributes", "error")
+
+    def __init__(self, name: str, stage: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.stage = stage
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.duration_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stands in for a span that is not recorded."""
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key: str, amount: float = 1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest for one trace."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": "voicecart.tracing"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 3 if span.stage in ("db", "http") else 1,  # CLIENT / INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.start_ns + span.duration_ns),
+                "attributes": [{"key": "stage", "value": {"stringValue": span.stage}}] + [
+                    {"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            } for span in spans],
+        }],
+    }]}
+
+
+class Tracer:
+    """
+    Collects the spans of each open trace and appends the trace to the trace file
+    when its root span ends. Disabled (every span is NULL_SPAN) without a path.
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, export_format: str = TRACE_FORMAT):
+        self.path = path
+        self.export_format = export_format
+        self._traces: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+        self._engines = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def current_span(self) -> Optional[Span]:
+        return _current.get()
+
+    def start(self, name: str, stage: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """
+        Start a span under parent (default: the current span). Only "turn" spans start
+        a new trace; any other span without a parent is not recorded (returns None).
+        """
+        if not self.enabled:
+            return None
+        parent = parent or _current.get()
+        if parent is None and stage != "turn":
+            return None
+        trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        span = Span(name, stage, trace_id, parent.span_id if parent is not None else None, attributes)
+        with self._lock:
+            self._traces.setdefault(trace_id, []).append(span)
+        return span
+
+    def end(self, span: Optional[Span], error: Optional[BaseException] = None):
+        if span is None:
+            return
+        span.duration_ns = time.perf_counter_ns() - span._started
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if span.parent_id is None:
+            with self._lock:
+                spans = self._traces.pop(span.trace_id, [])
+            self.export(spans)
+
+    @contextmanager
+    def span(self, name: str, stage: str, parent: Optional[Span] = None, **attributes) -> Iterator[Any]:
+        """Record the block as a span and make it the current span while it runs."""
+        span = self.start(name, stage, parent, **attributes)
+        if span is None:
+            yield NULL_SPAN
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current.reset(token)
+            self.end(span, e)
+            raise
+        _current.reset(token)
+        self.end(span)
+
+    def annotate(self, **attributes):
+        """Set attributes on the current span, if one is being recorded."""
+        span = _current.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def export(self, spans: List[Span]):
+        if not spans or not self.path:
+            return
+        if self.export_format == "otlp":
+            record = to_otlp(spans)
+        else:
+            root = spans[0] if spans[0].parent_id is None else next(s for s in spans if s.parent_id is None)
+            record = {
+                "trace_id": root.trace_id,
+                "name": root.name,
+                "start_ns": root.start_ns,
+                "duration_ms": round(root.duration_ms, 3),
+                "spans": [span.to_dict() for span in spans],
+            }
+        line = json.dumps(record, default=str)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write trace to {self.path}: {e}")
+
+    def instrument_engine(self, engine):
+        """Record a "db" span for every statement run on engine during a traced turn."""
+        if not self.enabled or id(engine) in self._engines:
+            return
+        from sqlalchemy import event
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            span = self.start(f"db {statement.split(None, 1)[0].upper()}" if statement.strip() else "db", "db",
+                              statement=" ".join(statement.split())[:MAX_STATEMENT_LENGTH])
+            conn.info.setdefault("trace_spans", []).append(span)
+
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            spans = conn.info.get("trace_spans")
+            if spans:
+                span = spans.pop()
+                if span is not None:
+                    span.set(rows=cursor.rowcount)
+                self.end(span)
+
+        def on_error(exception_context):
+            spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+            if spans:
+                self.end(spans.pop(), exception_context.original_exception)
+
+        event.listen(engine, "before_cursor_execute", before_execute)
+        event.listen(engine, "after_cursor_execute", after_execute)
+        event.listen(engine, "handle_error", on_error)
+        self._engines.add(id(engine))
+
+
+tracer = Tracer()
+
+
+def _token_usage(response) -> Dict[str, int]:
+    """Input/output token counts from a LangChain LLMResult, whichever way the provider reports them."""
+    usage = defaultdict(int)
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            usage["input_tokens"] += metadata.get("input_tokens", 0)
+            usage["output_tokens"] += metadata.get("output_tokens", 0)
+    if not any(usage.values()):
+        reported = (response.llm_output or {}).get("token_usage") or (response.llm_output or {}).get("usage_metadata") or {}
+        usage["input_tokens"] = reported.get("prompt_tokens", reported.get("input_tokens", 0))
+        usage["output_tokens"] = reported.get("completion_tokens", reported.get("output_tokens", 0))
+    return dict(usage)
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def callbacks() -> list:
+    """
+    LangChain callbacks that record "llm" and "tool" spans, for a chat model's
+    `callbacks=` or an invoke config. Empty when tracing is off.
+    """
+    global _handler
+    if not tracer.enabled:
+        return []
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                from langchain_core.callbacks import BaseCallbackHandler
+
+                class TracingCallbackHandler(BaseCallbackHandler):
+                    """Opens a span per LLM and tool run; the run is the current span while it executes."""
+
+                    def __init__(self):
+                        self._runs: Dict[Any, Any] = {}
+
+                    def _start(self, name, stage, run_id, parent_run_id, **attributes):
+                        parent = self._runs.get(parent_run_id, (None, None))[0]
+                        span = tracer.start(name, stage, parent, **attributes)
+                        if span is not None:
+                            # LLM-cache lookups and a tool's own DB/HTTP calls happen in this context
+                            self._runs[run_id] = (span, _current.set(span))
+
+                    def _end(self, run_id, error=None, **attributes):
+                        span, token = self._runs.pop(run_id, (None, None))
+                        if span is None:
+                            return
+                        span.set(**attributes)
+                        try:
+                            _current.reset(token)
+                        except (ValueError, RuntimeError):
+                            pass  # ended in a different context; nothing of ours to restore there
+                        tracer.end(span, error)
+
+                    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+                        model = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "llm")
+                        self._start(f"llm {model}", "llm", run_id, parent_run_id, model=model)
+
+                    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+                        model = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "llm")
+                        self._start(f"llm {model}", "llm", run_id, parent_run_id, model=model)
+
+                    def on_llm_end(self, response, *, run_id, **kwargs):
+                        self._end(run_id, **_token_usage(response))
+
+                    def on_llm_error(self, error, *, run_id, **kwargs):
+                        self._end(run_id, error)
+
+                    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+                        name = (serialized or {}).get("name", "tool")
+                        self._start(name, "tool", run_id, parent_run_id, input=str(input_str)[:MAX_STATEMENT_LENGTH])
+
+                    def on_tool_end(self, output, *, run_id, **kwargs):
+                        self._end(run_id)
+
+                    def on_tool_error(self, error, *, run_id, **kwargs):
+                        self._end(run_id, error)
+
+                _handler = TracingCallbackHandler()
+    return [_handler]
+
+
+# Report........................................................................................................
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    """Spans from a trace file in either export format, as {"name", "stage", "duration_ms", "attributes"}."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "resourceSpans" not in record:
+                spans.extend(record["spans"])
+                continue
+            for resource in record["resourceSpans"]:
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        attributes = {}
+                        for attribute in span.get("attributes", []):
+                            value = attribute["value"]
+                            attributes[attribute["key"]] = (
+                                int(value["intValue"]) if "intValue" in value else next(iter(value.values()))
+                            )
+                        spans.append({
+                            "name": span["name"],
+                            "stage": attributes.pop("stage", "unknown"),
+                            "duration_ms": (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6,
+                            "attributes": attributes,
+                        })
+    return spans
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of values (sorted or not)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+
+def report(spans: List[Dict[str, Any]], by: str = "stage") -> List[str]:
+    groups = defaultdict(list)
+    tokens = defaultdict(int)
+    cache = defaultdict(int)
+    for span in spans:
+        groups[span["stage"] if by == "stage" else f"{span['stage']}: {span['name']}"].append(span["duration_ms"])
+        attributes = span.get("attributes") or {}
+        if span["stage"] == "llm":
+            tokens["input"] += attributes.get("input_tokens", 0)
+            tokens["output"] += attributes.get("output_tokens", 0)
+        if "cache_hit" in attributes:
+            cache[(span["stage"], bool(attributes["cache_hit"]))] += 1
+
+    order = {stage: i for i, stage in enumerate(STAGES)}
+    lines = [f"{by:<40} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'total s':>9}"]
+    for key in sorted(groups, key=lambda k: (order.get(k.split(":")[0], len(STAGES)), k)):
+        values = groups[key]
+        lines.append(f"{key[:40]:<40} {len(values):7d} {percentile(values, 50):10.1f} {percentile(values, 95):10.1f} "
+                     f"{max(values):10.1f} {sum(values) / 1000:9.2f}")
+    if tokens:
+        lines.append(f"llm tokens: {tokens['input']} in, {tokens['output']} out")
+    for stage in STAGES:
+        hits, misses = cache[(stage, True)], cache[(stage, False)]
+        if hits + misses:
+            lines.append(f"{stage} cache hits: {hits}/{hits + misses} ({hits / (hits + misses):.0%})")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="p50/p95 latency per stage from a trace file")
+    report_parser.add_argument("path")
+    report_parser.add_argument("--by", choices=("stage", "name"), default="stage")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        print("\n".join(report(read_spans(args.path), args.by)))